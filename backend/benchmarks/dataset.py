@@ -0,0 +1,229 @@
+"""
+Synthetic dataset generator for Red Manga benchmarks
+
+Seeds a database with N manga of M chapters each, shaped exactly like the
+documents the API writes: native dates, cover descriptors, page
+descriptors and the per-manga chapter summary. Page descriptors point at
+a small pool of distinct page blobs of the configured size, which are
+only written to GridFS with --store-pages (a real mongod is needed then).
+
+Usage:
+    python benchmarks/dataset.py --manga 1000 --chapters 20 --pages 25
+    python benchmarks/dataset.py --db redmanga_loadtest --reset --store-pages --page-bytes 200000
+
+Seeding uses its own database (redmanga_loadtest by default); --reset
+drops the seeded collections of that database first.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_DB_NAME = "redmanga_loadtest"
+
+# Titles and descriptions are built from these so search queries can hit them
+WORDS = [
+    "crimson", "blade", "shadow", "academy", "dragon", "moon", "hunter", "spirit", "empire", "storm",
+    "garden", "lotus", "phantom", "knight", "river", "demon", "star", "sword", "winter", "flame",
+    "wolf", "sakura", "thunder", "oath", "journey", "legend", "silver", "tower", "abyss", "horizon",
+]
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Romance", "Sci-Fi", "Slice of Life"]
+
+SEEDED_COLLECTIONS = ("manga", "chapters", "statistics")
+
+INSERT_BATCH = 1000
+
+
+def page_pool(rng: random.Random, count: int, page_bytes: int) -> List[Dict]:
+    """Distinct WebP-looking page blobs of roughly page_bytes each"""
+    pool = []
+    for _ in range(max(1, count)):
+        size = max(16, int(page_bytes * rng.uniform(0.75, 1.25)))
+        body = rng.randbytes(size - 12)
+        data = b"RIFF" + (size - 8).to_bytes(4, "little") + b"WEBP" + body
+        pool.append({
+            "data": data,
+            "hash": hashlib.sha256(data).hexdigest(),
+            "size": len(data),
+            "contentType": "image/webp",
+        })
+    return pool
+
+
+def make_manga(rng: random.Random, index: int, created_at: datetime) -> Dict:
+    title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4)))
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "title": f"{title} {index}",
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))).capitalize() + ".",
+        "author": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}",
+        "genres": rng.sample(GENRES, rng.randint(1, 3)),
+        "status": rng.choice(["Ongoing", "Completed"]),
+        "createdAt": created_at,
+        "totalChapters": 0,
+        "totalPages": 0,
+        "cover": {
+            "original": {"hash": f"{rng.getrandbits(256):064x}", "size": 250000, "contentType": "image/jpeg"},
+            "variants": [
+                {"width": width, "hash": f"{rng.getrandbits(256):064x}", "size": width * 60, "contentType": "image/webp"}
+                for width in (160, 320, 640)
+            ],
+        },
+    }
+
+
+def make_chapters(rng: random.Random, manga: Dict, count: int, pages: int, pool: List[Dict]) -> List[Dict]:
+    """Chapters of one manga, filling in the manga's chapter summary"""
+    chapters = []
+    created_at = manga['createdAt']
+    for number in range(1, count + 1):
+        # BSON dates have millisecond precision
+        created_at = created_at + timedelta(milliseconds=rng.randrange(3600 * 1000, 14 * 24 * 3600 * 1000))
+        descriptors = [
+            {key: page[key] for key in ("hash", "size", "contentType")}
+            for page in (rng.choice(pool) for _ in range(pages))
+        ]
+        chapters.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "mangaId": manga['id'],
+            "chapterNumber": float(number),
+            "title": f"Chapter {number}",
+            "pages": descriptors,
+            "createdAt": created_at,
+        })
+
+    manga['totalChapters'] = count
+    manga['totalPages'] = count * pages
+    if chapters:
+        manga['latestChapterNumber'] = chapters[-1]['chapterNumber']
+        manga['latestChapterAt'] = chapters[-1]['createdAt']
+    return chapters
+
+
+async def seed(db, manga_count: int, chapters_per_manga: int, pages_per_chapter: int,
+               page_bytes: int = 150000, pool_size: int = 32, seed_value: int = 1,
+               page_store=None) -> Dict:
+    """
+    Insert a synthetic dataset
+
+    Args:
+        db: Motor database handle (or an in-process stand-in)
+        manga_count: Number of manga
+        chapters_per_manga: Chapters of each manga
+        pages_per_chapter: Pages of each chapter
+        page_bytes: Approximate size of each page blob
+        pool_size: Distinct page blobs shared by all chapters
+        seed_value: Random seed, the same seed gives the same dataset
+        page_store: BlobStore to write the page pool to, None to only write descriptors
+
+    Returns:
+        Dictionary with the counts inserted and the seconds taken
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed_value)
+    pool = page_pool(rng, pool_size, page_bytes)
+    if page_store is not None:
+        for page in pool:
+            await page_store.put(page['data'], page['contentType'])
+
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    manga_batch: List[Dict] = []
+    chapter_batch: List[Dict] = []
+    chapter_count = 0
+
+    for index in range(manga_count):
+        manga = make_manga(rng, index, start + timedelta(milliseconds=rng.randrange(10 ** 10)))
+        chapters = make_chapters(rng, manga, chapters_per_manga, pages_per_chapter, pool)
+        manga_batch.append(manga)
+        chapter_batch.extend(chapters)
+        chapter_count += len(chapters)
+
+        if len(manga_batch) >= INSERT_BATCH:
+            await db.manga.insert_many(manga_batch, ordered=False)
+            manga_batch = []
+        if len(chapter_batch) >= INSERT_BATCH:
+            await db.chapters.insert_many(chapter_batch, ordered=False)
+            chapter_batch = []
+
+    if manga_batch:
+        await db.manga.insert_many(manga_batch, ordered=False)
+    if chapter_batch:
+        await db.chapters.insert_many(chapter_batch, ordered=False)
+
+    return {
+        "manga": manga_count,
+        "chapters": chapter_count,
+        "pages": chapter_count * pages_per_chapter,
+        "pageBlobs": len(pool) if page_store is not None else 0,
+        "pageBytes": page_bytes,
+        "seed": seed_value,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def reset(db, include_pages: bool = False):
+    """Drop the collections seed() writes to"""
+    names = list(SEEDED_COLLECTIONS)
+    if include_pages:
+        names += ["pages.files", "pages.chunks"]
+    for name in names:
+        await db.drop_collection(name)
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    """Dataset options shared with the load test"""
+    parser.add_argument("--manga", type=int, default=500, help="Number of manga")
+    parser.add_argument("--chapters", type=int, default=20, help="Chapters per manga")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per chapter")
+    parser.add_argument("--page-bytes", type=int, default=150000, help="Approximate size of each page")
+    parser.add_argument("--page-pool", type=int, default=32, help="Distinct page blobs shared by all chapters")
+    parser.add_argument("--seed", type=int, default=1, help="Dataset seed")
+
+
+async def run(args) -> Dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from blob_store import BlobStore
+    from indexes import ensure_indexes
+
+    client = AsyncIOMotorClient(args.mongo_url, tz_aware=True)
+    db = client[args.db]
+    try:
+        if args.reset:
+            await reset(db, include_pages=args.store_pages)
+        await ensure_indexes(db)
+        page_store = BlobStore(db, "pages") if args.store_pages else None
+        return await seed(db, args.manga, args.chapters, args.pages, args.page_bytes,
+                          args.page_pool, args.seed, page_store)
+    finally:
+        client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic manga and chapters")
+    parser.add_argument("--mongo-url", default=os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    parser.add_argument("--db", default=DEFAULT_DB_NAME, help="Database to seed")
+    parser.add_argument("--reset", action="store_true", help="Drop the seeded collections first")
+    parser.add_argument("--store-pages", action="store_true", help="Write the page blobs to GridFS")
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Benchmark for chapter page extraction
+
+Compares the single-pass lxml engine in page_extractor with the previous
+BeautifulSoup implementation, checking that both return identical URLs.
+
+Usage:
+    python benchmarks/extract_benchmark.py                  # saved pages in benchmarks/corpus/
+    python benchmarks/extract_benchmark.py --corpus DIR --repeat 20 --json results.json
+
+Saved pages are *.html files. The page URL, used to resolve relative image
+sources, is read from a browser "saved from url=" comment when present.
+Without a corpus a synthetic set of chapter pages is generated instead.
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from page_extractor import extract_image_urls, normalize_url  # noqa: E402
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "corpus"
+DEFAULT_URL = "https://example.com/title/1-en-sample/2-chapter-1"
+SAVED_FROM_PATTERN = re.compile(r'saved from url=\(\d+\)(\S+?)\s*-->')
+
+
+# ============= Reference Implementation =============
+
+def legacy_is_valid_manga_image(url: str) -> bool:
+    if not url:
+        return False
+    if not re.search(r'\.(jpg|jpeg|png|webp|gif)($|\?)', url, re.I):
+        return False
+    exclude_patterns = [
+        r'logo', r'icon', r'avatar', r'banner', r'ad[_-]',
+        r'thumb', r'cover', r'button', r'sprite'
+    ]
+    for pattern in exclude_patterns:
+        if re.search(pattern, url, re.I):
+            return False
+    return True
+
+
+def legacy_extract_image_urls(html_content: str, chapter_url: str) -> List[str]:
+    """The three-pass html.parser extraction extract_chapter used before"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    image_urls = set()
+
+    for img in soup.find_all('img'):
+        src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
+        if src and legacy_is_valid_manga_image(src):
+            image_urls.add(normalize_url(src, chapter_url))
+
+    manga_containers = soup.find_all(['div', 'section'], class_=re.compile(r'(page|chapter|manga|reader|viewer|panel)', re.I))
+    for container in manga_containers:
+        for img in container.find_all('img'):
+            src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
+            if src and legacy_is_valid_manga_image(src):
+                image_urls.add(normalize_url(src, chapter_url))
+
+    for script in soup.find_all('script'):
+        script_text = script.string or ''
+        urls_in_script = re.findall(r'["\']https?://[^"\s]+\.(?:jpg|jpeg|png|webp|gif)["\']', script_text, re.I)
+        for url_match in urls_in_script:
+            url = url_match.strip('"\'')
+            if legacy_is_valid_manga_image(url):
+                image_urls.add(url)
+
+    return sorted(list(image_urls))
+
+
+# ============= Corpus =============
+
+def load_corpus(corpus_dir: Path) -> List[Tuple[str, str, str]]:
+    """Saved pages as (name, url, html)"""
+    pages = []
+    for path in sorted(corpus_dir.glob("*.html")):
+        html = path.read_text(encoding='utf-8', errors='replace')
+        match = SAVED_FROM_PATTERN.search(html[:2048])
+        pages.append((path.name, match.group(1) if match else DEFAULT_URL, html))
+    return pages
+
+
+def synthetic_page(rng: random.Random, pages: int, noise: int) -> str:
+    """A chapter page shaped like a typical reader site"""
+    parts = ['<!DOCTYPE html><html><head><title>Chapter</title>',
+             '<script src="/static/app.js"></script>',
+             '<link rel="icon" href="/favicon.png"></head><body>',
+             '<header class="nav"><img src="/static/logo.png" alt="logo">',
+             '<img src="https://cdn.example.com/u/avatar_12.jpg"></header>']
+
+    for i in range(noise):
+        parts.append(f'<div class="card"><a href="/title/{i}"><img src="/thumb/{i}.webp">'
+                     f'<span>Related title {i} &amp; more</span></a><p>{"lorem ipsum " * 8}</p></div>')
+
+    parts.append('<div class="reader-container"><section class="page-list">')
+    for n in range(1, pages + 1):
+        style = rng.randrange(4)
+        name = f"{n:03d}.{rng.choice(['jpg', 'png', 'webp'])}"
+        if style == 0:
+            parts.append(f'<div class="page"><img src="https://img.example.com/c/1/{name}"></div>')
+        elif style == 1:
+            parts.append(f'<div class="page"><img src="data:," data-src="//img.example.com/c/1/{name}?t=1"></div>')
+        elif style == 2:
+            parts.append(f'<img class="lazy" data-lazy-src="/c/1/{name}">')
+        else:
+            parts.append(f'<div class="panel"><img src="pages/{name}"></div>')
+    parts.append('</section></div>')
+
+    parts.append('<div class="ad-slot"><img src="https://ads.example.com/ad_banner.gif"></div>')
+    script_urls = ', '.join(f'"https://img2.example.com/c/1/s{n:03d}.jpg"' for n in range(1, pages + 1))
+    parts.append(f'<script>window.__DATA__ = {{"images": [{script_urls}], "cover": "https://img2.example.com/cover.jpg"}};</script>')
+    parts.append('<script></script><script>var x = "<img src=\'/not/a/tag.jpg\'>";</script>')
+    parts.append('<footer><img src="/static/button_up.png"></footer></body></html>')
+    return ''.join(parts)
+
+
+def synthetic_corpus(count: int = 12, seed: int = 1) -> List[Tuple[str, str, str]]:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        pages = rng.choice([8, 20, 45, 80])
+        noise = rng.choice([10, 60, 200])
+        corpus.append((f"synthetic_{i:02d}_{pages}p", DEFAULT_URL, synthetic_page(rng, pages, noise)))
+    return corpus
+
+
+# ============= Benchmark =============
+
+def time_extractor(extractor: Callable, html: str, url: str, repeat: int) -> float:
+    """Median seconds per extraction"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extractor(html, url)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def run(corpus: List[Tuple[str, str, str]], repeat: int) -> Dict:
+    rows = []
+    mismatches = []
+    for name, url, html in corpus:
+        expected = legacy_extract_image_urls(html, url)
+        actual = extract_image_urls(html, url)
+        if actual != expected:
+            mismatches.append({
+                'page': name,
+                'missing': sorted(set(expected) - set(actual)),
+                'extra': sorted(set(actual) - set(expected)),
+            })
+
+        legacy = time_extractor(legacy_extract_image_urls, html, url, repeat)
+        fast = time_extractor(extract_image_urls, html, url, repeat)
+        rows.append({
+            'page': name,
+            'bytes': len(html.encode('utf-8')),
+            'images': len(expected),
+            'legacy_ms': round(legacy * 1000, 3),
+            'fast_ms': round(fast * 1000, 3),
+            'speedup': round(legacy / fast, 2) if fast else None,
+        })
+
+    legacy_total = sum(r['legacy_ms'] for r in rows)
+    fast_total = sum(r['fast_ms'] for r in rows)
+    return {
+        'pages': len(rows),
+        'repeat': repeat,
+        'legacy_total_ms': round(legacy_total, 3),
+        'fast_total_ms': round(fast_total, 3),
+        'speedup': round(legacy_total / fast_total, 2) if fast_total else None,
+        'mismatches': mismatches,
+        'results': rows,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark chapter page extraction")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="Directory of saved chapter pages")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per page")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus.is_dir() else []
+    source = str(args.corpus)
+    if not corpus:
+        corpus = synthetic_corpus()
+        source = "synthetic"
+
+    report = run(corpus, args.repeat)
+    report['corpus'] = source
+
+    print(f"Corpus: {source} ({report['pages']} pages, median of {args.repeat} runs)")
+    print(f"{'page':32} {'KiB':>8} {'imgs':>5} {'legacy ms':>10} {'fast ms':>9} {'speedup':>8}")
+    for row in report['results']:
+        print(f"{row['page'][:32]:32} {row['bytes'] / 1024:8.1f} {row['images']:5d} "
+              f"{row['legacy_ms']:10.3f} {row['fast_ms']:9.3f} {row['speedup']:7.2f}x")
+    print(f"Total: legacy {report['legacy_total_ms']:.1f} ms, fast {report['fast_total_ms']:.1f} ms, "
+          f"speedup {report['speedup']}x")
+
+    for mismatch in report['mismatches']:
+        print(f"MISMATCH {mismatch['page']}: missing {mismatch['missing'][:5]} extra {mismatch['extra'][:5]}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
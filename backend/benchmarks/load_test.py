@@ -0,0 +1,315 @@
+"""
+Load test for the Red Manga read API
+
+Seeds a synthetic dataset (see dataset.py), then drives /api/manga,
+/api/featured, /api/search, /api/manga/{id}/chapters and
+/api/chapter/{id} at a fixed concurrency and reports p50/p95/p99
+latency, throughput and peak RSS per endpoint and overall, as JSON so
+runs can be compared over time.
+
+Usage:
+    python benchmarks/load_test.py --mongomock                       # in-process, no mongod needed
+    python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 --manga 2000 --chapters 40
+    python benchmarks/load_test.py --base-url http://localhost:8001 --no-seed --server-pid 1234
+
+By default server.app is served in-process through httpx's ASGI transport,
+so the driver shares the event loop and CPU with the server and the
+throughput is a lower bound. With --base-url a running server is tested
+over HTTP instead; seed its database with dataset.py before starting it
+(the search index is built at startup) and pass --server-pid to report
+its peak RSS. --mongomock needs the optional mongomock-motor package.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from dataset import DEFAULT_DB_NAME, WORDS, add_dataset_arguments, reset, seed  # noqa: E402
+
+ENDPOINTS = ("manga", "featured", "search", "chapters", "chapter")
+
+MANGA_SORTS = ("createdAt", "title", "totalChapters", "updated")
+
+# Ids sampled from the dataset to build request paths
+ID_SAMPLE = 2000
+
+
+# ============= Request Plan =============
+
+async def sample_ids(db) -> Tuple[List[str], List[str]]:
+    """Manga and chapter ids to request"""
+    manga = await db.manga.find({}, {"_id": 0, "id": 1}).limit(ID_SAMPLE).to_list(ID_SAMPLE)
+    chapters = await db.chapters.find({}, {"_id": 0, "id": 1}).limit(ID_SAMPLE).to_list(ID_SAMPLE)
+    return [m['id'] for m in manga], [c['id'] for c in chapters]
+
+
+def search_query(rng: random.Random) -> str:
+    query = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+    if rng.random() < 0.2:
+        # Typo tolerance takes a different path through the index
+        i = rng.randrange(len(query) - 1)
+        query = query[:i] + query[i + 1] + query[i] + query[i + 2:]
+    return query
+
+
+def plan_requests(rng: random.Random, count: int, manga_ids: List[str],
+                  chapter_ids: List[str]) -> List[Tuple[str, str]]:
+    """(endpoint, path) pairs in an evenly mixed, reproducible order"""
+    plan = []
+    for i in range(count):
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        if endpoint == "manga":
+            path = f"/api/manga?limit=50&sort={rng.choice(MANGA_SORTS)}"
+        elif endpoint == "featured":
+            path = "/api/featured"
+        elif endpoint == "search":
+            path = "/api/search?" + str(httpx.QueryParams({"q": search_query(rng)}))
+        elif endpoint == "chapters":
+            path = f"/api/manga/{rng.choice(manga_ids)}/chapters"
+        else:
+            path = f"/api/chapter/{rng.choice(chapter_ids)}"
+        plan.append((endpoint, path))
+    rng.shuffle(plan)
+    return plan
+
+
+# ============= Driver =============
+
+async def drive(client: httpx.AsyncClient, plan: List[Tuple[str, str]], concurrency: int) -> Dict:
+    """
+    Send every planned request with `concurrency` requests in flight
+
+    Returns:
+        Dictionary with per-endpoint latencies, errors and the wall time
+    """
+    latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+    errors: Dict[str, int] = {endpoint: 0 for endpoint in ENDPOINTS}
+    pending = iter(plan)
+
+    async def worker():
+        for endpoint, path in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[endpoint].append(time.perf_counter() - started)
+            if failed:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "seconds": time.perf_counter() - started}
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict:
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+# ============= Environment =============
+
+def peak_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Peak resident set size of this process, or of another process on Linux"""
+    if pid is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============= Setup =============
+
+def import_server(args):
+    """Import server.py against the load test database"""
+    os.environ['MONGO_URL'] = args.mongo_url
+    os.environ['DB_NAME'] = args.db
+    import server
+
+    mongo_client = None
+    if args.mongomock:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--mongomock needs the mongomock-motor package (pip install mongomock-motor)")
+        mongo_client = AsyncMongoMockClient(tz_aware=True)
+
+    # What the lifespan does first, with a cache directory of our own so
+    # responses of a previous run are never served
+    server.open_database(mongo_client)
+    args.cache_dir = Path(tempfile.mkdtemp(prefix="redmanga-loadtest-"))
+    server.open_caches(args.cache_dir)
+
+    if args.no_response_cache:
+        from response_cache import ResponseCache
+        server.response_cache = ResponseCache(max_entries=0)
+
+    return server
+
+
+async def run(args) -> Dict:
+    if args.base_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server = None
+        mongo_client = AsyncIOMotorClient(args.mongo_url, tz_aware=True)
+        db = mongo_client[args.db]
+    else:
+        server = import_server(args)
+        mongo_client = server.client
+        db = server.db
+
+    dataset = None
+    try:
+        if not args.no_seed:
+            from blob_store import BlobStore
+            await reset(db, include_pages=args.store_pages)
+            page_store = BlobStore(db, "pages") if args.store_pages else None
+            dataset = await seed(db, args.manga, args.chapters, args.pages, args.page_bytes,
+                                 args.page_pool, args.seed, page_store)
+
+        if server is not None:
+            # The rest of the lifespan, without starting the background jobs
+            if not args.mongomock:
+                from indexes import ensure_indexes
+                await ensure_indexes(db)
+            await server.rebuild_search_index()
+            transport = httpx.ASGITransport(app=server.app)
+            base_url = "http://loadtest"
+        else:
+            transport = None
+            base_url = args.base_url
+
+        manga_ids, chapter_ids = await sample_ids(db)
+        if not manga_ids or not chapter_ids:
+            raise SystemExit(f"Database {args.db} has no manga or chapters, seed it first")
+
+        rng = random.Random(args.seed)
+        rss_before = peak_rss_bytes()
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits,
+                                     timeout=args.timeout) as client:
+            if args.warmup:
+                await drive(client, plan_requests(rng, args.warmup, manga_ids, chapter_ids), args.concurrency)
+            result = await drive(client, plan_requests(rng, args.requests, manga_ids, chapter_ids),
+                                 args.concurrency)
+    finally:
+        if server is not None:
+            shutil.rmtree(args.cache_dir, ignore_errors=True)
+        if server is None or not args.mongomock:
+            mongo_client.close()
+
+    all_latencies = [latency for values in result['latencies'].values() for latency in values]
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "target": args.base_url or ("in-process (mongomock)" if args.mongomock else "in-process"),
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "response_cache": not args.no_response_cache,
+        },
+        "dataset": dataset,
+        "overall": summarize(all_latencies, sum(result['errors'].values()), result['seconds']),
+        "endpoints": {
+            endpoint: summarize(result['latencies'][endpoint], result['errors'][endpoint], result['seconds'])
+            for endpoint in ENDPOINTS
+        },
+        "memory": {
+            "peak_rss_before_load_bytes": rss_before,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "server_peak_rss_bytes": peak_rss_bytes(args.server_pid) if args.server_pid else None,
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the Red Manga read API")
+    parser.add_argument("--mongo-url", default=os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    parser.add_argument("--db", default=DEFAULT_DB_NAME, help="Database to seed and test against")
+    parser.add_argument("--mongomock", action="store_true", help="Use an in-process mongomock database")
+    parser.add_argument("--base-url", default=None, help="Test a running server instead of server.app in-process")
+    parser.add_argument("--server-pid", type=int, default=None, help="Report the peak RSS of this server process")
+    parser.add_argument("--no-seed", action="store_true", help="Use the data already in the database")
+    parser.add_argument("--store-pages", action="store_true", help="Write the page blobs to GridFS")
+    parser.add_argument("--no-response-cache", action="store_true",
+                        help="Disable the in-process response cache to measure the database path")
+    parser.add_argument("--requests", type=int, default=5000, help="Timed requests")
+    parser.add_argument("--warmup", type=int, default=250, help="Untimed requests sent first")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this file")
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    if args.mongomock and args.base_url:
+        parser.error("--mongomock only applies to the in-process server")
+    if args.mongomock and args.store_pages:
+        parser.error("--store-pages needs GridFS, which mongomock does not provide")
+
+    # server.py logs at INFO, one httpx line per request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+
+    print(f"{report['target']}: {report['config']['requests']} requests, concurrency {report['config']['concurrency']}")
+    print(f"{'endpoint':10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, row in [*report['endpoints'].items(), ("overall", report['overall'])]:
+        if row['requests']:
+            print(f"{name:10} {row['throughput_rps']:9.1f} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+                  f"{row['p99_ms']:9.2f} {row['errors']:7}")
+    print(f"Peak RSS {report['memory']['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    return 1 if report['overall']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
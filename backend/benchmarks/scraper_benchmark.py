@@ -0,0 +1,204 @@
+"""
+Benchmark for the MangaPark scraper against local fixtures
+
+Starts the fixture server (see scraper_fixtures.py) and times every
+scraper phase without the network: title page fetch and parse
+(get_manga_info, get_chapters), chapter page parsing, image discovery
+through the fast path and optionally through Chromium, and the full
+download pipeline. Phase timings recorded by the scraper itself
+(browser_launch, page_load, scroll, download) are read back from the
+metrics registry.
+
+Usage:
+    python benchmarks/scraper_benchmark.py                            # synthetic fixtures, no browser
+    python benchmarks/scraper_benchmark.py --browser --latency-ms 80 --image-latency-ms 20
+    python benchmarks/scraper_benchmark.py --har title.har --json results.json
+
+Chromium must be installed (playwright install chromium) for --browser.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mangapark_scraper import MangaScraper  # noqa: E402
+from metrics import SCRAPER_PHASE_SECONDS, SCRAPER_PHASES  # noqa: E402
+from scraper_fixtures import FixtureServer, add_fixture_arguments, fixtures_from_args  # noqa: E402
+
+PHASES = ("browser_launch", "page_load", "scroll", "download")
+
+
+def timed(samples: List[float]) -> Dict:
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+        "total_s": round(sum(samples), 3),
+    }
+
+
+def phase_snapshot() -> Dict[str, Dict]:
+    return {phase: {"count": SCRAPER_PHASE_SECONDS.count(phase=phase),
+                    "seconds": SCRAPER_PHASE_SECONDS.sum(phase=phase),
+                    "errors": SCRAPER_PHASES.value(phase=phase, outcome="error")}
+            for phase in PHASES}
+
+
+def phase_delta(before: Dict[str, Dict], after: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Phases recorded by the scraper between two snapshots"""
+    delta = {}
+    for phase in PHASES:
+        count = after[phase]['count'] - before[phase]['count']
+        seconds = after[phase]['seconds'] - before[phase]['seconds']
+        errors = after[phase]['errors'] - before[phase]['errors']
+        if count or errors:
+            delta[phase] = {"count": count, "errors": errors, "total_s": round(seconds, 3),
+                            "mean_ms": round(seconds / count * 1000, 2) if count else None}
+    return delta
+
+
+async def time_async(func: Callable, *args) -> float:
+    started = time.perf_counter()
+    await func(*args)
+    return time.perf_counter() - started
+
+
+async def run(args, server: FixtureServer) -> Dict:
+    title_url = server.title_url
+    if title_url is None:
+        raise SystemExit("No title page found in the fixtures")
+
+    report: Dict = {"fixtures": {"source": str(args.har) if args.har else "synthetic",
+                                 "responses": len(server.fixtures.fixtures),
+                                 "latency_ms": args.latency_ms,
+                                 "image_latency_ms": server.image_latency_ms,
+                                 "jitter_ms": args.jitter_ms}}
+
+    with tempfile.TemporaryDirectory() as download_dir:
+        async with MangaScraper(download_dir=download_dir, base_url=server.url,
+                                max_download_concurrency=args.download_concurrency,
+                                per_host_rate=args.per_host_rate) as scraper:
+            # Title page: blocking requests + BeautifulSoup, as the scraper runs them
+            info_times, chapter_times = [], []
+            for _ in range(args.repeat):
+                info_times.append(await time_async(asyncio.to_thread, scraper.get_manga_info, title_url))
+                chapter_times.append(await time_async(asyncio.to_thread, scraper.get_chapters, title_url))
+            chapters = scraper.get_chapters(title_url)[:args.max_chapters]
+            report["title"] = {"chapters": len(chapters), "get_manga_info": timed(info_times),
+                               "get_chapters": timed(chapter_times)}
+
+            # Parse only: chapter HTML already in memory
+            parse_times, parse_images = [], 0
+            for chapter in chapters:
+                html = scraper.session.get(chapter['url'], timeout=10).text
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    parse_images += len(MangaScraper.extract_images_from_html(html))
+                    parse_times.append(time.perf_counter() - started)
+            report["parse"] = timed(parse_times) if parse_times else None
+
+            # Image discovery through the fast path (one HTTP fetch + parse)
+            fast_times, fast_images = [], 0
+            for chapter in chapters:
+                started = time.perf_counter()
+                fast_images += len(await scraper.get_chapter_images(chapter['url']))
+                fast_times.append(time.perf_counter() - started)
+            report["fast_path"] = {**timed(fast_times), "images": fast_images} if fast_times else None
+
+            if args.browser:
+                scraper.use_fast_path = False
+                before = phase_snapshot()
+                browser_times, browser_images, errors = [], 0, []
+                for chapter in chapters:
+                    started = time.perf_counter()
+                    try:
+                        browser_images += len(await scraper.get_chapter_images(chapter['url']))
+                    except Exception as e:
+                        errors.append(str(e).splitlines()[0])
+                    browser_times.append(time.perf_counter() - started)
+                report["browser"] = {**timed(browser_times), "images": browser_images, "errors": errors,
+                                     "phases": phase_delta(before, phase_snapshot()),
+                                     "load_timings": scraper.load_timings}
+                scraper.use_fast_path = True
+
+            # Full pipeline: discovery overlapped with page downloads, written to disk
+            before = phase_snapshot()
+            bytes_before = server.bytes_sent
+            started = time.perf_counter()
+            result = await scraper.download_manga(title_url, end_chapter=_last_number(chapters))
+            seconds = time.perf_counter() - started
+            images = result.get('total_images_downloaded', 0)
+            downloaded_bytes = server.bytes_sent - bytes_before
+            report["download"] = {
+                "success": result.get('success', False),
+                "chapters": result.get('successful_chapters', 0),
+                "images": images,
+                "bytes": downloaded_bytes,
+                "seconds": round(seconds, 3),
+                "images_per_s": round(images / seconds, 1) if seconds else None,
+                "mib_per_s": round(downloaded_bytes / seconds / 2 ** 20, 2) if seconds else None,
+                "phases": phase_delta(before, phase_snapshot()),
+            }
+
+    report["server"] = {"requests": server.requests, "misses": server.misses[:20]}
+    return report
+
+
+def _last_number(chapters: List[Dict]):
+    return max((float(ch['chapter_number']) for ch in chapters), default=None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MangaPark scraper against local fixtures")
+    add_fixture_arguments(parser)
+    parser.add_argument("--browser", action="store_true", help="Also discover images by rendering with Chromium")
+    parser.add_argument("--max-chapters", type=int, default=5, help="Chapters to scrape from the title")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of the title page and parse timings")
+    parser.add_argument("--download-concurrency", type=int, default=8, help="Image downloads in flight")
+    parser.add_argument("--per-host-rate", type=float, default=1000.0,
+                        help="Image requests per second (the fixtures are one local host)")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    # The scraper logs every page at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with FixtureServer(fixtures_from_args(args), args.latency_ms, args.image_latency_ms, args.jitter_ms) as server:
+        report = asyncio.run(run(args, server))
+
+    title = report['title']
+    print(f"Fixtures: {report['fixtures']['source']}, {title['chapters']} chapters, "
+          f"latency {args.latency_ms} ms")
+    print(f"{'phase':16} {'median ms':>10} {'max ms':>9}")
+    for name, row in (("get_manga_info", title['get_manga_info']), ("get_chapters", title['get_chapters']),
+                      ("parse", report['parse']), ("fast_path", report['fast_path']),
+                      ("browser", report.get('browser'))):
+        if row:
+            print(f"{name:16} {row['median_ms']:10.2f} {row['max_ms']:9.2f}")
+    if report.get('browser', {}).get('errors'):
+        print(f"Browser errors: {report['browser']['errors'][0]}")
+    download = report['download']
+    print(f"Download: {download['images']} images, {download['bytes'] / 2 ** 20:.1f} MiB in "
+          f"{download['seconds']:.2f}s ({download['images_per_s']} images/s, {download['mib_per_s']} MiB/s)")
+    for phase, row in download['phases'].items():
+        print(f"  {phase:14} {row['count']:4} runs, mean {row['mean_ms']} ms, {row['errors']} errors")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, default=str))
+
+    return 0 if download['success'] and not report['server']['misses'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+"""
+Local fixture server for the MangaPark scraper
+
+Replays a title page, its chapter pages (including the JavaScript reader
+and its lazy-loaded images) and the page images over plain HTTP with
+adjustable latency, so MangaScraper runs without the network. Fixtures
+are either a HAR recording of the real site or a generated synthetic set
+that mirrors the markup the scraper relies on.
+
+Usage:
+    python benchmarks/scraper_fixtures.py serve                          # synthetic fixtures
+    python benchmarks/scraper_fixtures.py serve --har title.har --latency-ms 80
+    python benchmarks/scraper_fixtures.py record https://mangapark.net/title/224523-en-solo-necromancer \\
+        --out title.har --chapters 2
+
+Every recorded origin is replayed from the one local server: the site
+root at "/", other hosts (image CDNs) under "/_origin/<n>/". Absolute URLs
+inside HTML, scripts and JSON are rewritten to match. Point the scraper
+at the server with MangaScraper(base_url=server.url) or MANGAPARK_BASE_URL.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import uvicorn  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+SYNTHETIC_ORIGIN = "https://mangapark.net"
+SYNTHETIC_IMAGE_ORIGIN = "https://xfs-fixtures.mpqsc.org"
+SYNTHETIC_TITLE_PATH = "/title/100001-en-fixture-chronicles"
+
+# Bodies of these types have absolute URLs rewritten to the local server
+TEXT_TYPES = ("text/", "javascript", "json", "xml")
+
+TITLE_PATH_PATTERN = re.compile(r'^/title/\d+-en-[^/]+/?$')
+
+
+@dataclass
+class Fixture:
+    status: int
+    content_type: str
+    body: bytes
+
+
+class FixtureSet:
+    """Recorded responses keyed by origin and path (with query string)"""
+
+    def __init__(self, origins: List[str]):
+        """
+        Args:
+            origins: Scheme and host of every recorded site, the scraped site first
+        """
+        self.origins = origins
+        self.fixtures: Dict[Tuple[str, str], Fixture] = {}
+        self.title_path: Optional[str] = None
+
+    def add(self, url: str, status: int, content_type: str, body: bytes):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.origins:
+            self.origins.append(origin)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        self.fixtures[(origin, path)] = Fixture(status, content_type, body)
+        if self.title_path is None and origin == self.origins[0] and TITLE_PATH_PATTERN.match(parts.path):
+            self.title_path = parts.path
+
+    def local_prefix(self, origin: str, base_url: str) -> str:
+        index = self.origins.index(origin)
+        return base_url if index == 0 else f"{base_url}/_origin/{index}"
+
+    def rewrite(self, body: bytes, base_url: str) -> bytes:
+        """Point absolute URLs of every recorded origin at the local server"""
+        # Longest first so one origin never rewrites part of another
+        for origin in sorted(self.origins, key=len, reverse=True):
+            local = self.local_prefix(origin, base_url).encode()
+            body = body.replace(origin.encode(), local)
+            # JSON payloads often escape slashes
+            body = body.replace(origin.replace('/', '\\/').encode(), local.replace(b'/', b'\\/'))
+        return body
+
+    def lookup(self, path: str) -> Optional[Tuple[str, Fixture]]:
+        origin = self.origins[0]
+        match = re.match(r'^/_origin/(\d+)(/.*)$', path.split('?')[0])
+        if match and int(match.group(1)) < len(self.origins):
+            origin = self.origins[int(match.group(1))]
+            path = path[len(f"/_origin/{match.group(1)}"):]
+        fixture = self.fixtures.get((origin, path))
+        return (origin, fixture) if fixture else None
+
+
+# ============= Fixture Sources =============
+
+def load_har(path: Path) -> FixtureSet:
+    """
+    Fixtures from a HAR file (Playwright, or a browser's "Save all as HAR with content")
+
+    The first document request is taken as the scraped site.
+    """
+    entries = json.loads(Path(path).read_text())['log']['entries']
+    documents = [e for e in entries if 'html' in e['response']['content'].get('mimeType', '')]
+    first = urlsplit((documents or entries)[0]['request']['url'])
+    fixtures = FixtureSet([f"{first.scheme}://{first.netloc}"])
+
+    for entry in entries:
+        request, response = entry['request'], entry['response']
+        content = response.get('content', {})
+        if request.get('method', 'GET') != 'GET' or response.get('status', 0) <= 0:
+            continue
+        text = content.get('text') or ''
+        body = base64.b64decode(text) if content.get('encoding') == 'base64' else text.encode()
+        content_type = content.get('mimeType') or 'application/octet-stream'
+        fixtures.add(request['url'], response['status'], content_type, body)
+    return fixtures
+
+
+def synthetic_image(rng: random.Random, image_bytes: int) -> bytes:
+    """A noise JPEG of roughly image_bytes (noise barely compresses)"""
+    from PIL import Image
+
+    width = 800
+    height = max(16, int(image_bytes / width / 0.8))
+    image = Image.frombytes('L', (width, height), rng.randbytes(width * height))
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+
+def synthetic_fixtures(chapters: int = 3, pages: int = 12, image_bytes: int = 150000,
+                       distinct_images: int = 8, seed: int = 1) -> FixtureSet:
+    """
+    A title page and chapters with the markup MangaScraper parses
+
+    Chapter pages embed the page list as JSON (the fast path) and build
+    the reader with a script: <img id="p-N"> elements whose src is only
+    set once they scroll near the viewport, like the real lazy reader.
+    """
+    rng = random.Random(seed)
+    fixtures = FixtureSet([SYNTHETIC_ORIGIN, SYNTHETIC_IMAGE_ORIGIN])
+    images = [synthetic_image(rng, image_bytes) for _ in range(max(1, distinct_images))]
+
+    links = []
+    for number in range(1, chapters + 1):
+        chapter_id = 2000000 + number
+        chapter_path = f"{SYNTHETIC_TITLE_PATH}/{chapter_id}-ch-{number}"
+        links.append(f'<a class="link-hover link-primary visited:text-accent" href="{chapter_path}">Ch.{number}</a>')
+
+        urls = []
+        for page in range(1, pages + 1):
+            url = f"{SYNTHETIC_IMAGE_ORIGIN}/media/mpup/{chapter_id}/{page:03d}_{rng.getrandbits(32):08x}.jpg"
+            fixtures.add(url, 200, "image/jpeg", images[(number * pages + page) % len(images)])
+            urls.append(url)
+        fixtures.add(SYNTHETIC_ORIGIN + chapter_path, 200, "text/html; charset=utf-8",
+                     chapter_html(number, urls).encode())
+
+    title = f"""<!DOCTYPE html>
+<html><head><title>Fixture Chronicles</title></head>
+<body>
+<h3><a class="link link-hover" href="{SYNTHETIC_TITLE_PATH}">Fixture Chronicles</a></h3>
+<div class="chapter-list">
+{chr(10).join(reversed(links))}
+</div>
+</body></html>"""
+    fixtures.add(SYNTHETIC_ORIGIN + SYNTHETIC_TITLE_PATH, 200, "text/html; charset=utf-8", title.encode())
+    return fixtures
+
+
+def chapter_html(number: int, image_urls: List[str]) -> str:
+    state = json.dumps({"chapter": number, "images": image_urls}).replace('/', '\\/')
+    return f"""<!DOCTYPE html>
+<html><head><title>Chapter {number}</title>
+<style>#viewer img {{ display: block; width: 800px; height: 1200px; }}</style>
+</head>
+<body>
+<div id="viewer" class="reader"></div>
+<script>window.__READER_STATE__ = {state};</script>
+<script>
+(function () {{
+  // Rendered after a short delay and loaded lazily, like the real reader
+  setTimeout(function () {{
+    var viewer = document.getElementById('viewer');
+    window.__READER_STATE__.images.forEach(function (url, i) {{
+      var img = document.createElement('img');
+      img.id = 'p-' + (i + 1);
+      img.setAttribute('data-src', url);
+      viewer.appendChild(img);
+    }});
+    function reveal() {{
+      document.querySelectorAll('#viewer img[data-src]').forEach(function (img) {{
+        if (img.getBoundingClientRect().top < window.innerHeight * 1.5) {{
+          img.src = img.getAttribute('data-src');
+          img.removeAttribute('data-src');
+        }}
+      }});
+    }}
+    window.addEventListener('scroll', reveal, {{passive: true}});
+    reveal();
+  }}, 200);
+}})();
+</script>
+</body></html>"""
+
+
+# ============= Server =============
+
+class FixtureServer:
+    """Serves a FixtureSet from a background thread, usable from sync and async code"""
+
+    def __init__(self, fixtures: FixtureSet, latency_ms: float = 0.0, image_latency_ms: Optional[float] = None,
+                 jitter_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            fixtures: Responses to replay
+            latency_ms: Delay before every document response
+            image_latency_ms: Delay before image responses (defaults to latency_ms)
+            jitter_ms: Random extra delay of up to this much per response
+            host: Interface to listen on
+            port: Port to listen on, 0 picks a free one
+        """
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.image_latency_ms = latency_ms if image_latency_ms is None else image_latency_ms
+        self.jitter_ms = jitter_ms
+        self.host = host
+        self.port = port
+
+        self.requests = 0
+        self.misses: List[str] = []
+        self.bytes_sent = 0
+
+        self._socket: Optional[socket.socket] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self._rewritten: Dict[Tuple[str, str], bytes] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def title_url(self) -> Optional[str]:
+        return self.url + self.fixtures.title_path if self.fixtures.title_path else None
+
+    def _body(self, key: Tuple[str, str], fixture: Fixture) -> bytes:
+        if not any(kind in fixture.content_type for kind in TEXT_TYPES):
+            return fixture.body
+        if key not in self._rewritten:
+            self._rewritten[key] = self.fixtures.rewrite(fixture.body, self.url)
+        return self._rewritten[key]
+
+    async def app(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        request = Request(scope, receive)
+        path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        self.requests += 1
+
+        found = self.fixtures.lookup(path)
+        if found is None:
+            self.misses.append(path)
+            response = Response(b"not recorded", status_code=404, media_type="text/plain")
+        else:
+            origin, fixture = found
+            latency = self.image_latency_ms if fixture.content_type.startswith("image/") else self.latency_ms
+            delay = latency + random.uniform(0, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            body = self._body((origin, path), fixture)
+            self.bytes_sent += len(body)
+            response = Response(body, status_code=fixture.status, media_type=fixture.content_type)
+        await response(scope, receive, send)
+
+    def start(self) -> "FixtureServer":
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Accepted connections inherit it; headers and body go out as separate writes
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.bind((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+
+        config = uvicorn.Config(self.app, interface="asgi3", log_level="warning", access_log=False, lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Fixture server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+            self._socket.close()
+            self._server = None
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+# ============= Recording =============
+
+async def record(title_url: str, out_path: Path, chapters: int = 2):
+    """
+    Record a title page and its first chapters into a HAR file
+
+    Chapters are opened in Chromium and scrolled the way the scraper does,
+    so the reader's scripts and lazy-loaded images are captured as well.
+    """
+    from playwright.async_api import async_playwright
+
+    from mangapark_scraper import MangaScraper
+
+    parts = urlsplit(title_url)
+    async with MangaScraper(download_dir="/tmp/scraper-recording",
+                            base_url=f"{parts.scheme}://{parts.netloc}") as scraper:
+        chapter_list = (await asyncio.to_thread(scraper.get_chapters, title_url))[:chapters]
+
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(headless=True)
+            context = await browser.new_context(record_har_path=str(out_path), record_har_content="embed",
+                                                user_agent=scraper.HEADERS['User-Agent'])
+            page = await context.new_page()
+            await page.goto(title_url, wait_until='domcontentloaded')
+            for chapter in chapter_list:
+                await scraper._load_all_pages(page, chapter['url'])
+            await context.close()
+            await browser.close()
+
+    print(f"Recorded {title_url} and {len(chapter_list)} chapters to {out_path}")
+
+
+def add_fixture_arguments(parser: argparse.ArgumentParser):
+    """Fixture and latency options shared with the scraper benchmark"""
+    parser.add_argument("--har", type=Path, default=None, help="Replay this recording instead of synthetic pages")
+    parser.add_argument("--chapters", type=int, default=3, help="Synthetic chapters")
+    parser.add_argument("--pages", type=int, default=12, help="Synthetic pages per chapter")
+    parser.add_argument("--image-bytes", type=int, default=150000, help="Approximate size of synthetic images")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before each page response")
+    parser.add_argument("--image-latency-ms", type=float, default=None, help="Delay before each image response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay per response")
+
+
+def fixtures_from_args(args) -> FixtureSet:
+    if args.har:
+        return load_har(args.har)
+    return synthetic_fixtures(args.chapters, args.pages, args.image_bytes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay MangaPark pages locally")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve fixtures until interrupted")
+    add_fixture_arguments(serve)
+    serve.add_argument("--port", type=int, default=8765)
+
+    recorder = commands.add_parser("record", help="Record a title and its chapters to a HAR file")
+    recorder.add_argument("title_url")
+    recorder.add_argument("--out", type=Path, required=True, help="HAR file to write")
+    recorder.add_argument("--chapters", type=int, default=2, help="Chapters to record")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(record(args.title_url, args.out, args.chapters))
+        return 0
+
+    server = FixtureServer(fixtures_from_args(args), args.latency_ms, args.image_latency_ms,
+                           args.jitter_ms, port=args.port)
+    with server:
+        print(f"Serving {len(server.fixtures.fixtures)} fixtures at {server.url}")
+        if server.title_url:
+            print(f"Title page: {server.title_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
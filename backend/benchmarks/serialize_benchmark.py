@@ -0,0 +1,208 @@
+"""
+Benchmark for the /api/manga response path
+
+Measures the CPU spent turning one page of manga documents into the
+response body, comparing the previous path (ISO string dates parsed per
+row, a url_for lookup per cover URL, every row validated through the
+response_model, then JSON encoded) with the current one (native datetimes
+shaped by serialize_manga with per-request URL templates and encoded
+directly with orjson). Both outputs are checked to be identical.
+
+Usage:
+    python benchmarks/serialize_benchmark.py
+    python benchmarks/serialize_benchmark.py --limit 50 --repeat 2000 --json results.json
+
+The database round trip is not included, only the per-request CPU work
+that runs after the documents arrive.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; the client never connects here
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+from fastapi import Request  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+from covers import COVER_DEFAULT_WIDTH  # noqa: E402
+
+
+# ============= Reference Implementation =============
+
+MANGA_LIST_ADAPTER = TypeAdapter(List[server.Manga])
+
+
+def legacy_serialize_manga(manga: dict, request: Request) -> dict:
+    """serialize_manga as it was while dates were stored as ISO strings"""
+    manga = dict(manga)
+    cover = manga.pop('cover', None)
+    original_url = str(request.url_for("get_manga_cover", manga_id=manga['id']))
+
+    if cover:
+        sizes = {str(v['width']): str(request.url_for("get_cover", digest=v['hash'])) for v in cover['variants']}
+        manga['coverSizes'] = sizes
+        manga['coverImage'] = sizes.get(str(COVER_DEFAULT_WIDTH)) or original_url
+    else:
+        manga['coverSizes'] = {}
+        manga['coverImage'] = original_url
+    manga.pop('coverOriginal', None)
+
+    for field in ('createdAt', 'latestChapterAt'):
+        if isinstance(manga.get(field), str):
+            manga[field] = datetime.fromisoformat(manga[field])
+
+    return manga
+
+
+def legacy_render(docs: List[dict], request: Request) -> bytes:
+    """Route result validated and encoded the way FastAPI does for response_model=List[Manga]"""
+    content = [legacy_serialize_manga(manga, request) for manga in docs]
+    content = MANGA_LIST_ADAPTER.dump_python(MANGA_LIST_ADAPTER.validate_python(content), mode="json")
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_render(docs: List[dict], request: Request) -> bytes:
+    return server.render_json([server.serialize_manga(manga, request) for manga in docs])
+
+
+# ============= Dataset =============
+
+def synthetic_manga(rng: random.Random, count: int) -> List[dict]:
+    """Documents as the list projection returns them, with native datetimes"""
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(count):
+        # BSON dates have millisecond precision
+        created = start + timedelta(milliseconds=rng.randrange(10 ** 10))
+        chapters = rng.randint(0, 300)
+        doc = {
+            "id": f"{i:08d}-0000-4000-8000-{rng.randrange(16 ** 12):012x}",
+            "title": f"Manga {i} " + "".join(rng.choice("abcdefghij ") for _ in range(rng.randint(5, 40))),
+            "description": "Lorem ipsum dolor sit amet. " * rng.randint(2, 12),
+            "author": f"Author {rng.randint(1, 500)}",
+            "genres": rng.sample(["Action", "Drama", "Comedy", "Fantasy", "Romance", "Horror", "Sci-Fi"], 3),
+            "status": rng.choice(["Ongoing", "Completed"]),
+            "createdAt": created,
+            "totalChapters": chapters,
+            "totalPages": chapters * rng.randint(15, 40),
+            "cover": {"variants": [
+                {"width": width, "hash": f"{rng.randrange(16 ** 64):064x}"} for width in (160, 320, 640)
+            ]},
+        }
+        if chapters:
+            doc["latestChapterNumber"] = float(chapters)
+            doc["latestChapterAt"] = created + timedelta(milliseconds=rng.randrange(10 ** 9))
+        docs.append(doc)
+    return docs
+
+
+def as_legacy(docs: List[dict]) -> List[dict]:
+    """The same documents with dates stored as ISO strings, as before the migration"""
+    legacy = []
+    for doc in docs:
+        doc = dict(doc)
+        for field in ('createdAt', 'latestChapterAt'):
+            if field in doc:
+                doc[field] = doc[field].isoformat()
+        legacy.append(doc)
+    return legacy
+
+
+def make_request() -> Request:
+    return Request({
+        "type": "http",
+        "app": server.app,
+        "router": server.app.router,
+        "scheme": "https",
+        "server": ("redmanga.example", 443),
+        "root_path": "",
+        "path": "/api/manga",
+        "query_string": b"limit=50",
+        "headers": [(b"host", b"redmanga.example")],
+    })
+
+
+# ============= Benchmark =============
+
+def time_render(render: Callable, docs: List[dict], repeat: int) -> List[float]:
+    """CPU seconds of each run, each with a fresh request like a real one"""
+    samples = []
+    for _ in range(repeat):
+        request = make_request()
+        started = time.process_time_ns()
+        render(docs, request)
+        samples.append((time.process_time_ns() - started) / 1e9)
+    return samples
+
+
+def run(limit: int, repeat: int, seed: int) -> Dict:
+    docs = synthetic_manga(random.Random(seed), limit)
+    legacy_docs = as_legacy(docs)
+
+    legacy_body = legacy_render(legacy_docs, make_request())
+    fast_body = fast_render(docs, make_request())
+
+    # Warm up both paths before timing
+    time_render(legacy_render, legacy_docs, max(1, repeat // 10))
+    time_render(fast_render, docs, max(1, repeat // 10))
+
+    legacy = time_render(legacy_render, legacy_docs, repeat)
+    fast = time_render(fast_render, docs, repeat)
+
+    legacy_us = statistics.median(legacy) * 1e6
+    fast_us = statistics.median(fast) * 1e6
+    return {
+        "limit": limit,
+        "repeat": repeat,
+        "bytes": len(fast_body),
+        "identical_bytes": legacy_body == fast_body,
+        "identical_json": json.loads(legacy_body) == json.loads(fast_body),
+        "legacy_cpu_us": round(legacy_us, 1),
+        "fast_cpu_us": round(fast_us, 1),
+        "legacy_cpu_p95_us": round(statistics.quantiles(legacy, n=20)[-1] * 1e6, 1),
+        "fast_cpu_p95_us": round(statistics.quantiles(fast, n=20)[-1] * 1e6, 1),
+        "speedup": round(legacy_us / fast_us, 2) if fast_us else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the /api/manga response path")
+    parser.add_argument("--limit", type=int, default=50, help="Manga per page")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timed runs per path")
+    parser.add_argument("--seed", type=int, default=1, help="Dataset seed")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.limit, args.repeat, args.seed)
+
+    print(f"/api/manga?limit={report['limit']}: {report['bytes']} byte body, median of {report['repeat']} runs")
+    print(f"{'path':8} {'CPU us':>9} {'p95 us':>9}")
+    print(f"{'legacy':8} {report['legacy_cpu_us']:9.1f} {report['legacy_cpu_p95_us']:9.1f}")
+    print(f"{'fast':8} {report['fast_cpu_us']:9.1f} {report['fast_cpu_p95_us']:9.1f}")
+    print(f"Speedup {report['speedup']}x, identical bytes: {report['identical_bytes']}, "
+          f"identical JSON: {report['identical_json']}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    return 0 if report['identical_json'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Content-addressed image storage for Red Manga
+Page and cover bytes live in GridFS, keyed by the SHA-256 of their contents,
+so Mongo documents only carry small descriptors instead of base64 payloads
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+import uuid
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+DATA_URL_PATTERN = re.compile(r'^data:(image/[\w.+-]+);base64,', re.I)
+
+# Magic bytes used when an upload is plain base64 without a data URL prefix
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Guess an image MIME type from its leading bytes."""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return 'application/octet-stream'
+
+
+def decode_image_payload(payload: str) -> Tuple[bytes, str]:
+    """
+    Decode a base64 image as sent by the admin UI
+
+    Args:
+        payload: Base64 string, optionally prefixed with a data URL header
+
+    Returns:
+        Tuple of (raw bytes, content type)
+
+    Raises:
+        ValueError: If the payload is not valid base64
+    """
+    content_type = None
+    match = DATA_URL_PATTERN.match(payload)
+    if match:
+        content_type = match.group(1).lower()
+        payload = payload[match.end():]
+
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 image data: {e}")
+
+    if not data:
+        raise ValueError("Empty image data")
+
+    return data, content_type or sniff_content_type(data)
+
+
+class BlobStore:
+    """GridFS bucket addressed by content hash"""
+
+    def __init__(self, db, bucket_name: str,
+                 on_size_change: Optional[Callable[[int], Awaitable]] = None):
+        """
+        Args:
+            db: Motor database handle
+            bucket_name: GridFS bucket name
+            on_size_change: Awaited with the byte delta whenever a blob is stored or deleted
+        """
+        self.db = db
+        self.bucket_name = bucket_name
+        self.files = db[f"{bucket_name}.files"]
+        self.on_size_change = on_size_change
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        # Created on first use, like the Motor client's connection
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self.db, bucket_name=self.bucket_name)
+        return self._bucket
+
+    async def _size_changed(self, delta: int):
+        if self.on_size_change is not None and delta:
+            await self.on_size_change(delta)
+
+    async def put(self, data: bytes, content_type: str) -> Dict:
+        """
+        Store bytes unless an identical blob already exists
+
+        Returns:
+            Descriptor with hash, size and contentType
+        """
+        digest = hashlib.sha256(data).hexdigest()
+
+        existing = await self.files.find_one({"filename": digest}, {"_id": 1})
+        if not existing:
+            await self.bucket.upload_from_stream(
+                digest, data, metadata={"contentType": content_type}
+            )
+            await self._size_changed(len(data))
+
+        return {"hash": digest, "size": len(data), "contentType": content_type}
+
+    async def put_stream(self, chunks: AsyncIterable[bytes], content_type: Optional[str] = None,
+                         max_size: Optional[int] = None) -> Dict:
+        """
+        Store bytes as they arrive, without holding the whole blob in memory
+
+        The stream is written under a temporary name while it is hashed,
+        then renamed to its digest, or dropped if that blob already exists.
+
+        Args:
+            chunks: Async iterable of byte chunks (e.g. a request body)
+            content_type: MIME type, sniffed from the first bytes when None
+            max_size: Reject streams larger than this many bytes
+
+        Returns:
+            Descriptor with hash, size and contentType
+
+        Raises:
+            ValueError: If the stream is empty or larger than max_size
+        """
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+
+        grid_in = self.bucket.open_upload_stream(f"partial-{uuid.uuid4().hex}")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise ValueError(f"Image larger than {max_size} bytes")
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                await grid_in.write(chunk)
+            if not size:
+                raise ValueError("Empty image data")
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        hexdigest = digest.hexdigest()
+        content_type = content_type or sniff_content_type(head)
+
+        if await self.exists(hexdigest):
+            await self.bucket.delete(grid_in._id)
+        else:
+            await self.files.update_one(
+                {"_id": grid_in._id},
+                {"$set": {"filename": hexdigest, "metadata": {"contentType": content_type}}}
+            )
+            await self._size_changed(size)
+
+        return {"hash": hexdigest, "size": size, "contentType": content_type}
+
+    async def exists(self, digest: str) -> bool:
+        return await self.files.find_one({"filename": digest}, {"_id": 1}) is not None
+
+    async def find(self, digests: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up many blobs in one query
+
+        Returns:
+            Dictionary of digest -> descriptor for the digests already stored
+        """
+        found = {}
+        cursor = self.files.find(
+            {"filename": {"$in": list(digests)}},
+            {"_id": 0, "filename": 1, "length": 1, "metadata.contentType": 1}
+        )
+        async for file_doc in cursor:
+            content_type = (file_doc.get("metadata") or {}).get("contentType", "application/octet-stream")
+            found[file_doc["filename"]] = {
+                "hash": file_doc["filename"], "size": file_doc["length"], "contentType": content_type
+            }
+        return found
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        """Read a whole blob into memory, or None if it does not exist."""
+        grid_out = await self.open(digest)
+        if grid_out is None:
+            return None
+        return await grid_out.read()
+
+    async def open(self, digest: str):
+        """Open a blob for reading, or return None if it does not exist."""
+        try:
+            return await self.bucket.open_download_stream_by_name(digest)
+        except NoFile:
+            return None
+
+    @staticmethod
+    async def iter_range(grid_out, start: int = 0,
+                         end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Yield the bytes of an opened blob chunk by chunk
+
+        Args:
+            grid_out: Blob returned by open()
+            start: First byte offset (inclusive)
+            end: Last byte offset (inclusive), defaults to end of blob
+        """
+        if end is None:
+            end = grid_out.length - 1
+
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, digest: str):
+        """Remove every stored copy of a blob."""
+        async for file_doc in self.files.find({"filename": digest}, {"_id": 1, "length": 1}):
+            try:
+                await self.bucket.delete(file_doc["_id"])
+            except NoFile:
+                continue
+            await self._size_changed(-file_doc.get("length", 0))
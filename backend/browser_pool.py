@@ -0,0 +1,147 @@
+"""
+Persistent Chromium pool for the MangaPark scraper
+One browser process is launched lazily and shared; chapters render in
+reusable browser contexts that are recycled after a number of uses or
+as soon as one of their pages crashes
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from metrics import scraper_phase
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """Long-lived headless Chromium with a bounded pool of browser contexts"""
+
+    def __init__(self, max_pages: int = 3, max_context_uses: int = 20,
+                 headless: bool = True, user_agent: Optional[str] = None):
+        """
+        Initialize the pool (Chromium is launched on first use)
+
+        Args:
+            max_pages: Maximum number of pages rendering at the same time
+            max_context_uses: Recycle a context after this many pages
+            headless: Run Chromium without a window
+            user_agent: Optional user agent for every context
+        """
+        self.max_pages = max_pages
+        self.max_context_uses = max_context_uses
+        self.headless = headless
+        self.user_agent = user_agent
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._idle: List[BrowserContext] = []
+        self._uses: Dict[BrowserContext, int] = {}
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._launch_lock = asyncio.Lock()
+
+        self.launches = 0
+        self.recycled_contexts = 0
+
+    async def _ensure_browser(self) -> Browser:
+        """Launch Chromium if it is not running (or was disconnected)."""
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            if self._browser is not None:
+                logger.warning("Chromium disconnected, relaunching")
+                self._idle.clear()
+                self._uses.clear()
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            logger.info("Launching Chromium for browser pool")
+            with scraper_phase("browser_launch"):
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self.launches += 1
+            return self._browser
+
+    async def _acquire_context(self) -> BrowserContext:
+        browser = await self._ensure_browser()
+        while self._idle:
+            context = self._idle.pop()
+            if context.browser is browser:
+                return context
+
+        options = {'user_agent': self.user_agent} if self.user_agent else {}
+        context = await browser.new_context(**options)
+        self._uses[context] = 0
+        return context
+
+    async def _release_context(self, context: BrowserContext, healthy: bool):
+        self._uses[context] = self._uses.get(context, 0) + 1
+
+        if healthy and self._uses[context] < self.max_context_uses and context.browser is self._browser:
+            self._idle.append(context)
+            return
+
+        self._uses.pop(context, None)
+        self.recycled_contexts += 1
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Error closing recycled context: {e}")
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """
+        Borrow a fresh page from a pooled context
+
+        Waits while max_pages pages are already in use. The context is
+        recycled if the page crashes or the caller raises.
+        """
+        async with self._semaphore:
+            context = await self._acquire_context()
+            page = await context.new_page()
+
+            crashed = False
+
+            def on_crash(_):
+                nonlocal crashed
+                crashed = True
+
+            page.on("crash", on_crash)
+
+            healthy = True
+            try:
+                yield page
+            except BaseException:
+                healthy = False
+                raise
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    healthy = False
+                await self._release_context(context, healthy and not crashed)
+
+    async def close(self):
+        """Close every context, the browser and Playwright."""
+        for context in self._idle:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._idle.clear()
+        self._uses.clear()
+
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
@@ -0,0 +1,247 @@
+"""
+Denormalized chapter summary on manga documents for Red Manga
+Each manga carries totalChapters, totalPages, latestChapterNumber and
+latestChapterAt. Chapter writes keep them current with single atomic
+$inc/$max updates instead of recounting, and a periodic reconciliation
+pass corrects any drift. The chapter write and its counter update are two
+operations (no transaction, so standalone mongod keeps working): a crash
+or failed update between them leaves drift for reconciliation to correct
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_DEFAULTS = {
+    "totalChapters": 0,
+    "totalPages": 0,
+    "latestChapterNumber": None,
+    "latestChapterAt": None,
+}
+
+SUMMARY_PROJECTION = {"_id": 0, "id": 1, **{field: 1 for field in SUMMARY_DEFAULTS}}
+
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get('CHAPTER_SUMMARY_RECONCILE_SECONDS', 3600))
+
+
+def summary_update(fields: Dict) -> Dict:
+    """$set the given fields, leaving the latest-chapter fields unset rather than null so $max applies cleanly"""
+    update = {}
+    values = {k: v for k, v in fields.items() if v is not None}
+    missing = {k: "" for k, v in fields.items() if v is None}
+    if values:
+        update["$set"] = values
+    if missing:
+        update["$unset"] = missing
+    return update
+
+
+def summary_pipeline(match: Dict) -> List[Dict]:
+    """Aggregation computing the summary of every manga whose chapters match"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$mangaId",
+            "totalChapters": {"$sum": 1},
+            "totalPages": {"$sum": {"$size": {"$ifNull": ["$pages", []]}}},
+            "latestChapterNumber": {"$max": "$chapterNumber"},
+            "latestChapterAt": {"$max": "$createdAt"},
+        }},
+    ]
+
+
+async def record_chapter_added(db, manga_id: str, chapter_number: float, created_at, page_count: int):
+    """Count a newly inserted chapter in one atomic update."""
+    await record_chapters_added(db, manga_id, 1, page_count, chapter_number, created_at)
+
+
+async def record_chapters_added(db, manga_id: str, chapter_count: int, page_delta: int,
+                                latest_number: Optional[float], created_at):
+    """
+    Count a batch of chapters written to one manga (e.g. by an import) in one atomic update
+
+    Args:
+        db: Motor database handle
+        manga_id: Manga the chapters belong to
+        chapter_count: Chapters inserted
+        page_delta: Pages added, including page count changes of rewritten chapters
+        latest_number: Highest number among the inserted chapters
+        created_at: Creation date of the inserted chapters
+    """
+    update = {}
+    if chapter_count or page_delta:
+        update["$inc"] = {"totalChapters": chapter_count, "totalPages": page_delta}
+    if chapter_count:
+        update["$max"] = {"latestChapterNumber": latest_number, "latestChapterAt": created_at}
+    if update:
+        await db.manga.update_one({"id": manga_id}, update)
+
+
+async def record_chapter_changed(db, manga_id: str, old_number: float, new_number: float, page_delta: int):
+    """Apply an edited chapter's new number and page count."""
+    update = {}
+    if page_delta:
+        update["$inc"] = {"totalPages": page_delta}
+    if new_number > old_number:
+        update["$max"] = {"latestChapterNumber": new_number}
+    if update:
+        await db.manga.update_one({"id": manga_id}, update)
+    if new_number < old_number:
+        # The chapter may have been the latest one
+        await refresh_latest(db, [manga_id])
+
+
+def removal_counts(chapters: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Chapters and pages per manga for chapter documents that were deleted
+
+    Counted from the documents a delete returned, so concurrent deletes of
+    the same chapters only subtract them once.
+
+    Args:
+        chapters: Deleted chapter documents with mangaId and pages
+
+    Returns:
+        Dictionary of manga id -> {"totalChapters", "totalPages"}
+    """
+    counts = {}
+    for chapter in chapters:
+        c = counts.setdefault(chapter['mangaId'], {"totalChapters": 0, "totalPages": 0})
+        c['totalChapters'] += 1
+        c['totalPages'] += len(chapter.get('pages', []))
+    return counts
+
+
+async def record_chapters_removed(db, counts: Dict[str, Dict]):
+    """
+    Subtract deleted chapters from their manga and refresh the latest chapter
+
+    Args:
+        db: Motor database handle
+        counts: Result of removal_counts() for the deleted chapters
+    """
+    if not counts:
+        return
+
+    await db.manga.bulk_write([
+        UpdateOne({"id": manga_id}, {"$inc": {
+            "totalChapters": -c['totalChapters'],
+            "totalPages": -c['totalPages'],
+        }})
+        for manga_id, c in counts.items()
+    ], ordered=False)
+
+    # $max cannot move backwards, so the latest chapter is recomputed
+    await refresh_latest(db, counts.keys())
+
+
+async def refresh_latest(db, manga_ids: Iterable[str]):
+    """Recompute latestChapterNumber/latestChapterAt with one grouped aggregation."""
+    manga_ids = list(manga_ids)
+    if not manga_ids:
+        return
+
+    latest = {manga_id: {"latestChapterNumber": None, "latestChapterAt": None} for manga_id in manga_ids}
+    async for row in db.chapters.aggregate(summary_pipeline({"mangaId": {"$in": manga_ids}})):
+        latest[row['_id']] = {
+            "latestChapterNumber": row['latestChapterNumber'],
+            "latestChapterAt": row['latestChapterAt'],
+        }
+
+    await db.manga.bulk_write([
+        UpdateOne({"id": manga_id}, summary_update(fields)) for manga_id, fields in latest.items()
+    ], ordered=False)
+
+
+async def reconcile_chapter_summaries(db) -> List[str]:
+    """
+    Recompute every manga's summary from the chapters and fix any drift
+
+    Returns:
+        Ids of the manga that were corrected
+    """
+    actual = {}
+    async for row in db.chapters.aggregate(summary_pipeline({})):
+        actual[row.pop('_id')] = row
+
+    # Chapters written between the aggregation and this read look like drift,
+    # so every candidate is checked again on its own before it is corrected
+    candidates = []
+    async for manga in db.manga.find({}, SUMMARY_PROJECTION):
+        expected = actual.get(manga['id'], SUMMARY_DEFAULTS)
+        if any(manga.get(field) != expected[field] for field in SUMMARY_DEFAULTS):
+            candidates.append(manga['id'])
+
+    fixed_ids = []
+    for manga_id in candidates:
+        if await reconcile_manga(db, manga_id):
+            fixed_ids.append(manga_id)
+    return fixed_ids
+
+
+async def reconcile_manga(db, manga_id: str) -> bool:
+    """
+    Recount one manga's chapters and correct its summary if it drifted
+
+    The manga is read before its chapters are counted and only updated if
+    it still holds the values read, so a chapter write whose counter update
+    lands in between is not overwritten by a stale count. A chapter inserted
+    before the count whose counter update lands after the correction is
+    still counted twice, until the next pass.
+
+    Returns:
+        True if the summary was corrected
+    """
+    manga = await db.manga.find_one({"id": manga_id}, SUMMARY_PROJECTION)
+    if manga is None:
+        return False
+
+    expected = SUMMARY_DEFAULTS
+    async for row in db.chapters.aggregate(summary_pipeline({"mangaId": manga_id})):
+        row.pop('_id')
+        expected = row
+
+    drift = {field: expected[field] for field in SUMMARY_DEFAULTS if manga.get(field) != expected[field]}
+    if not drift:
+        return False
+
+    observed = {field: manga.get(field) for field in SUMMARY_DEFAULTS}
+    result = await db.manga.update_one({"id": manga_id, **observed}, summary_update(drift))
+    if not result.matched_count:
+        logger.info(f"Chapter summary of manga {manga_id} changed while it was reconciled, left for the next pass")
+        return False
+
+    logger.warning(f"Chapter summary drift on manga {manga_id}: {drift}")
+    return True
+
+
+async def run_reconciliation(db, interval: Optional[float] = None,
+                             on_fixed: Optional[Callable[[List[str]], None]] = None,
+                             lease=None):
+    """
+    Background task: reconcile summaries once at startup and then periodically
+
+    Args:
+        db: Motor database handle
+        interval: Seconds between passes, defaults to RECONCILE_INTERVAL_SECONDS
+        on_fixed: Called with the ids of corrected manga (e.g. to drop cached responses)
+        lease: Lease that must be held to run a pass, when several workers share the database
+    """
+    interval = interval or RECONCILE_INTERVAL_SECONDS
+    while True:
+        try:
+            if lease is None or await lease.acquire():
+                fixed = await reconcile_chapter_summaries(db)
+                if fixed and on_fixed is not None:
+                    on_fixed(fixed)
+                logger.info(f"Chapter summary reconciliation fixed {len(fixed)} manga")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Chapter summary reconciliation failed: {e}")
+        await asyncio.sleep(interval)
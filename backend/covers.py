@@ -0,0 +1,90 @@
+"""
+Cover thumbnail pipeline for Red Manga
+Covers are decoded once at upload time and resized into a few fixed widths,
+so list endpoints can link small cacheable thumbnails instead of base64 art
+"""
+
+import asyncio
+import io
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from transcoder import has_alpha
+
+# Card, grid and detail page sizes used by the frontend
+COVER_WIDTHS = (160, 320, 640)
+COVER_DEFAULT_WIDTH = 320
+COVER_QUALITY = 82
+
+THUMBNAIL_FORMAT = ('WEBP', 'image/webp') if features.check('webp') else ('JPEG', 'image/jpeg')
+
+
+def render_cover_variants(data: bytes) -> List[Tuple[int, bytes, str]]:
+    """
+    Resize a cover image into the fixed thumbnail widths
+
+    Args:
+        data: Raw bytes of the uploaded cover
+
+    Returns:
+        List of (width, encoded bytes, content type), narrowest first
+
+    Raises:
+        ValueError: If the bytes are not a readable image (or too large to decode safely)
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid cover image: {e}")
+
+    image_format, content_type = THUMBNAIL_FORMAT
+    # JPEG thumbnails (no WebP encoder) cannot keep transparency
+    mode = 'RGBA' if has_alpha(image) and image_format == 'WEBP' else 'RGB'
+    # Thumbnails are cut in display orientation, the variants carry no EXIF
+    image = ImageOps.exif_transpose(image)
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    save_options = {'quality': COVER_QUALITY}
+    if image_format == 'WEBP':
+        save_options['method'] = 4
+    else:
+        save_options['optimize'] = True
+
+    variants = []
+    for width in COVER_WIDTHS:
+        # Never upscale small covers, reuse the original width instead
+        target_width = min(width, image.width)
+        target_height = max(1, round(image.height * target_width / image.width))
+        resized = image.resize((target_width, target_height), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        resized.save(buffer, format=image_format, **save_options)
+        variants.append((width, buffer.getvalue(), content_type))
+
+    return variants
+
+
+async def store_cover(cover_store, data: bytes, content_type: str) -> Dict:
+    """
+    Render thumbnails off the event loop and store them with the original
+
+    Args:
+        cover_store: BlobStore for cover images
+        data: Raw bytes of the uploaded cover
+        content_type: MIME type of the uploaded cover
+
+    Returns:
+        Cover descriptor with "original" and per-width "variants"
+    """
+    variants = await asyncio.to_thread(render_cover_variants, data)
+
+    original = await cover_store.put(data, content_type)
+    stored_variants = []
+    for width, variant_data, variant_type in variants:
+        descriptor = await cover_store.put(variant_data, variant_type)
+        stored_variants.append({"width": width, **descriptor})
+
+    return {"original": original, "variants": stored_variants}
@@ -0,0 +1,207 @@
+"""
+Async image downloader for the MangaPark scraper
+Pooled HTTP client with bounded parallelism, per-host token buckets for
+politeness, streaming writes to disk, HTTP Range resume of partial files
+and jittered exponential backoff
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiofiles
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; other 4xx responses fail immediately
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and take them."""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class AsyncImageDownloader:
+    """Concurrent, rate-limited image downloads into files"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_concurrency: int = 8,
+                 per_host_rate: float = 4.0, per_host_burst: int = 4, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 15.0, timeout: float = 30.0):
+        """
+        Initialize the downloader (the HTTP client is created on first use)
+
+        Args:
+            headers: Headers sent with every request
+            max_concurrency: Maximum downloads in flight across all hosts
+            per_host_rate: Requests per second allowed for a single host
+            per_host_burst: Requests a host may receive back to back
+            max_retries: Retries after the first failed attempt
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound for a single backoff delay
+            timeout: Per-request timeout in seconds
+        """
+        self.headers = headers or {}
+        self.max_concurrency = max_concurrency
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.per_host_rate, self.per_host_burst)
+        return self._buckets[host]
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _hash_file(self, path: Path, digest) -> int:
+        """Feed an existing file into a running hash, returning its size."""
+        size = 0
+        async with aiofiles.open(path, 'rb') as f:
+            while True:
+                chunk = await f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return size
+                digest.update(chunk)
+                size += len(chunk)
+
+    async def download(self, url: str, output_path: Path) -> Optional[Dict]:
+        """
+        Download a single image, streaming it to disk
+
+        Bytes are written to "<name>.part" and renamed when complete. A
+        leftover .part file from an interrupted run is resumed with an
+        HTTP Range request when the server supports it.
+
+        Args:
+            url: URL of the image
+            output_path: Path to save the image
+
+        Returns:
+            Dictionary with size and sha256 if successful, None otherwise
+        """
+        client = self.client
+        partial_path = output_path.with_name(output_path.name + '.part')
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._bucket(url).acquire()
+                retry_after = None
+                offset = partial_path.stat().st_size if partial_path.exists() else 0
+                request_headers = {'Range': f'bytes={offset}-'} if offset else None
+                try:
+                    async with client.stream('GET', url, headers=request_headers) as response:
+                        if response.status_code == 416 and offset:
+                            # Partial file is unusable (e.g. the image changed), start over
+                            partial_path.unlink()
+                            raise httpx.TransportError("Range not satisfiable, restarting download")
+                        if response.status_code in RETRYABLE_STATUS:
+                            retry_after = response.headers.get('retry-after')
+                            raise httpx.HTTPStatusError(
+                                f"HTTP {response.status_code}", request=response.request, response=response
+                            )
+                        response.raise_for_status()
+
+                        digest = hashlib.sha256()
+                        size = 0
+                        resume = bool(offset) and response.status_code == 206
+                        if resume:
+                            size = await self._hash_file(partial_path, digest)
+
+                        async with aiofiles.open(partial_path, 'ab' if resume else 'wb') as f:
+                            async for chunk in response.aiter_bytes(self.CHUNK_SIZE):
+                                digest.update(chunk)
+                                size += len(chunk)
+                                await f.write(chunk)
+
+                    partial_path.replace(output_path)
+                    logger.info(f"Downloaded: {output_path.name}" + (f" (resumed at {offset} bytes)" if resume else ""))
+                    return {'size': size, 'sha256': digest.hexdigest()}
+
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in RETRYABLE_STATUS:
+                        logger.error(f"Error downloading image {url}: {e}")
+                        return None
+                    error = e
+                except (httpx.TransportError, OSError) as e:
+                    error = e
+
+                if attempt < self.max_retries:
+                    delay = self._backoff(attempt, retry_after)
+                    logger.warning(f"Retrying {url} in {delay:.1f}s after error: {error}")
+                    await asyncio.sleep(delay)
+
+        logger.error(f"Error downloading image {url}: {error}")
+        return None
+
+    async def download_all(self, jobs: List[Tuple[str, Path]]) -> List[Optional[Dict]]:
+        """
+        Download many images concurrently
+
+        Args:
+            jobs: List of (image URL, output path)
+
+        Returns:
+            Result of download() for each job, in the same order
+        """
+        return list(await asyncio.gather(*(self.download(url, path) for url, path in jobs)))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
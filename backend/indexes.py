@@ -0,0 +1,275 @@
+"""
+MongoDB index management for Red Manga
+
+Declares every index the API relies on, creates or validates them at
+startup, and checks that each route's query is served by an index.
+
+Usage:
+    python indexes.py            # create indexes and check query plans
+
+Exits with status 1 if any route query falls back to a COLLSCAN, so it
+can be run against a staging database before deploying. The same checks
+run under pytest in tests/test_indexes.py when MONGO_URL is set.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+ROOT_DIR = Path(__file__).parent
+
+logger = logging.getLogger(__name__)
+
+
+# ============= Index Declarations =============
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "manga": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination: one index per sort, id breaks ties
+        IndexModel([("createdAt", DESCENDING), ("id", DESCENDING)], name="createdAt_id"),
+        IndexModel([("title", ASCENDING), ("id", ASCENDING)], name="title_id"),
+        IndexModel([("totalChapters", DESCENDING), ("id", DESCENDING)], name="totalChapters_id"),
+        IndexModel([("latestChapterAt", DESCENDING), ("id", DESCENDING)], name="latestChapterAt_id"),
+        # Reference checks before deleting cover blobs
+        IndexModel([("cover.original.hash", ASCENDING)], name="cover_original_hash"),
+        IndexModel([("cover.variants.hash", ASCENDING)], name="cover_variants_hash"),
+    ],
+    "chapters": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One chapter per manga and number; migrate_storage.py removes duplicates left by older releases
+        IndexModel([("mangaId", ASCENDING), ("chapterNumber", ASCENDING)], name="mangaId_chapterNumber",
+                   unique=True),
+        # Reference checks before deleting page blobs
+        IndexModel([("pages.hash", ASCENDING)], name="pages_hash"),
+        # Uploads-per-day window of the statistics recompute
+        IndexModel([("createdAt", ASCENDING)], name="createdAt"),
+    ],
+    "image_variants": [
+        IndexModel([("store", ASCENDING), ("source", ASCENDING)], name="store_source", unique=True),
+        # Reference checks before deleting transcoded blobs
+        IndexModel([("formats.hash", ASCENDING)], name="formats_hash"),
+    ],
+    "upload_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("updatedAt", ASCENDING)], name="updatedAt"),
+    ],
+    "upload_pages": [
+        IndexModel([("sessionId", ASCENDING), ("number", ASCENDING)], name="sessionId_number", unique=True),
+        # Reference checks before deleting page blobs
+        IndexModel([("hash", ASCENDING)], name="hash"),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One queued or running import per manga
+        IndexModel([("mangaId", ASCENDING)], name="mangaId_active", unique=True,
+                   partialFilterExpression={"active": True}),
+        IndexModel([("createdAt", DESCENDING)], name="createdAt"),
+    ],
+    "scrape_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Identical requests share one queued or running job
+        IndexModel([("key", ASCENDING)], name="key_active", unique=True,
+                   partialFilterExpression={"active": True}),
+        # Dispatcher: oldest queued job, running jobs per host
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+        IndexModel([("createdAt", DESCENDING)], name="createdAt"),
+    ],
+}
+
+
+# Dates are stored as BSON dates, samples must match that type to pick the same plans
+SAMPLE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Representative query for each route, run through explain() by verify_query_plans
+QUERY_CHECKS = [
+    {"route": "GET /api/manga", "command": {
+        "find": "manga", "filter": {}, "sort": {"createdAt": -1, "id": -1}, "limit": 51}},
+    {"route": "GET /api/manga?cursor=", "command": {
+        "find": "manga",
+        "filter": {"$or": [{"createdAt": {"$lt": SAMPLE_DATE}}, {"createdAt": SAMPLE_DATE, "id": {"$lt": "sample"}},
+                           {"createdAt": None}]},
+        "sort": {"createdAt": -1, "id": -1}, "limit": 51}},
+    {"route": "GET /api/manga?sort=title", "command": {
+        "find": "manga", "filter": {}, "sort": {"title": 1, "id": 1}, "limit": 51}},
+    {"route": "GET /api/manga?sort=totalChapters", "command": {
+        "find": "manga", "filter": {}, "sort": {"totalChapters": -1, "id": -1}, "limit": 51}},
+    {"route": "GET /api/manga?sort=updated", "command": {
+        "find": "manga", "filter": {}, "sort": {"latestChapterAt": -1, "id": -1}, "limit": 51}},
+    {"route": "GET /api/manga/{id}", "command": {
+        "find": "manga", "filter": {"id": "sample"}, "limit": 1}},
+    {"route": "GET /api/manga/{id}/chapters", "command": {
+        "find": "chapters", "filter": {"mangaId": "sample"}, "sort": {"chapterNumber": 1}}},
+    {"route": "GET /api/chapter/{id}", "command": {
+        "find": "chapters", "filter": {"id": "sample"}, "limit": 1}},
+    {"route": "GET /api/featured", "command": {
+        "find": "manga", "filter": {}, "sort": {"createdAt": -1, "id": -1}, "limit": 7}},
+    {"route": "GET /api/search", "command": {
+        "find": "manga", "filter": {"id": {"$in": ["sample", "other"]}}}},
+    {"route": "POST /api/admin/manga/bulk-delete (chapter ids)", "command": {
+        "distinct": "chapters", "key": "id", "query": {"mangaId": {"$in": ["sample", "other"]}}}},
+    {"route": "DELETE /api/admin/chapter/{id} (page references)", "command": {
+        "distinct": "chapters", "key": "pages.hash", "query": {"pages.hash": {"$in": ["sample"]}}}},
+    {"route": "DELETE /api/admin/chapter/{id} (upload session references)", "command": {
+        "distinct": "upload_pages", "key": "hash", "query": {"hash": {"$in": ["sample"]}}}},
+    {"route": "GET /api/admin/chapter-uploads/{id} (received pages)", "command": {
+        "distinct": "upload_pages", "key": "number", "query": {"sessionId": "sample"}}},
+    {"route": "POST /api/admin/chapter-uploads (stale sessions)", "command": {
+        "find": "upload_sessions", "filter": {"updatedAt": {"$lt": SAMPLE_DATE}}}},
+    {"route": "DELETE /api/admin/manga/{id} (cover references)", "command": {
+        "distinct": "manga", "key": "cover.variants.hash", "query": {"cover.variants.hash": {"$in": ["sample"]}}}},
+    {"route": "GET /api/admin/statistics", "command": {
+        "find": "statistics", "filter": {"_id": "site"}, "limit": 1}},
+    {"route": "statistics rankings (top manga)", "command": {
+        "find": "manga", "filter": {}, "sort": {"totalChapters": -1, "id": -1}, "limit": 5}},
+    {"route": "statistics rankings (recent manga)", "command": {
+        "find": "manga", "filter": {}, "sort": {"createdAt": -1, "id": -1}, "limit": 5}},
+    {"route": "GET /api/admin/imports", "command": {
+        "find": "import_jobs", "filter": {}, "sort": {"createdAt": -1}, "limit": 20}},
+    {"route": "GET /api/admin/imports/{id}", "command": {
+        "find": "import_jobs", "filter": {"id": "sample"}, "limit": 1}},
+    {"route": "GET /api/admin/scrape", "command": {
+        "find": "scrape_jobs", "filter": {}, "sort": {"createdAt": -1}, "limit": 20}},
+    {"route": "GET /api/admin/scrape?status=", "command": {
+        "find": "scrape_jobs", "filter": {"status": "queued"}, "sort": {"createdAt": -1}, "limit": 20}},
+    {"route": "GET /api/admin/scrape/{id}", "command": {
+        "find": "scrape_jobs", "filter": {"id": "sample"}, "limit": 1}},
+    {"route": "scrape dispatcher (next queued job)", "command": {
+        "find": "scrape_jobs", "filter": {"status": "queued", "host": {"$nin": ["sample"]}},
+        "sort": {"createdAt": 1}, "limit": 1}},
+    {"route": "scrape dispatcher (running jobs per host)", "command": {
+        "aggregate": "scrape_jobs",
+        "pipeline": [{"$match": {"status": "running"}}, {"$group": {"_id": "$host", "jobs": {"$sum": 1}}}],
+        "cursor": {}}},
+    {"route": "library import (chapter upserts)", "command": {
+        "find": "chapters", "filter": {"mangaId": "sample", "chapterNumber": 1.0}, "limit": 1}},
+    {"route": "statistics recompute (uploads per day)", "command": {
+        "aggregate": "chapters",
+        "pipeline": [{"$match": {"createdAt": {"$gte": SAMPLE_DATE}}},
+                     {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+                                 "n": {"$sum": 1}}}],
+        "cursor": {}}},
+]
+
+
+# ============= Index Management =============
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Create missing indexes and validate the existing ones
+
+    Args:
+        db: Motor database handle
+
+    Returns:
+        Dictionary of collection name -> problems found (empty when healthy)
+    """
+    problems: Dict[str, List[str]] = {}
+
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        issues = []
+
+        try:
+            await collection.create_indexes(models)
+        except OperationFailure as e:
+            # Usually duplicate ids blocking a unique index, or a same-named
+            # index with different options. Keep serving, but report it.
+            issues.append(f"create_indexes failed: {e}")
+
+        existing = await collection.index_information()
+        for model in models:
+            spec = model.document
+            info = existing.get(spec['name'])
+            if info is None:
+                issues.append(f"missing index {spec['name']}")
+            elif dict(info['key']) != dict(spec['key']):
+                issues.append(f"index {spec['name']} has keys {info['key']}, expected {list(spec['key'].items())}")
+            elif bool(info.get('unique')) != bool(spec.get('unique')):
+                issues.append(f"index {spec['name']} unique={info.get('unique', False)}, expected {spec.get('unique', False)}")
+
+        problems[collection_name] = issues
+        for issue in issues:
+            logger.error(f"Index problem on {collection_name}: {issue}")
+
+    return problems
+
+
+def plan_stages(plan) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+async def verify_query_plans(db) -> List[Dict]:
+    """
+    Run explain() on each route query and report the winning plan
+
+    Args:
+        db: Motor database handle
+
+    Returns:
+        List of dictionaries with route, stages and collscan flag
+    """
+    results = []
+    for check in QUERY_CHECKS:
+        explain = await db.command({"explain": check['command'], "verbosity": "queryPlanner"})
+
+        # Aggregations nest the planner output under their first stage
+        planner = explain.get('queryPlanner')
+        if planner is None:
+            planner = explain.get('stages', [{}])[0].get('$cursor', {}).get('queryPlanner', {})
+
+        stages = plan_stages(planner.get('winningPlan', {}))
+        results.append({
+            'route': check['route'],
+            'stages': stages,
+            'collscan': 'COLLSCAN' in stages,
+        })
+    return results
+
+
+async def main() -> int:
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        problems = await ensure_indexes(db)
+        results = await verify_query_plans(db)
+    finally:
+        client.close()
+
+    failed = False
+    for collection_name, issues in problems.items():
+        for issue in issues:
+            print(f"INDEX  {collection_name}: {issue}")
+            failed = True
+
+    for result in results:
+        status = "COLLSCAN" if result['collscan'] else "ok"
+        print(f"{status:8} {result['route']}: {' <- '.join(result['stages'])}")
+        failed = failed or result['collscan']
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,70 @@
+"""
+Lease locks for Red Manga background jobs
+With several worker processes every one of them runs the lifespan, so
+periodic jobs (chapter summary reconciliation, statistics recompute,
+transcoder backlog scan) take a lease in the `leases` collection first.
+Only the holder runs the job; it renews the lease on every run and the
+other workers take over once it expires
+"""
+
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class Lease:
+    """Time-limited ownership of a named job, shared through MongoDB"""
+
+    def __init__(self, db, name: str, ttl: float):
+        """
+        Args:
+            db: Motor database handle
+            name: Job name, the lease document's _id
+            ttl: Seconds the lease stays valid after each acquire (longer than the job's interval)
+        """
+        self.db = db
+        self.name = name
+        self.ttl = timedelta(seconds=ttl)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+    async def acquire(self) -> bool:
+        """
+        Take or renew the lease
+
+        Returns:
+            True if this process holds the lease until now + ttl
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches when the lease is ours or expired, otherwise the upsert
+            # collides with the holder's document on _id
+            await self.db.leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expiresAt": {"$lte": now}}]},
+                {"$set": {"owner": self.owner, "expiresAt": now + self.ttl, "renewedAt": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            if self.held:
+                logger.warning(f"Lost lease {self.name}")
+            self.held = False
+            return False
+
+        if not self.held:
+            logger.info(f"Acquired lease {self.name} as {self.owner}")
+        self.held = True
+        return True
+
+    async def release(self):
+        """Give the lease up so another worker can take over without waiting for it to expire."""
+        if self.held:
+            await self.db.leases.delete_one({"_id": self.name, "owner": self.owner})
+            self.held = False
@@ -0,0 +1,634 @@
+"""
+Bulk import of scraper downloads for Red Manga
+Reads a MangaScraper download tree (<manga>/chapter_<n>/page_XXX.* with
+the manifest.json written by download_chapter) or a zip/tar archive of
+one, streams the pages into the page store and writes the chapters with
+unordered bulk_write upserts keyed by manga and chapter number. Pages the
+store already holds are not read again and unchanged chapters are not
+rewritten, so re-running an import only writes what changed. Progress is
+kept on a job document in the `import_jobs` collection
+
+Usage:
+    python library_import.py downloads/one_piece --manga-id <id>
+    python library_import.py one_piece.zip --manga-id <id>
+
+The command line writes to MONGO_URL directly and transcodes the pages
+it stored before exiting (--skip-transcode leaves them to the server's
+backlog scan on its next start). Cached responses of the server pick the
+new chapters up within their TTL.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import shutil
+import stat
+import sys
+import tarfile
+import tempfile
+import uuid
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiofiles
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from blob_store import BlobStore
+from chapter_summary import record_chapters_added
+from site_statistics import record_chapters_uploaded
+from transcoder import Transcoder
+
+logger = logging.getLogger(__name__)
+
+# As written by MangaScraper.download_chapter
+MANIFEST_NAME = "manifest.json"
+
+CHAPTER_DIR_PATTERN = re.compile(r'^chapter_(\d+(?:\.\d+)?)$')
+PAGE_FILE_PATTERN = re.compile(r'^page_(\d+)\.(?:jpe?g|png|gif|webp|avif)$', re.I)
+
+# Chapters written per bulk_write (and per progress update), pages stored at once
+CHAPTER_BATCH_SIZE = 25
+PAGE_CONCURRENCY = 8
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Server error code of a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Errors kept on a job document
+MAX_JOB_ERRORS = 50
+
+# A queued or running job not updated for this long belonged to a worker that died;
+# running jobs are touched every HEARTBEAT_SECONDS, however long a batch takes
+STALE_JOB_SECONDS = 900
+HEARTBEAT_SECONDS = 60
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+# ============= Sources =============
+
+def chapter_directories(root: Path) -> List[Path]:
+    """
+    chapter_<n> directories of the one manga in a download tree
+
+    The tree may be the manga directory itself, or a directory (such as
+    downloads/ or an extracted archive) holding it up to two levels down.
+
+    Raises:
+        ValueError: If no manga or more than one manga is found
+    """
+    parents = {}
+    for pattern in ("chapter_*", "*/chapter_*", "*/*/chapter_*"):
+        for path in root.glob(pattern):
+            if path.is_dir() and CHAPTER_DIR_PATTERN.match(path.name):
+                parents.setdefault(path.parent, []).append(path)
+        if parents:
+            break
+
+    if not parents:
+        raise ValueError("No chapter_<n> directories found in the import source")
+    if len(parents) > 1:
+        names = sorted(str(parent.relative_to(root)) for parent in parents)
+        raise ValueError(f"The import source holds several manga ({', '.join(names)}), import them one at a time")
+    return next(iter(parents.values()))
+
+
+def scan_chapter(chapter_dir: Path) -> Dict:
+    """
+    Pages of one downloaded chapter, in reading order
+
+    Uses the manifest when there is one (its sha256 lets stored pages be
+    skipped without reading them), otherwise the page_XXX files.
+
+    Returns:
+        Dictionary with number, directory name, pages (path, sha256) and,
+        when the chapter cannot be imported, the reason in 'skip'
+    """
+    number = float(CHAPTER_DIR_PATTERN.match(chapter_dir.name).group(1))
+    chapter = {"number": number, "name": chapter_dir.name, "pages": [], "skip": None}
+
+    manifest = {}
+    manifest_path = chapter_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+
+    if manifest:
+        if not manifest.get('complete'):
+            chapter['skip'] = "download incomplete"
+            return chapter
+        try:
+            chapter['number'] = float(manifest.get('chapter_number', number))
+        except ValueError:
+            pass
+        entries = sorted(manifest.get('pages', []), key=lambda entry: entry['index'])
+        chapter['pages'] = [{"path": chapter_dir / entry['file'], "sha256": entry.get('sha256')}
+                            for entry in entries]
+    else:
+        files = [(int(match.group(1)), path) for path in chapter_dir.iterdir()
+                 if (match := PAGE_FILE_PATTERN.match(path.name))]
+        chapter['pages'] = [{"path": path, "sha256": None} for _, path in sorted(files)]
+
+    # Manifest entries and links must not reach files outside the chapter
+    root = chapter_dir.resolve()
+    if not chapter['pages']:
+        chapter['skip'] = "no pages"
+    elif any(not page['path'].resolve().is_relative_to(root) for page in chapter['pages']):
+        chapter['skip'] = "page path outside the chapter directory"
+    elif any(not page['path'].is_file() for page in chapter['pages']):
+        chapter['skip'] = "page files missing"
+    return chapter
+
+
+def scan_source(root: Path) -> List[Dict]:
+    """Every chapter of the manga in a download tree, by chapter number"""
+    return sorted((scan_chapter(path) for path in chapter_directories(root)), key=lambda c: c['number'])
+
+
+def check_member_path(name: str):
+    """
+    Refuse an archive member that would land outside the extraction directory
+
+    Raises:
+        ValueError: If the name is absolute or has a .. component
+    """
+    member = Path(name)
+    if member.is_absolute() or '..' in member.parts:
+        raise ValueError(f"Unsafe path in archive: {name}")
+
+
+def extract_archive(archive: Path, target: Path):
+    """
+    Extract a zip or tar archive, refusing members that would land outside target
+
+    Raises:
+        ValueError: If the file is not a supported archive or has unsafe members
+    """
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                check_member_path(info.filename)
+                # Unix mode in the high bits of external_attr
+                if stat.S_ISLNK(info.external_attr >> 16):
+                    raise ValueError(f"Link in archive: {info.filename}")
+            zf.extractall(target)
+    elif tarfile.is_tarfile(archive):
+        try:
+            with tarfile.open(archive) as tf:
+                if hasattr(tarfile, 'data_filter'):
+                    tf.extractall(target, filter='data')
+                else:
+                    # Extraction filters are missing before Python 3.11.4
+                    members = tf.getmembers()
+                    for member in members:
+                        check_member_path(member.name)
+                        if member.issym() or member.islnk():
+                            raise ValueError(f"Link in archive: {member.name}")
+                        if not (member.isfile() or member.isdir()):
+                            raise ValueError(f"Special file in archive: {member.name}")
+                    tf.extractall(target, members)
+        except tarfile.TarError as e:
+            raise ValueError(f"Cannot extract {archive.name}: {e}")
+    else:
+        raise ValueError(f"{archive.name} is not a directory, zip or tar archive")
+
+
+@asynccontextmanager
+async def open_source(source: Path) -> AsyncIterator[Path]:
+    """A download tree as a directory, extracting archives to a temporary one"""
+    if source.is_dir():
+        yield source
+        return
+
+    target = Path(tempfile.mkdtemp(prefix="redmanga-import-"))
+    try:
+        await asyncio.to_thread(extract_archive, source, target)
+        yield target
+    finally:
+        await asyncio.to_thread(shutil.rmtree, target, True)
+
+
+async def read_file(path: Path) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, 'rb') as f:
+        while True:
+            chunk = await f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    async for chunk in read_file(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ============= Importer =============
+
+def empty_progress(chapters: int = 0) -> Dict:
+    return {
+        "chapters": chapters,
+        "imported": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "skipped": 0,
+        "failed": 0,
+        "storedPages": 0,
+        "reusedPages": 0,
+        "storedBytes": 0,
+    }
+
+
+class LibraryImporter:
+    """Writes downloaded chapters into a manga, storing their pages on the way"""
+
+    def __init__(self, db, page_store: BlobStore, max_pages: Optional[int] = None,
+                 max_page_bytes: Optional[int] = None,
+                 on_pages_stored: Optional[Callable[[List[str]], None]] = None,
+                 release_pages: Optional[Callable[[Iterable[str]], Awaitable]] = None,
+                 on_chapters_written: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            db: Motor database handle
+            page_store: Store receiving the page bytes
+            max_pages: Chapters with more pages than this fail, like admin uploads
+            max_page_bytes: Pages larger than this fail
+            on_pages_stored: Called with the page hashes of written chapters (e.g. to queue transcoding)
+            release_pages: Awaited with page hashes chapters stopped referencing, or that
+                were stored for a chapter that failed
+            on_chapters_written: Called with the manga id after each batch (e.g. to drop cached responses)
+        """
+        self.db = db
+        self.page_store = page_store
+        self.max_pages = max_pages
+        self.max_page_bytes = max_page_bytes
+        self.on_pages_stored = on_pages_stored
+        self.release_pages = release_pages
+        self.on_chapters_written = on_chapters_written
+        self._page_slots = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+    async def _release(self, digests: Iterable[str]):
+        digests = list(digests)
+        if digests and self.release_pages is not None:
+            await self.release_pages(digests)
+
+    async def _store_page(self, page: Dict) -> Dict:
+        async with self._page_slots:
+            try:
+                descriptor = await self.page_store.put_stream(read_file(page['path']),
+                                                              max_size=self.max_page_bytes)
+            except ValueError as e:
+                raise ValueError(f"{page['path'].name}: {e}")
+        if not descriptor['contentType'].startswith("image/"):
+            await self._release([descriptor['hash']])
+            raise ValueError(f"{page['path'].name}: not a supported image")
+        return descriptor
+
+    async def hash_chapter_pages(self, chapter: Dict):
+        """Hash pages the manifest has no sha256 for, so stored pages are not uploaded again"""
+        pages = [page for page in chapter['pages'] if not page['sha256']]
+
+        async def hash_page(page: Dict):
+            async with self._page_slots:
+                page['sha256'] = await hash_file(page['path'])
+
+        await asyncio.gather(*(hash_page(page) for page in pages))
+
+    async def store_chapter_pages(self, chapter: Dict, progress: Dict) -> List[Dict]:
+        """
+        Store the pages of a chapter, reusing blobs the store already has
+
+        Raises:
+            ValueError: If a page cannot be stored; pages stored for the chapter are released
+        """
+        pages = chapter['pages']
+        if self.max_pages is not None and len(pages) > self.max_pages:
+            raise ValueError(f"more than {self.max_pages} pages")
+
+        # Pages the store already holds are found in one query and not read again
+        stored = await self.page_store.find({page['sha256'] for page in pages})
+        missing = {page['sha256']: page for page in pages if page['sha256'] not in stored}
+
+        results = await asyncio.gather(*(self._store_page(page) for page in missing.values()),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        written = [result for result in results if not isinstance(result, BaseException)]
+        if errors:
+            await self._release(descriptor['hash'] for descriptor in written)
+            raise errors[0]
+
+        progress['reusedPages'] += len(pages) - len(missing)
+        progress['storedPages'] += len(written)
+        progress['storedBytes'] += sum(descriptor['size'] for descriptor in written)
+
+        # The stored bytes are authoritative should a file not match its manifest hash
+        for expected, descriptor in zip(missing, written):
+            stored[expected] = descriptor
+        return [stored[page['sha256']] for page in pages]
+
+    async def import_chapters(self, manga_id: str, chapters: List[Dict],
+                              on_progress: Optional[Callable[[Dict, List[str]], Awaitable]] = None) -> Dict:
+        """
+        Import scanned chapters into a manga, CHAPTER_BATCH_SIZE chapters per bulk write
+
+        Args:
+            manga_id: Manga receiving the chapters
+            chapters: Result of scan_source()
+            on_progress: Awaited with the progress counters and errors after each batch
+
+        Returns:
+            Final progress counters, with the errors under 'errors'
+        """
+        progress = empty_progress(len(chapters))
+        errors: List[str] = []
+
+        def fail(chapter: Dict, reason, counter: str = "failed"):
+            progress[counter] += 1
+            if len(errors) < MAX_JOB_ERRORS:
+                errors.append(f"{chapter['name']}: {reason}")
+
+        # Page hashes of the chapters already in the manga, by chapter number
+        existing: Dict[float, List[str]] = {}
+        async for doc in self.db.chapters.find({"mangaId": manga_id}, {"_id": 0, "chapterNumber": 1, "pages.hash": 1}):
+            existing[doc['chapterNumber']] = [page['hash'] for page in doc.get('pages', [])]
+
+        for start in range(0, len(chapters), CHAPTER_BATCH_SIZE):
+            chunk = [chapter for chapter in chapters[start:start + CHAPTER_BATCH_SIZE] if not chapter['skip']]
+            for chapter in chapters[start:start + CHAPTER_BATCH_SIZE]:
+                if chapter['skip']:
+                    fail(chapter, chapter['skip'], "skipped")
+            await asyncio.gather(*(self.hash_chapter_pages(chapter) for chapter in chunk))
+
+            batch = []
+            for chapter in chunk:
+                if existing.get(chapter['number']) == [page['sha256'] for page in chapter['pages']]:
+                    progress['unchanged'] += 1
+                else:
+                    batch.append(chapter)
+
+            stored = await asyncio.gather(*(self.store_chapter_pages(chapter, progress) for chapter in batch),
+                                          return_exceptions=True)
+
+            now = datetime.now(timezone.utc)
+            writes = []
+            for chapter, pages in zip(batch, stored):
+                if isinstance(pages, BaseException):
+                    if not isinstance(pages, Exception):
+                        raise pages
+                    fail(chapter, pages)
+                else:
+                    writes.append((chapter, pages))
+
+            if writes:
+                await self._write_batch(manga_id, writes, existing, now, progress, fail)
+            if on_progress is not None:
+                await on_progress(progress, errors)
+
+        return {**progress, "errors": errors}
+
+    async def _write_batch(self, manga_id: str, writes: List, existing: Dict[float, List[str]],
+                           now: datetime, progress: Dict, fail: Callable):
+        """Upsert a batch of chapters and account for what the write changed"""
+        operations = [
+            UpdateOne(
+                {"mangaId": manga_id, "chapterNumber": chapter['number']},
+                {
+                    "$set": {"pages": pages},
+                    # A re-import keeps the id, title and date of a chapter
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "mangaId": manga_id,
+                                     "chapterNumber": chapter['number'], "title": "", "createdAt": now},
+                },
+                upsert=True
+            )
+            for chapter, pages in writes
+        ]
+        try:
+            result = (await self.db.chapters.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+
+        # An upsert racing another writer of the same chapter loses to the unique
+        # index; the chapter exists now, so it is written as an update instead
+        errors = result.get('writeErrors', [])
+        concurrent: Dict[int, List[str]] = {}
+        for error in errors:
+            if error.get('code') != DUPLICATE_KEY_ERROR:
+                continue
+            chapter, pages = writes[error['index']]
+            previous = await self.db.chapters.find_one_and_update(
+                {"mangaId": manga_id, "chapterNumber": chapter['number']},
+                {"$set": {"pages": pages}},
+                projection={"_id": 0, "pages.hash": 1}
+            )
+            if previous is not None:
+                concurrent[error['index']] = [page['hash'] for page in previous.get('pages', [])]
+
+        failed = {
+            error['index']: error.get('errmsg', 'write failed')
+            for error in errors if error['index'] not in concurrent
+        }
+        upserted = {item['index'] for item in result.get('upserted', [])}
+
+        added = page_delta = 0
+        latest = None
+        written_hashes, replaced_hashes, orphaned_hashes = [], [], []
+        for index, (chapter, pages) in enumerate(writes):
+            hashes = [page['hash'] for page in pages]
+            previous = concurrent.get(index, existing.get(chapter['number']))
+            if index in failed:
+                fail(chapter, failed[index])
+                orphaned_hashes.extend(hashes)
+                continue
+
+            written_hashes.extend(hashes)
+            existing[chapter['number']] = hashes
+            if index in upserted:
+                progress['imported'] += 1
+                added += 1
+                page_delta += len(hashes)
+                latest = chapter['number'] if latest is None else max(latest, chapter['number'])
+            elif previous is not None:
+                progress['updated'] += 1
+                page_delta += len(hashes) - len(previous)
+                replaced_hashes.extend(set(previous) - set(hashes))
+            else:
+                # Created by someone else since the scan, reconciliation corrects the counters
+                progress['updated'] += 1
+                logger.warning(f"Chapter {chapter['number']} of manga {manga_id} was written concurrently")
+
+        if self.on_pages_stored is not None and written_hashes:
+            self.on_pages_stored(written_hashes)
+        await self._release(replaced_hashes + orphaned_hashes)
+
+        await record_chapters_added(self.db, manga_id, added, page_delta, latest, now)
+        await record_chapters_uploaded(self.db, now, added, page_delta)
+        if self.on_chapters_written is not None:
+            self.on_chapters_written(manga_id)
+
+    async def import_source(self, manga_id: str, source: Path,
+                            on_progress: Optional[Callable[[Dict, List[str]], Awaitable]] = None) -> Dict:
+        """
+        Import a download tree or archive into a manga
+
+        Raises:
+            ValueError: If the source is not a readable download tree
+        """
+        async with open_source(source) as root:
+            chapters = await asyncio.to_thread(scan_source, root)
+            logger.info(f"Importing {len(chapters)} chapters from {source.name} into manga {manga_id}")
+            return await self.import_chapters(manga_id, chapters, on_progress)
+
+
+# ============= Jobs =============
+
+async def create_import_job(db, manga_id: str, source: str) -> Dict:
+    """
+    Record a queued import
+
+    Raises:
+        ValueError: If an import into the same manga is queued or running
+    """
+    now = datetime.now(timezone.utc)
+
+    # Jobs of workers that died mid-import stop being updated
+    await db.import_jobs.update_many(
+        {"active": True, "updatedAt": {"$lt": now - timedelta(seconds=STALE_JOB_SECONDS)}},
+        {"$set": {"status": "interrupted", "finishedAt": now}, "$unset": {"active": ""}}
+    )
+
+    job = {
+        "id": str(uuid.uuid4()),
+        "mangaId": manga_id,
+        "source": source,
+        "status": "queued",
+        "active": True,
+        "progress": empty_progress(),
+        "errors": [],
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "startedAt": None,
+        "finishedAt": None,
+    }
+    try:
+        await db.import_jobs.insert_one(job)
+    except DuplicateKeyError:
+        raise ValueError("An import into this manga is already running")
+    job.pop('_id', None)
+    return job
+
+
+async def run_import_job(db, importer: LibraryImporter, job: Dict, source: Path) -> Dict:
+    """
+    Run a queued import, keeping its job document current
+
+    Returns:
+        The finished job document
+    """
+    job_filter = {"id": job['id']}
+    now = datetime.now(timezone.utc)
+    await db.import_jobs.update_one(job_filter, {"$set": {"status": "running", "startedAt": now, "updatedAt": now}})
+
+    async def on_progress(progress: Dict, errors: List[str]):
+        await db.import_jobs.update_one(job_filter, {"$set": {
+            "progress": progress, "errors": errors, "updatedAt": datetime.now(timezone.utc)
+        }})
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await db.import_jobs.update_one({**job_filter, "active": True},
+                                                {"$set": {"updatedAt": datetime.now(timezone.utc)}})
+            except PyMongoError as e:
+                logger.warning(f"Import {job['id']} heartbeat failed: {e}")
+
+    beat = asyncio.create_task(heartbeat())
+    update = {}
+    try:
+        result = await importer.import_source(job['mangaId'], source, on_progress)
+        errors = result.pop('errors')
+        update = {"status": "completed", "progress": result, "errors": errors}
+        logger.info(f"Import {job['id']} finished: {result}")
+    except asyncio.CancelledError:
+        # Server shutdown; re-running the import picks up where it stopped
+        update = {"status": "interrupted"}
+        raise
+    except Exception as e:
+        update = {"status": "failed", "error": str(e)}
+        logger.error(f"Import {job['id']} failed: {e}")
+    finally:
+        beat.cancel()
+        now = datetime.now(timezone.utc)
+        await asyncio.shield(db.import_jobs.update_one(
+            job_filter,
+            {"$set": {**update, "finishedAt": now, "updatedAt": now}, "$unset": {"active": ""}}
+        ))
+
+    return await db.import_jobs.find_one(job_filter, {"_id": 0})
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Import a MangaScraper download tree or archive")
+    parser.add_argument("source", type=Path, help="Manga download directory, or a zip/tar archive of one")
+    parser.add_argument("--manga-id", required=True, help="Manga receiving the chapters")
+    parser.add_argument("--skip-transcode", action="store_true", help="Do not transcode the imported pages")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"{args.source} not found")
+        return 1
+
+    # The importer is wired to the server's stores and blob reference checks
+    import server
+
+    server.open_database()
+    # The server's response cache is not reachable from here, its entries expire on their own
+    server.importer.on_chapters_written = None
+    if args.skip_transcode:
+        server.importer.on_pages_stored = None
+    else:
+        # No server transcodes for us: run a transcoder here, unbounded so no page is dropped
+        server.transcoder = Transcoder(server.db, server.transcoder.stores, queue_size=0)
+        server.transcoder.start()
+    try:
+        if not await server.db.manga.find_one({"id": args.manga_id}, {"_id": 1}):
+            print(f"Manga {args.manga_id} not found")
+            return 1
+        job = await create_import_job(server.db, args.manga_id, str(args.source.resolve()))
+        job = await run_import_job(server.db, server.importer, job, args.source)
+        if server.transcoder.enabled and not args.skip_transcode:
+            print("Transcoding the imported pages")
+            await server.transcoder.drain()
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        await server.transcoder.stop()
+        server.client.close()
+
+    progress = job['progress']
+    print(f"{job['status']}: {progress['imported']} imported, {progress['updated']} updated, "
+          f"{progress['unchanged']} unchanged, {progress['skipped']} skipped, {progress['failed']} failed; "
+          f"{progress['storedPages']} pages stored ({progress['storedBytes'] / 2 ** 20:.1f} MiB), "
+          f"{progress['reusedPages']} already stored")
+    for error in job['errors']:
+        print(f"  {error}")
+    if job.get('error'):
+        print(f"  {job['error']}")
+    return 0 if job['status'] == "completed" and not progress['failed'] else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
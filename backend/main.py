@@ -1,12 +1,48 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
 import httpx
-from bs4 import BeautifulSoup
-import re
+from contextlib import asynccontextmanager
 from typing import List
-
-app = FastAPI()
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, PHASE_BUCKETS, REGISTRY, MetricsMiddleware
+from page_extractor import extract_image_urls
+from result_cache import ResultCache
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Extracted chapters, keyed by normalized chapter URL
+chapter_cache = ResultCache(max_entries=512, ttl=15 * 60)
+
+EXTRACT_REQUESTS = REGISTRY.counter(
+    "extract_chapter_requests_total", "extract_chapter requests by outcome (fetched, cached, error)",
+    ("outcome",))
+EXTRACT_FETCH_SECONDS = REGISTRY.histogram(
+    "extract_chapter_fetch_duration_seconds", "Fetch and parse time of chapters not served from the cache",
+    buckets=PHASE_BUCKETS)
+EXTRACT_IMAGES = REGISTRY.counter(
+    "extract_chapter_images_total", "Image URLs extracted from fetched chapters")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for every extraction, so connections and TLS sessions are reused
+    app.state.http_client = httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=30.0,
+        headers=REQUEST_HEADERS,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+    )
+    yield
+    await app.state.http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -17,6 +53,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 
 class ChapterRequest(BaseModel):
     chapter_url: str
@@ -37,61 +75,19 @@ async def extract_chapter(request: ChapterRequest):
     """
     Extract manga page image URLs from a chapter URL.
     Supports common manga reader websites.
+    Results are cached, and concurrent requests for one chapter share a single fetch.
     """
+    fetched = False
+    
+    def load():
+        nonlocal fetched
+        fetched = True
+        return fetch_chapter_images(request.chapter_url)
+    
     try:
-        # Fetch the chapter page
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=30.0,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': request.chapter_url,
-            }
-        ) as client:
-            response = await client.get(request.chapter_url)
-            response.raise_for_status()
-            html_content = response.text
-
-        # Parse HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract image URLs using multiple strategies
-        image_urls = set()
-        
-        # Strategy 1: Find all img tags with common manga reader attributes
-        for img in soup.find_all('img'):
-            src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
-            if src and is_valid_manga_image(src):
-                image_urls.add(normalize_url(src, request.chapter_url))
-        
-        # Strategy 2: Look for common manga reader containers
-        manga_containers = soup.find_all(['div', 'section'], class_=re.compile(r'(page|chapter|manga|reader|viewer|panel)', re.I))
-        for container in manga_containers:
-            for img in container.find_all('img'):
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
-                if src and is_valid_manga_image(src):
-                    image_urls.add(normalize_url(src, request.chapter_url))
-        
-        # Strategy 3: Check for JSON data in script tags (some sites load images via JS)
-        for script in soup.find_all('script'):
-            script_text = script.string or ''
-            # Look for image URLs in JSON or JS arrays
-            urls_in_script = re.findall(r'["\']https?://[^"\s]+\.(?:jpg|jpeg|png|webp|gif)["\']', script_text, re.I)
-            for url_match in urls_in_script:
-                url = url_match.strip('"\'')
-                if is_valid_manga_image(url):
-                    image_urls.add(url)
-        
-        # Convert to sorted list (some sites have numbered filenames)
-        image_urls_list = sorted(list(image_urls))
-        
-        if not image_urls_list:
-            raise HTTPException(
-                status_code=404,
-                detail="No manga page images found. The website might be using dynamic loading or has CORS restrictions. Try entering image URLs manually."
-            )
+        # Failures are not cached, so a chapter without images is retried next time
+        image_urls_list = await chapter_cache.get_or_load(normalize_chapter_url(request.chapter_url), load)
+        EXTRACT_REQUESTS.inc(outcome="fetched" if fetched else "cached")
         
         return ChapterResponse(
             image_urls=image_urls_list,
@@ -99,54 +95,56 @@ async def extract_chapter(request: ChapterRequest):
         )
     
     except httpx.HTTPError as e:
+        EXTRACT_REQUESTS.inc(outcome="error")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch chapter page: {str(e)}. The website might be blocking automated requests."
         )
     except Exception as e:
+        EXTRACT_REQUESTS.inc(outcome="error")
         raise HTTPException(
             status_code=500,
             detail=f"Error extracting manga pages: {str(e)}"
         )
 
 
-def is_valid_manga_image(url: str) -> bool:
-    """Check if URL is likely a manga page image."""
-    if not url:
-        return False
-    
-    # Must be an image file
-    if not re.search(r'\.(jpg|jpeg|png|webp|gif)($|\?)', url, re.I):
-        return False
-    
-    # Exclude common non-manga images
-    exclude_patterns = [
-        r'logo', r'icon', r'avatar', r'banner', r'ad[_-]',
-        r'thumb', r'cover', r'button', r'sprite'
-    ]
-    
-    for pattern in exclude_patterns:
-        if re.search(pattern, url, re.I):
-            return False
-    
-    return True
-
-
-def normalize_url(url: str, base_url: str) -> str:
-    """Normalize relative URLs to absolute URLs."""
-    if url.startswith('http'):
-        return url
-    elif url.startswith('//'):
-        return 'https:' + url
-    elif url.startswith('/'):
-        # Absolute path
-        from urllib.parse import urlparse
-        parsed = urlparse(base_url)
-        return f"{parsed.scheme}://{parsed.netloc}{url}"
-    else:
-        # Relative path
-        from urllib.parse import urljoin
-        return urljoin(base_url, url)
+@app.get("/api/extract-chapter/stats")
+def extract_chapter_stats():
+    """Hit/miss counters of the chapter extraction cache."""
+    return chapter_cache.stats()
+
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Route latency/size histograms and extraction counters (Prometheus text format)"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+async def fetch_chapter_images(chapter_url: str) -> List[str]:
+    """Fetch a chapter page with the shared client and extract its image URLs."""
+    with EXTRACT_FETCH_SECONDS.time():
+        response = await app.state.http_client.get(chapter_url, headers={'Referer': chapter_url})
+        response.raise_for_status()
+        
+        image_urls = extract_image_urls(response.text, chapter_url)
+    EXTRACT_IMAGES.inc(len(image_urls))
+    if not image_urls:
+        raise HTTPException(
+            status_code=404,
+            detail="No manga page images found. The website might be using dynamic loading or has CORS restrictions. Try entering image URLs manually."
+        )
+    return image_urls
+
+
+def normalize_chapter_url(url: str) -> str:
+    """Canonical form of a chapter URL for cache keys."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if (parts.scheme.lower(), netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ''))
 
 
 if __name__ == "__main__":
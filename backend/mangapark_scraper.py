@@ -3,39 +3,119 @@ Manga Scraper for mangapark.net
 Extracts manga information, chapters, and downloads images
 """
 
+import argparse
+import asyncio
+import json
 import requests
 from bs4 import BeautifulSoup
 import re
 import os
-from pathlib import Path
-from typing import Dict, List, Optional
 import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
 import logging
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+from browser_pool import BrowserPool
+from downloader import AsyncImageDownloader
+from metrics import SCRAPER_CHAPTER_SOURCES, record_phase, scraper_phase
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Absolute image URLs inside inline scripts / JSON payloads
+SCRIPT_IMAGE_URL_PATTERN = re.compile(
+    r'https?://[^"\'\s<>\\]+?\.(?:jpe?g|png|webp|gif|avif)(?:\?[^"\'\s<>\\]*)?',
+    re.I
+)
+NON_PAGE_IMAGE_PATTERN = re.compile(r'logo|icon|avatar|banner|thumb|cover|button|sprite', re.I)
+
+# Page file extensions, matched in this order where the URL path has none
+IMAGE_EXTENSIONS = ('.png', '.jpeg', '.jpg', '.webp', '.avif', '.gif')
+
+# Per-chapter record of downloaded pages, used to resume and skip work
+MANIFEST_NAME = "manifest.json"
+
+# While a chapter downloads, its manifest is rewritten after this many pages
+# or seconds (pages finished since the last write are fetched again on resume)
+MANIFEST_SAVE_PAGES = 10
+MANIFEST_SAVE_SECONDS = 2.0
+
 
 class MangaScraper:
     """Scraper for mangapark.net"""
     
-    BASE_URL = "https://mangapark.net"
+    # Overridable for mirrors and for the recorded fixtures in benchmarks/
+    BASE_URL = os.environ.get('MANGAPARK_BASE_URL', "https://mangapark.net")
+    
+    # Adaptive page loading (see _load_all_pages)
+    FIRST_IMAGE_TIMEOUT_MS = 15000
+    SCROLL_INTERVAL_MS = 300
+    STABLE_ROUNDS = 3
+    NETWORK_IDLE_MS = 500
+    LOAD_HARD_CAP_MS = 90000
+    
+    # A fast path result with fewer images is treated as a miss
+    FAST_PATH_MIN_IMAGES = 3
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     
-    def __init__(self, download_dir: str = "downloads"):
+    def __init__(self, download_dir: str = "downloads", max_browser_pages: int = 2,
+                 context_max_uses: int = 20, use_fast_path: bool = True,
+                 max_download_concurrency: int = 8, per_host_rate: float = 4.0,
+                 base_url: Optional[str] = None):
         """
         Initialize the scraper
         
         Args:
             download_dir: Directory to save downloaded images
+            max_browser_pages: How many chapters may render in Chromium at once
+            context_max_uses: Recycle a browser context after this many chapters
+            use_fast_path: Try plain HTTP extraction before rendering with Chromium
+            max_download_concurrency: Maximum image downloads in flight
+            per_host_rate: Image requests per second allowed per host
+            base_url: Site root chapter links are resolved against
+                (defaults to MANGAPARK_BASE_URL or https://mangapark.net)
         """
+        self.BASE_URL = (base_url or self.BASE_URL).rstrip('/')
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
         self.session = requests.Session()
         self.session.headers.update(self.HEADERS)
+        
+        # Chromium is launched once on first use and shared by all chapters
+        self.browser_pool = BrowserPool(
+            max_pages=max_browser_pages,
+            max_context_uses=context_max_uses
+        )
+        
+        # Per-phase timings of every chapter load, for tuning the loader
+        self.load_timings: List[Dict] = []
+        self.last_load_timings: Optional[Dict] = None
+        
+        # Which extraction path served each chapter (fast_path, browser, none)
+        self.use_fast_path = use_fast_path
+        self.image_source_counts: Dict[str, int] = {}
+        self.image_sources: Dict[str, str] = {}
+        
+        # Pooled async client for page images
+        self.downloader = AsyncImageDownloader(
+            headers=self.HEADERS,
+            max_concurrency=max_download_concurrency,
+            per_host_rate=per_host_rate
+        )
+    
+    async def close(self):
+        """Shut down the shared browser and HTTP client"""
+        await self.browser_pool.close()
+        await self.downloader.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
     
     def get_manga_info(self, title_url: str) -> Dict:
         """
@@ -151,7 +231,203 @@ class MangaScraper:
             logger.error(f"Error fetching chapters: {e}")
             raise
     
+    async def _load_all_pages(self, page, chapter_url: str) -> Dict:
+        """
+        Navigate to a chapter and scroll until its page images stop appearing
+        
+        Scrolling stops once the number of page images (and of images with a
+        real src) has been stable for a few rounds while the network is idle,
+        or when LOAD_HARD_CAP_MS is reached.
+        
+        Args:
+            page: Playwright page to load the chapter in
+            chapter_url: URL to chapter page
+            
+        Returns:
+            Dictionary with per-phase timings in seconds and loader counters
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        timings = {'url': chapter_url}
+        
+        # Track in-flight image requests to know when lazy images are done loading
+        in_flight = set()
+        last_activity = [started]
+        
+        def on_request(request):
+            if request.resource_type == 'image':
+                in_flight.add(request)
+                last_activity[0] = loop.time()
+        
+        def on_request_done(request):
+            if request in in_flight:
+                in_flight.discard(request)
+                last_activity[0] = loop.time()
+        
+        page.on("request", on_request)
+        page.on("requestfinished", on_request_done)
+        page.on("requestfailed", on_request_done)
+        
+        def network_idle() -> bool:
+            return not in_flight and (loop.time() - last_activity[0]) * 1000 >= self.NETWORK_IDLE_MS
+        
+        phase = "page_load"
+        try:
+            phase_start = loop.time()
+            await page.goto(chapter_url, wait_until='domcontentloaded', timeout=60000)
+            timings['navigate'] = loop.time() - phase_start
+            
+            phase_start = loop.time()
+            try:
+                await page.wait_for_selector('img[id^="p-"]', state='attached', timeout=self.FIRST_IMAGE_TIMEOUT_MS)
+            except PlaywrightTimeout:
+                logger.warning("No page images appeared, falling back to generic selectors")
+            timings['first_image'] = loop.time() - phase_start
+            record_phase("page_load", timings['navigate'] + timings['first_image'])
+            
+            logger.info("Scrolling to load all pages...")
+            phase = "scroll"
+            phase_start = loop.time()
+            deadline = started + self.LOAD_HARD_CAP_MS / 1000
+            previous = None
+            stable_rounds = 0
+            rounds = 0
+            while loop.time() < deadline:
+                state = await page.evaluate("""
+                    () => {
+                        window.scrollBy(0, window.innerHeight * 2);
+                        const imgs = document.querySelectorAll('img[id^="p-"]');
+                        const loaded = Array.from(imgs).filter(img => (img.currentSrc || img.src || '').startsWith('http'));
+                        return {
+                            count: imgs.length,
+                            loaded: loaded.length,
+                            atBottom: window.innerHeight + window.scrollY >= document.body.scrollHeight - 2
+                        };
+                    }
+                """)
+                rounds += 1
+                signature = (state['count'], state['loaded'])
+            
+                if signature == previous and state['atBottom'] and network_idle():
+                    stable_rounds += 1
+                    if stable_rounds >= self.STABLE_ROUNDS:
+                        break
+                else:
+                    stable_rounds = 0
+                previous = signature
+            
+                await page.wait_for_timeout(self.SCROLL_INTERVAL_MS)
+            else:
+                logger.warning(f"Page loading hit the {self.LOAD_HARD_CAP_MS} ms cap")
+                timings['hit_cap'] = True
+            
+            timings['scroll'] = loop.time() - phase_start
+            record_phase("scroll", timings['scroll'], "capped" if timings.get('hit_cap') else "ok")
+            timings['total'] = loop.time() - started
+            timings['scroll_rounds'] = rounds
+            timings['images'] = previous[0] if previous else 0
+            timings.setdefault('hit_cap', False)
+        
+        except Exception:
+            record_phase(phase, None, "error")
+            raise
+        finally:
+            page.remove_listener("request", on_request)
+            page.remove_listener("requestfinished", on_request_done)
+            page.remove_listener("requestfailed", on_request_done)
+        
+        self.last_load_timings = timings
+        self.load_timings.append(timings)
+        logger.info(
+            f"Loaded {timings['images']} page images in {timings['total']:.1f}s "
+            f"(navigate {timings['navigate']:.1f}s, first image {timings['first_image']:.1f}s, "
+            f"scroll {timings['scroll']:.1f}s over {rounds} rounds)"
+        )
+        return timings
+    
+    @staticmethod
+    def extract_images_from_html(html: str) -> List[str]:
+        """
+        Pull chapter page URLs out of data embedded in the served HTML
+        
+        MangaPark ships the reader state as JSON inside script tags, so the
+        page list is usually available without running any JavaScript.
+        
+        Args:
+            html: Raw chapter page HTML
+            
+        Returns:
+            Image URLs in document order, or an empty list if none look like pages
+        """
+        soup = BeautifulSoup(html, 'lxml')
+        
+        urls = []
+        seen = set()
+        for script in soup.find_all('script'):
+            # JSON payloads often escape slashes
+            script_text = (script.string or '').replace('\\/', '/')
+            for match in SCRIPT_IMAGE_URL_PATTERN.finditer(script_text):
+                url = match.group(0)
+                if url not in seen and not NON_PAGE_IMAGE_PATTERN.search(url):
+                    seen.add(url)
+                    urls.append(url)
+        
+        # Pages of one chapter share a directory, stray covers/ads do not
+        groups: Dict[str, List[str]] = {}
+        for url in urls:
+            groups.setdefault(url.split('?')[0].rsplit('/', 1)[0], []).append(url)
+        
+        best = max(groups.values(), key=len, default=[])
+        return best if len(best) >= MangaScraper.FAST_PATH_MIN_IMAGES else []
+    
+    async def _get_chapter_images_fast(self, chapter_url: str) -> List[str]:
+        """Fetch the chapter with plain HTTP and extract embedded image URLs"""
+        try:
+            response = await asyncio.to_thread(self.session.get, chapter_url, timeout=15)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.info(f"Fast path fetch failed: {e}")
+            return []
+        
+        return self.extract_images_from_html(response.text)
+    
+    def _record_image_source(self, chapter_url: str, source: str):
+        self.image_source_counts[source] = self.image_source_counts.get(source, 0) + 1
+        self.image_sources[chapter_url] = source
+        SCRAPER_CHAPTER_SOURCES.inc(source=source)
+    
+    @property
+    def fast_path_hit_rate(self) -> float:
+        """Share of chapters served without launching the browser"""
+        total = sum(self.image_source_counts.values())
+        return self.image_source_counts.get('fast_path', 0) / total if total else 0.0
+    
     async def get_chapter_images(self, chapter_url: str) -> List[str]:
+        """
+        Get all image URLs from a chapter
+        
+        Tries the browserless fast path first and falls back to rendering
+        the reader with Playwright when no embedded page list is found.
+        
+        Args:
+            chapter_url: URL to chapter page
+            
+        Returns:
+            List of image URLs sorted by page number
+        """
+        if self.use_fast_path:
+            image_urls = await self._get_chapter_images_fast(chapter_url)
+            if image_urls:
+                self._record_image_source(chapter_url, 'fast_path')
+                logger.info(f"Fast path found {len(image_urls)} images")
+                return image_urls
+            logger.info("Fast path found no page list, rendering with browser")
+        
+        image_urls = await self._get_chapter_images_browser(chapter_url)
+        self._record_image_source(chapter_url, 'browser' if image_urls else 'none')
+        return image_urls
+    
+    async def _get_chapter_images_browser(self, chapter_url: str) -> List[str]:
         """
         Get all image URLs from a chapter using Playwright for JavaScript rendering
         MangaPark uses a paginated reader, so we need to navigate through pages
@@ -167,33 +443,12 @@ class MangaScraper:
             
             image_urls = []
             
-            async with async_playwright() as p:
-                # Launch browser
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                
+            # Borrow a page from the persistent browser pool
+            async with self.browser_pool.page() as page:
                 logger.info("Loading chapter page...")
                 
-                # Navigate to page
-                await page.goto(chapter_url, wait_until='domcontentloaded', timeout=60000)
-                await page.wait_for_timeout(8000)
-                
-                # Scroll slowly to trigger all image loads
-                logger.info("Scrolling to load all pages...")
-                for i in range(40):
-                    await page.evaluate("window.scrollBy(0, 500)")
-                    await page.wait_for_timeout(1000)
-                
-                # Scroll back to top
-                await page.evaluate("window.scrollTo(0, 0)")
-                await page.wait_for_timeout(2000)
-                
-                # Scroll down again to ensure all images are loaded
-                for i in range(25):
-                    await page.evaluate("window.scrollBy(0, 400)")
-                    await page.wait_for_timeout(500)
-                
-                await page.wait_for_timeout(2000)
+                # Navigate and scroll until every page image has loaded
+                await self._load_all_pages(page, chapter_url)
                 
                 # Debug: Log page content
                 logger.info("Checking page structure...")
@@ -292,8 +547,6 @@ class MangaScraper:
                     except Exception as e:
                         logger.error(f"Failed to save screenshot: {e}")
                 
-                await browser.close()
-                
                 # Sort by page number
                 if images_data:
                     sorted_images = sorted(images_data, key=lambda x: x['page'])
@@ -314,6 +567,19 @@ class MangaScraper:
             logger.error(f"Error fetching chapter images: {e}")
             raise
     
+    @staticmethod
+    def _image_extension(image_url: str) -> str:
+        """Get file extension for an image URL (.jpg when it shows none)"""
+        suffix = Path(urlsplit(image_url).path).suffix.lower()
+        if suffix in IMAGE_EXTENSIONS:
+            return suffix
+        # Extension elsewhere in the URL, e.g. a CDN's /page.png/resize or ?src=page.webp
+        lowered = image_url.lower()
+        for ext in IMAGE_EXTENSIONS:
+            if ext in lowered:
+                return ext
+        return '.jpg'
+    
     def download_image(self, image_url: str, output_path: Path) -> bool:
         """
         Download a single image
@@ -340,18 +606,60 @@ class MangaScraper:
             logger.error(f"Error downloading image {image_url}: {e}")
             return False
     
-    async def download_chapter(self, chapter_url: str, manga_name: Optional[str] = None, 
-                        chapter_num: Optional[str] = None) -> Dict:
+    @staticmethod
+    def _load_manifest(chapter_dir: Path) -> Dict:
+        """Read a chapter manifest, or return an empty one"""
+        manifest_path = chapter_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return {}
+        try:
+            return json.loads(manifest_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+            return {}
+    
+    @staticmethod
+    def _save_manifest(chapter_dir: Path, manifest: Dict):
+        """Write a chapter manifest atomically"""
+        manifest_path = chapter_dir / MANIFEST_NAME
+        tmp_path = manifest_path.with_name(MANIFEST_NAME + '.tmp')
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        tmp_path.replace(manifest_path)
+    
+    @staticmethod
+    def _page_on_disk(chapter_dir: Path, entry: Dict) -> bool:
+        """Check that a manifest page entry is complete and its file intact"""
+        if not entry.get('complete'):
+            return False
+        path = chapter_dir / entry['file']
+        return path.exists() and path.stat().st_size == entry['size']
+    
+    def downloaded_chapter_ids(self, manga_name: str) -> set:
         """
-        Download all images from a chapter
+        IDs of chapters of a manga that are completely on disk
         
         Args:
-            chapter_url: URL to chapter page
-            manga_name: Optional manga name for folder structure
-            chapter_num: Optional chapter number for folder name
+            manga_name: Manga name as passed to download_chapter
             
         Returns:
-            Dictionary with download results
+            Set of MangaPark chapter IDs with a complete manifest
+        """
+        manga_dir = self.download_dir / manga_name.replace(' ', '_').lower()
+        chapter_ids = set()
+        for manifest_path in manga_dir.glob(f"chapter_*/{MANIFEST_NAME}"):
+            manifest = self._load_manifest(manifest_path.parent)
+            if manifest.get('complete') and manifest.get('chapter_id'):
+                chapter_ids.add(manifest['chapter_id'])
+        return chapter_ids
+    
+    async def _prepare_chapter(self, chapter_url: str, manga_name: Optional[str] = None,
+                               chapter_num: Optional[str] = None, chapter_id: Optional[str] = None) -> Dict:
+        """
+        First stage of a chapter download: discover image URLs and plan pages
+        
+        Returns:
+            Dictionary with either a final 'result' (nothing left to download
+            or an error) or the chapter 'plan' to hand to _fetch_chapter
         """
         try:
             # Extract chapter info from URL if not provided
@@ -360,6 +668,10 @@ class MangaScraper:
                 match = re.search(r'-(?:ch|chapter)-([\d.]+)', chapter_url)
                 chapter_num = match.group(1) if match else "unknown"
             
+            if not chapter_id:
+                match = re.search(r'/(\d+)-(?:ch|chapter)-', chapter_url)
+                chapter_id = match.group(1) if match else None
+            
             if not manga_name:
                 match = re.search(r'/title/\d+-en-([^/]+)/', chapter_url)
                 manga_name = match.group(1).replace('-', '_') if match else "unknown_manga"
@@ -370,63 +682,242 @@ class MangaScraper:
             chapter_dir = self.download_dir / manga_name / f"chapter_{chapter_num}"
             chapter_dir.mkdir(parents=True, exist_ok=True)
             
+            # Nothing to fetch if a previous run completed this chapter
+            manifest = self._load_manifest(chapter_dir)
+            if manifest.get('complete') and all(self._page_on_disk(chapter_dir, p) for p in manifest['pages']):
+                logger.info(f"Chapter {chapter_num} already downloaded, skipping")
+                return {'result': {
+                    'success': True,
+                    'chapter_url': chapter_url,
+                    'chapter_number': chapter_num,
+                    'manga_name': manga_name,
+                    'output_dir': str(chapter_dir),
+                    'total_images': len(manifest['pages']),
+                    'downloaded': 0,
+                    'skipped': len(manifest['pages']),
+                    'failed': 0,
+                    'image_source': 'manifest'
+                }}
+            
             # Get image URLs
             image_urls = await self.get_chapter_images(chapter_url)
             
             if not image_urls:
                 logger.warning("No images found in chapter")
-                return {
+                return {'result': {
                     'success': False,
                     'chapter_url': chapter_url,
                     'message': 'No images found'
-                }
+                }}
             
-            # Download images
-            downloaded = 0
-            failed = 0
+            # Reuse pages a previous run completed, queue the rest
+            known_pages = {p['index']: p for p in manifest.get('pages', [])}
+            manifest.update({
+                'chapter_id': chapter_id,
+                'chapter_url': chapter_url,
+                'chapter_number': chapter_num,
+                'complete': False,
+                'pages': []
+            })
             
+            jobs = []
             for idx, img_url in enumerate(image_urls, 1):
-                # Get file extension
-                ext = '.jpg'
-                if '.png' in img_url.lower():
-                    ext = '.png'
-                elif '.jpeg' in img_url.lower():
-                    ext = '.jpeg'
-                
-                output_file = chapter_dir / f"page_{idx:03d}{ext}"
-                
-                if self.download_image(img_url, output_file):
-                    downloaded += 1
+                output_file = chapter_dir / f"page_{idx:03d}{self._image_extension(img_url)}"
+                entry = known_pages.get(idx)
+                if entry and entry['file'] == output_file.name and self._page_on_disk(chapter_dir, entry):
+                    entry['url'] = img_url
                 else:
-                    failed += 1
-                
-                # Be polite to the server
-                time.sleep(0.5)
+                    if entry and entry['file'] != output_file.name:
+                        # Saved under another extension before, it is fetched again under the right one
+                        (chapter_dir / Path(entry['file']).name).unlink(missing_ok=True)
+                    entry = {'index': idx, 'url': img_url, 'file': output_file.name,
+                             'size': None, 'sha256': None, 'complete': False}
+                    jobs.append((entry, output_file))
+                manifest['pages'].append(entry)
             
-            result = {
-                'success': True,
+            if len(jobs) < len(image_urls):
+                logger.info(f"Resuming chapter {chapter_num}: {len(image_urls) - len(jobs)} pages already on disk")
+            self._save_manifest(chapter_dir, manifest)
+            
+            return {'plan': {
                 'chapter_url': chapter_url,
                 'chapter_number': chapter_num,
                 'manga_name': manga_name,
+                'chapter_dir': chapter_dir,
+                'manifest': manifest,
+                'jobs': jobs
+            }}
+            
+        except Exception as e:
+            logger.error(f"Error downloading chapter: {e}")
+            return {'result': {
+                'success': False,
+                'chapter_url': chapter_url,
+                'error': str(e)
+            }}
+    
+    async def _fetch_chapter(self, plan: Dict) -> Dict:
+        """
+        Second stage of a chapter download: fetch the pages planned by _prepare_chapter
+        
+        Returns:
+            Dictionary with download results
+        """
+        chapter_dir = plan['chapter_dir']
+        manifest = plan['manifest']
+        jobs = plan['jobs']
+        unsaved = 0
+        saved_at = time.monotonic()
+        
+        try:
+            async def fetch_page(entry: Dict, output_file: Path) -> bool:
+                nonlocal unsaved, saved_at
+                info = await self.downloader.download(entry['url'], output_file)
+                if not info:
+                    return False
+                entry.update(info, complete=True)
+                
+                # Rewriting the whole manifest per page is quadratic on long chapters
+                unsaved += 1
+                if unsaved >= MANIFEST_SAVE_PAGES or time.monotonic() - saved_at >= MANIFEST_SAVE_SECONDS:
+                    self._save_manifest(chapter_dir, manifest)
+                    unsaved = 0
+                    saved_at = time.monotonic()
+                return True
+            
+            # Download images concurrently, politeness comes from the per-host rate limit
+            with scraper_phase("download"):
+                try:
+                    results = await asyncio.gather(*(fetch_page(entry, path) for entry, path in jobs))
+                except BaseException:
+                    # Keep the pages finished so far when the download is cancelled
+                    self._save_manifest(chapter_dir, manifest)
+                    raise
+            downloaded = sum(1 for ok in results if ok)
+            failed = len(results) - downloaded
+            
+            manifest['complete'] = failed == 0
+            self._save_manifest(chapter_dir, manifest)
+            
+            total_images = len(manifest['pages'])
+            result = {
+                'success': True,
+                'chapter_url': plan['chapter_url'],
+                'chapter_number': plan['chapter_number'],
+                'manga_name': plan['manga_name'],
                 'output_dir': str(chapter_dir),
-                'total_images': len(image_urls),
+                'total_images': total_images,
                 'downloaded': downloaded,
-                'failed': failed
+                'skipped': total_images - len(jobs),
+                'failed': failed,
+                'image_source': self.image_sources.get(plan['chapter_url'])
             }
             
-            logger.info(f"Chapter download complete: {downloaded}/{len(image_urls)} images")
+            logger.info(f"Chapter download complete: {downloaded}/{total_images} images")
             return result
             
         except Exception as e:
             logger.error(f"Error downloading chapter: {e}")
             return {
                 'success': False,
-                'chapter_url': chapter_url,
+                'chapter_url': plan['chapter_url'],
                 'error': str(e)
             }
     
+    async def download_chapter(self, chapter_url: str, manga_name: Optional[str] = None, 
+                        chapter_num: Optional[str] = None, chapter_id: Optional[str] = None) -> Dict:
+        """
+        Download all images from a chapter
+        
+        Progress is recorded in a manifest.json inside the chapter directory
+        (page URL, file, size and sha256). Re-runs skip pages that are
+        already complete and skip the whole chapter once every page is done.
+        
+        Args:
+            chapter_url: URL to chapter page
+            manga_name: Optional manga name for folder structure
+            chapter_num: Optional chapter number for folder name
+            chapter_id: Optional MangaPark chapter ID recorded in the manifest
+            
+        Returns:
+            Dictionary with download results
+        """
+        prepared = await self._prepare_chapter(chapter_url, manga_name, chapter_num, chapter_id)
+        if 'result' in prepared:
+            return prepared['result']
+        return await self._fetch_chapter(prepared['plan'])
+    
+    async def _run_pipeline(self, chapters: List[Dict], manga_name: str, discover_workers: int,
+                            download_workers: int, queue_size: int,
+                            on_progress: Optional[Callable[[int, int, Optional[Dict]], None]] = None) -> List[Dict]:
+        """
+        Download chapters with image discovery and page downloads overlapped
+        
+        Discovery workers render upcoming chapters while download workers
+        fetch pages of earlier ones. The bounded queue between the stages
+        keeps discovery from running too far ahead of the downloads.
+        
+        Returns:
+            Result of every chapter, in the order of `chapters`
+        """
+        chapter_queue: asyncio.Queue = asyncio.Queue()
+        plan_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        results: List[Optional[Dict]] = [None] * len(chapters)
+        finished = 0
+        
+        def chapter_done(index: int, result: Dict):
+            nonlocal finished
+            results[index] = result
+            finished += 1
+            if on_progress is not None:
+                on_progress(finished, len(chapters), result)
+        
+        for index, ch in enumerate(chapters):
+            chapter_queue.put_nowait((index, ch))
+        
+        async def discover():
+            while True:
+                try:
+                    index, ch = chapter_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                logger.info(f"Downloading Chapter {ch['chapter_number']}...")
+                prepared = await self._prepare_chapter(
+                    ch['url'], 
+                    manga_name, 
+                    ch['chapter_number'],
+                    ch['chapter_id']
+                )
+                if 'result' in prepared:
+                    chapter_done(index, prepared['result'])
+                else:
+                    await plan_queue.put((index, prepared['plan']))
+        
+        async def download():
+            while True:
+                item = await plan_queue.get()
+                if item is None:
+                    return
+                index, plan = item
+                chapter_done(index, await self._fetch_chapter(plan))
+        
+        downloaders = [asyncio.create_task(download()) for _ in range(download_workers)]
+        try:
+            await asyncio.gather(*(discover() for _ in range(discover_workers)))
+            for _ in downloaders:
+                await plan_queue.put(None)
+            await asyncio.gather(*downloaders)
+        finally:
+            for task in downloaders:
+                task.cancel()
+        
+        return results
+    
     async def download_manga(self, title_url: str, start_chapter: Optional[int] = None, 
-                      end_chapter: Optional[int] = None) -> Dict:
+                      end_chapter: Optional[int] = None, new_only: bool = False,
+                      discover_workers: Optional[int] = None, download_workers: int = 2,
+                      queue_size: int = 2,
+                      on_progress: Optional[Callable[[int, int, Optional[Dict]], None]] = None) -> Dict:
         """
         Download multiple chapters of a manga
         
@@ -434,6 +925,13 @@ class MangaScraper:
             title_url: URL to manga title page
             start_chapter: Starting chapter number (inclusive)
             end_chapter: Ending chapter number (inclusive)
+            new_only: Only fetch chapters whose IDs are not completely on disk yet
+            discover_workers: Chapters whose images are discovered at once
+                (defaults to the number of browser pages)
+            download_workers: Chapters whose pages are downloaded at once
+            queue_size: Discovered chapters allowed to wait for a download worker
+            on_progress: Called with (chapters finished, chapters to download, result of
+                the chapter that finished, or None before the first one starts)
             
         Returns:
             Dictionary with download results
@@ -468,21 +966,35 @@ class MangaScraper:
                     'message': 'No chapters in specified range'
                 }
             
+            if new_only:
+                on_disk = self.downloaded_chapter_ids(manga_name)
+                chapters = [ch for ch in chapters if ch['chapter_id'] not in on_disk]
+                logger.info(f"{len(on_disk)} chapters already on disk, {len(chapters)} new")
+                
+                if not chapters:
+                    return {
+                        'success': True,
+                        'manga_name': manga_name,
+                        'message': 'No new chapters',
+                        'total_chapters': 0,
+                        'successful_chapters': 0,
+                        'total_images_downloaded': 0,
+                        'results': []
+                    }
+            
             logger.info(f"Downloading {len(chapters)} chapters of {manga_name}")
+            if on_progress is not None:
+                on_progress(0, len(chapters), None)
             
-            # Download each chapter
-            results = []
-            for ch in chapters:
-                logger.info(f"Downloading Chapter {ch['chapter_number']}...")
-                result = await self.download_chapter(
-                    ch['url'], 
-                    manga_name, 
-                    ch['chapter_number']
-                )
-                results.append(result)
-                
-                # Be polite to the server
-                time.sleep(1)
+            # Politeness comes from the browser pool size and per-host rate limits
+            results = await self._run_pipeline(
+                chapters,
+                manga_name,
+                discover_workers=discover_workers or self.browser_pool.max_pages,
+                download_workers=download_workers,
+                queue_size=queue_size,
+                on_progress=on_progress
+            )
             
             # Summary
             successful = sum(1 for r in results if r.get('success'))
@@ -505,28 +1017,42 @@ class MangaScraper:
             }
 
 
-if __name__ == "__main__":
-    # Test the scraper
-    scraper = MangaScraper()
-    
-    # Test with Solo Necromancer
-    test_url = "https://mangapark.net/title/224523-en-solo-necromancer"
-    
-    print("Testing manga info extraction...")
-    info = scraper.get_manga_info(test_url)
-    print(f"Manga: {info}")
-    
-    print("\nTesting chapter list...")
-    chapters = scraper.get_chapters(test_url)
-    print(f"Found {len(chapters)} chapters")
-    if chapters:
-        print(f"First chapter: {chapters[0]}")
-        print(f"Last chapter: {chapters[-1]}")
+async def main():
+    parser = argparse.ArgumentParser(description="Download manga from mangapark.net")
+    parser.add_argument("title_url", help="URL to manga title page, e.g. https://mangapark.net/title/224523-en-solo-necromancer")
+    parser.add_argument("--base-url", default=None, help="Site root for chapter links (default: MANGAPARK_BASE_URL)")
+    parser.add_argument("--start", type=float, default=None, help="First chapter number to download")
+    parser.add_argument("--end", type=float, default=None, help="Last chapter number to download")
+    parser.add_argument("--new-only", action="store_true", help="Only download chapters not yet on disk")
+    parser.add_argument("--download-dir", default="downloads", help="Directory to save downloaded images")
+    parser.add_argument("--list", action="store_true", help="Only print manga info and the chapter list")
+    parser.add_argument("--discover-workers", type=int, default=None, help="Chapters rendered at once")
+    parser.add_argument("--download-workers", type=int, default=2, help="Chapters downloaded at once")
+    args = parser.parse_args()
     
-    # Test image extraction (but don't download yet)
-    if chapters:
-        print(f"\nTesting image extraction from chapter {chapters[-1]['chapter_number']}...")
-        images = scraper.get_chapter_images(chapters[-1]['url'])
-        print(f"Found {len(images)} images")
-        if images:
-            print(f"First image: {images[0]}")
+    async with MangaScraper(download_dir=args.download_dir,
+                            max_browser_pages=args.discover_workers or 2,
+                            base_url=args.base_url) as scraper:
+        if args.list:
+            info = scraper.get_manga_info(args.title_url)
+            print(f"Manga: {info}")
+            chapters = scraper.get_chapters(args.title_url)
+            print(f"Found {len(chapters)} chapters")
+            for ch in chapters:
+                print(f"  {ch['chapter_number']:>8}  {ch['chapter_id']}  {ch['url']}")
+            return
+        
+        result = await scraper.download_manga(
+            args.title_url,
+            start_chapter=args.start,
+            end_chapter=args.end,
+            new_only=args.new_only,
+            discover_workers=args.discover_workers,
+            download_workers=args.download_workers
+        )
+        result.pop('results', None)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,399 @@
+"""
+In-process metrics for Red Manga
+Counters and histograms rendered in the Prometheus text exposition
+format, an ASGI middleware timing every route, and a pymongo command
+listener timing every Mongo command. Recording is a dictionary lookup
+and a bisect under a lock (pymongo listeners run on Motor's worker
+threads), cheap enough to leave on in production. Each worker process
+writes a snapshot of its registry to a directory shared by the workers
+of the server, and the metrics endpoint serves the sum of them all, so a
+scrape sees the same totals whichever worker answers it
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+PHASE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# How often each worker writes its snapshot for the others to merge
+PUBLISH_SECONDS = 5.0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """A named family of time series, one per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        try:
+            return tuple(str(labels[name]) for name in self.label_names)
+        except KeyError as e:
+            raise ValueError(f"Metric {self.name} requires label {e}")
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict:
+        """Definition and series of the metric as JSON-serializable data"""
+        with self._lock:
+            series = [[list(key), self._copy(value)] for key, value in self._series.items()]
+        return {"kind": self.kind, "documentation": self.documentation,
+                "labels": list(self.label_names), "series": series}
+
+    def merge(self, series: List):
+        """Add the series of another process's snapshot to this metric"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def merge(self, series: List):
+        with self._lock:
+            for key, value in series:
+                key = tuple(key)
+                self._series[key] = self._series.get(key, 0) + value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in series]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def snapshot(self) -> Dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    @staticmethod
+    def _copy(value):
+        counts, total, count = value
+        return [[*counts], total, count]
+
+    def merge(self, series: List):
+        with self._lock:
+            for key, (counts, total, count) in series:
+                key = tuple(key)
+                merged = self._series.get(key)
+                if merged is None:
+                    merged = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+    def sum(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        bounds = [*self.buckets, float('inf')]
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics of one process, created once by name"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def snapshot(self) -> Dict:
+        """Every metric as JSON-serializable data, see merge"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def merge(self, snapshot: Dict):
+        """Add the series of another registry's snapshot to this one"""
+        for name, data in snapshot.items():
+            try:
+                if data['kind'] == Counter.kind:
+                    metric = self.counter(name, data['documentation'], data['labels'])
+                elif data['kind'] == Histogram.kind:
+                    metric = self.histogram(name, data['documentation'], data['labels'], data['buckets'])
+                    if list(metric.buckets) != sorted(data['buckets']):
+                        raise ValueError(f"Metric {name} has different buckets")
+                else:
+                    continue
+                metric.merge(data['series'])
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping metric {name} of another worker: {e}")
+
+
+REGISTRY = Registry()
+
+
+class SharedMetrics:
+    """Metrics of every worker of one server, exchanged as snapshot files in a shared directory"""
+
+    def __init__(self, directory: Path, registry: Registry = REGISTRY, interval: float = PUBLISH_SECONDS):
+        """
+        Args:
+            directory: Directory shared by the workers of the server
+            registry: This process's registry
+            interval: Seconds between snapshots written by run()
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.registry = registry
+        self.interval = interval
+        # Snapshots of exited workers stay, so the totals never go down; the
+        # suffix keeps a replacement worker that reuses a pid from overwriting one
+        self.path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+    def publish(self):
+        """Write this process's snapshot, replacing the previous one atomically."""
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.registry.snapshot()))
+        os.replace(temporary, self.path)
+
+    def collect(self) -> Registry:
+        """Sum of the latest snapshot of every process of the server"""
+        merged = Registry()
+        for path in sorted(self.directory.glob('*.json')):
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read metrics snapshot {path}: {e}")
+                continue
+            merged.merge(snapshot)
+        return merged
+
+    def render(self) -> str:
+        """Every worker's metrics, summed, in the Prometheus text exposition format"""
+        # Published first, so this worker's share never lags behind a previous scrape
+        self.publish()
+        return self.collect().render()
+
+    async def run(self):
+        """Publish snapshots periodically until cancelled (call from the app lifespan)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.publish()
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot: {e}")
+
+
+# ============= HTTP =============
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to serve a request, body included",
+    ("method", "route", "status"))
+HTTP_RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_size_bytes", "Response body size",
+    ("method", "route"), buckets=SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and response size per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+        size = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                size[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Templates, not raw paths, keep the number of series bounded
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                         method=method, route=route, status=status[0])
+            HTTP_RESPONSE_BYTES.observe(size[0], method=method, route=route)
+
+
+# ============= MongoDB =============
+
+MONGO_COMMAND_SECONDS = REGISTRY.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trip as seen by the driver",
+    ("command",), buckets=MONGO_BUCKETS)
+MONGO_COMMAND_FAILURES = REGISTRY.counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error",
+    ("command",))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener; pass it in the client's event_listeners"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
+
+
+# ============= Scraper =============
+
+SCRAPER_PHASE_SECONDS = REGISTRY.histogram(
+    "scraper_phase_duration_seconds", "Duration of MangaScraper phases",
+    ("phase",), buckets=PHASE_BUCKETS)
+SCRAPER_PHASES = REGISTRY.counter(
+    "scraper_phase_total", "MangaScraper phases run, by outcome",
+    ("phase", "outcome"))
+SCRAPER_CHAPTER_SOURCES = REGISTRY.counter(
+    "scraper_chapter_source_total", "Chapters whose image list came from the fast path, the browser or neither",
+    ("source",))
+
+
+def record_phase(phase: str, seconds: Optional[float], outcome: str = "ok"):
+    """Count a scraper phase (browser_launch, page_load, scroll, download)"""
+    if seconds is not None:
+        SCRAPER_PHASE_SECONDS.observe(seconds, phase=phase)
+    SCRAPER_PHASES.inc(phase=phase, outcome=outcome)
+
+
+@contextmanager
+def scraper_phase(phase: str) -> Iterator[None]:
+    """Time a scraper phase, counting it as an error if the block raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record_phase(phase, time.perf_counter() - started, "error")
+        raise
+    record_phase(phase, time.perf_counter() - started)
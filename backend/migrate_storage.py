@@ -0,0 +1,258 @@
+"""
+One-off storage migrations for Red Manga
+
+Usage:
+    python migrate_storage.py
+
+Moves base64 page images and covers that are still stored inline in
+chapter and manga documents into the GridFS stores, rendering cover
+thumbnails on the way, converts dates stored as ISO strings into
+native BSON dates, and removes duplicate chapters (same manga and
+chapter number) so the unique mangaId_chapterNumber index can be built.
+Safe to re-run: migrated documents are skipped.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from blob_store import BlobStore, decode_image_payload
+from chapter_summary import reconcile_chapter_summaries
+from covers import store_cover
+from indexes import ensure_indexes
+from site_statistics import recompute_statistics
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Collection -> date fields that older releases wrote as ISO strings
+DATE_FIELDS = {
+    "manga": ["createdAt", "latestChapterAt"],
+    "chapters": ["createdAt"],
+    "upload_sessions": ["createdAt", "updatedAt"],
+    "upload_pages": ["updatedAt"],
+    "image_variants": ["createdAt"],
+}
+
+DATE_BATCH_SIZE = 1000
+
+
+async def migrate_chapter_pages(db) -> dict:
+    """
+    Convert chapters whose pages are base64 strings into page descriptors
+
+    Args:
+        db: Motor database handle
+
+    Returns:
+        Dictionary with migration counts
+    """
+    page_store = BlobStore(db, "pages")
+    migrated = 0
+    failed = 0
+
+    # Only chapters with at least one inline string page need work
+    cursor = db.chapters.find(
+        {"pages": {"$elemMatch": {"$type": "string"}}},
+        {"_id": 0, "id": 1, "pages": 1}
+    )
+    async for chapter in cursor:
+        try:
+            descriptors = []
+            for page in chapter['pages']:
+                if isinstance(page, dict):
+                    descriptors.append(page)
+                    continue
+                data, content_type = decode_image_payload(page)
+                descriptors.append(await page_store.put(data, content_type))
+
+            await db.chapters.update_one(
+                {"id": chapter['id']},
+                {"$set": {"pages": descriptors}}
+            )
+            migrated += 1
+            logger.info(f"Migrated chapter {chapter['id']} ({len(descriptors)} pages)")
+        except ValueError as e:
+            failed += 1
+            logger.error(f"Skipping chapter {chapter['id']}: {e}")
+
+    return {'migrated_chapters': migrated, 'failed_chapters': failed}
+
+
+async def migrate_manga_covers(db) -> dict:
+    """
+    Convert manga with a base64 coverImage into stored cover thumbnails
+
+    Args:
+        db: Motor database handle
+
+    Returns:
+        Dictionary with migration counts
+    """
+    cover_store = BlobStore(db, "covers")
+    migrated = 0
+    failed = 0
+
+    cursor = db.manga.find(
+        {"coverImage": {"$type": "string"}},
+        {"_id": 0, "id": 1, "coverImage": 1}
+    )
+    async for manga in cursor:
+        try:
+            data, content_type = decode_image_payload(manga['coverImage'])
+            cover = await store_cover(cover_store, data, content_type)
+
+            await db.manga.update_one(
+                {"id": manga['id']},
+                {
+                    "$set": {"cover": cover},
+                    "$unset": {"coverImage": ""}
+                }
+            )
+            migrated += 1
+            logger.info(f"Migrated cover for manga {manga['id']}")
+        except ValueError as e:
+            failed += 1
+            logger.error(f"Skipping cover of manga {manga['id']}: {e}")
+
+    return {'migrated_manga': migrated, 'failed_manga': failed}
+
+
+def parse_stored_date(value: str) -> datetime:
+    """Parse an ISO string written by an older release (naive values were UTC)"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_dates(db) -> dict:
+    """
+    Convert ISO string dates into BSON dates
+
+    Args:
+        db: Motor database handle
+
+    Returns:
+        Dictionary with converted and failed counts per collection
+    """
+    result = {}
+    for collection_name, fields in DATE_FIELDS.items():
+        collection = db[collection_name]
+        converted = 0
+        failed = 0
+        batch = []
+
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {"_id": 1, **{field: 1 for field in fields}}
+        async for doc in collection.find(query, projection):
+            update = {}
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    update[field] = parse_stored_date(value)
+                except ValueError:
+                    failed += 1
+                    logger.error(f"Skipping {collection_name} {doc['_id']}: unreadable {field} {value!r}")
+            if update:
+                batch.append(UpdateOne({"_id": doc['_id']}, {"$set": update}))
+
+            if len(batch) >= DATE_BATCH_SIZE:
+                await collection.bulk_write(batch, ordered=False)
+                converted += len(batch)
+                batch = []
+
+        if batch:
+            await collection.bulk_write(batch, ordered=False)
+            converted += len(batch)
+
+        result[collection_name] = {'converted': converted, 'failed': failed}
+        logger.info(f"Converted dates of {converted} {collection_name} documents")
+
+    return result
+
+
+async def dedupe_chapters(db, release_pages) -> dict:
+    """
+    Keep the oldest chapter of every manga and chapter number, delete the rest
+
+    Then replace the non-unique mangaId_chapterNumber index of older
+    releases with the unique one, and recompute the counters the deleted
+    chapters were part of.
+
+    Args:
+        db: Motor database handle
+        release_pages: Awaited with the page hashes of deleted chapters,
+            deletes the blobs nothing references any more
+
+    Returns:
+        Dictionary with duplicate group and deleted chapter counts
+    """
+    pipeline = [
+        {"$sort": {"createdAt": 1, "_id": 1}},
+        {"$group": {"_id": {"mangaId": "$mangaId", "chapterNumber": "$chapterNumber"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    groups = 0
+    duplicate_ids = []
+    async for group in db.chapters.aggregate(pipeline, allowDiskUse=True):
+        groups += 1
+        duplicate_ids.extend(group['ids'][1:])
+        logger.info(f"Chapter {group['_id']['chapterNumber']} of manga {group['_id']['mangaId']} "
+                    f"has {group['count'] - 1} duplicates")
+
+    deleted = 0
+    if duplicate_ids:
+        digests = await db.chapters.distinct("pages.hash", {"_id": {"$in": duplicate_ids}})
+        deleted = (await db.chapters.delete_many({"_id": {"$in": duplicate_ids}})).deleted_count
+        await release_pages(digests)
+        await reconcile_chapter_summaries(db)
+        await recompute_statistics(db)
+
+    index = (await db.chapters.index_information()).get("mangaId_chapterNumber")
+    if index is not None and not index.get('unique'):
+        await db.chapters.drop_index("mangaId_chapterNumber")
+    problems = await ensure_indexes(db)
+    if problems.get("chapters"):
+        logger.error(f"Chapter indexes still have problems: {problems['chapters']}")
+
+    return {'duplicate_groups': groups, 'deleted_chapters': deleted}
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        result = await migrate_chapter_pages(db)
+        logger.info(f"Page migration complete: {result}")
+
+        result = await migrate_manga_covers(db)
+        logger.info(f"Cover migration complete: {result}")
+
+        result = await migrate_dates(db)
+        logger.info(f"Date migration complete: {result}")
+
+        # Blob reference checks (chapters, upload sessions, transcoded formats) are the server's
+        import server
+
+        server.open_database(client)
+        result = await dedupe_chapters(db, server.release_page_blobs)
+        logger.info(f"Chapter deduplication complete: {result}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Single-pass chapter page extraction for the Manga Reader API
+Streams the chapter HTML through lxml's C parser into a parser target
+that collects <img> sources and <script> text as they are seen, with
+every matcher compiled once at import time
+
+Results match the earlier BeautifulSoup/html.parser extraction except on
+markup the two parsers recover from differently: lxml keeps the first of
+duplicated attributes and treats <title>/<textarea> content as text.
+benchmarks/extract_benchmark.py checks equality over saved pages.
+"""
+
+import re
+from typing import Dict, List, Set
+from urllib.parse import urljoin, urlparse
+
+from lxml import etree
+
+# Attributes holding the image source, in order of preference
+IMAGE_SOURCE_ATTRIBUTES = ('src', 'data-src', 'data-lazy-src')
+
+IMAGE_EXTENSION_PATTERN = re.compile(r'\.(jpg|jpeg|png|webp|gif)($|\?)', re.I)
+
+# Common non-manga images
+EXCLUDE_PATTERN = re.compile(r'logo|icon|avatar|banner|ad[_-]|thumb|cover|button|sprite', re.I)
+
+# Image URLs in JSON or JS arrays
+SCRIPT_IMAGE_PATTERN = re.compile(r'["\']https?://[^"\s]+\.(?:jpg|jpeg|png|webp|gif)["\']', re.I)
+
+
+def is_valid_manga_image(url: str) -> bool:
+    """Check if URL is likely a manga page image."""
+    if not url:
+        return False
+    return bool(IMAGE_EXTENSION_PATTERN.search(url)) and not EXCLUDE_PATTERN.search(url)
+
+
+def normalize_url(url: str, base_url: str) -> str:
+    """Normalize relative URLs to absolute URLs."""
+    if url.startswith('http'):
+        return url
+    elif url.startswith('//'):
+        return 'https:' + url
+    elif url.startswith('/'):
+        # Absolute path
+        parsed = urlparse(base_url)
+        return f"{parsed.scheme}://{parsed.netloc}{url}"
+    else:
+        # Relative path
+        return urljoin(base_url, url)
+
+
+class _ImageCollector:
+    """lxml parser target gathering image URLs during parsing"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.image_urls: Set[str] = set()
+        self._script_depth = 0
+        self._script_text: List[str] = []
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        if tag == 'img':
+            # Images inside page/reader containers are a subset of all
+            # images, so one check per <img> covers both strategies
+            for name in IMAGE_SOURCE_ATTRIBUTES:
+                src = attrib.get(name)
+                if src:
+                    if is_valid_manga_image(src):
+                        self.image_urls.add(normalize_url(src, self.base_url))
+                    break
+        elif tag == 'script':
+            self._script_depth += 1
+            self._script_text = []
+
+    def data(self, text: str):
+        if self._script_depth:
+            self._script_text.append(text)
+
+    def end(self, tag: str):
+        if tag == 'script' and self._script_depth:
+            self._script_depth -= 1
+            script_text = ''.join(self._script_text)
+            self._script_text = []
+            for url_match in SCRIPT_IMAGE_PATTERN.findall(script_text):
+                url = url_match.strip('"\'')
+                if is_valid_manga_image(url):
+                    self.image_urls.add(url)
+
+    def comment(self, text: str):
+        pass
+
+    def close(self) -> Set[str]:
+        return self.image_urls
+
+
+def extract_image_urls(html_content: str, chapter_url: str) -> List[str]:
+    """
+    Collect manga page image URLs from chapter HTML in one parsing pass
+
+    Args:
+        html_content: Chapter page HTML
+        chapter_url: URL of the page, used to resolve relative sources
+
+    Returns:
+        Sorted, de-duplicated image URLs (some sites have numbered filenames)
+    """
+    if not html_content.strip():
+        return []
+
+    collector = _ImageCollector(chapter_url)
+    parser = etree.HTMLParser(target=collector)
+    parser.feed(html_content)
+    return sorted(parser.close())
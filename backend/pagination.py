@@ -0,0 +1,132 @@
+"""
+Keyset pagination for Red Manga list routes
+Pages are fetched with a range condition on (sort key, id) instead of
+skip, so every page costs one index seek regardless of depth and stays
+stable while manga are added. The position is handed to clients as an
+opaque cursor
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sort name -> (field, direction); ties are broken by id in the same direction
+MANGA_SORTS: Dict[str, Tuple[str, int]] = {
+    "createdAt": ("createdAt", -1),
+    "title": ("title", 1),
+    "totalChapters": ("totalChapters", -1),
+    "updated": ("latestChapterAt", -1),
+}
+
+DEFAULT_MANGA_SORT = "createdAt"
+
+MAX_PAGE_SIZE = 100
+
+
+def sort_spec(sort: str) -> List[Tuple[str, int]]:
+    field, direction = MANGA_SORTS[sort]
+    return [(field, direction), ("id", direction)]
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(sort: str, doc: Dict) -> str:
+    """Opaque cursor pointing just after `doc` in the given sort order"""
+    field, _ = MANGA_SORTS[sort]
+    payload = {"s": sort, "k": _encode_value(doc.get(field)), "i": doc['id']}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, sort: str) -> Tuple[Any, str]:
+    """
+    Read a cursor produced by encode_cursor
+
+    Returns:
+        Tuple of (sort key value, id) of the last document already returned
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        key, last_id = _decode_value(payload["k"]), payload["i"]
+        cursor_sort = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort '{cursor_sort}', not '{sort}'")
+    if not isinstance(last_id, str):
+        raise ValueError("Invalid cursor")
+    return key, last_id
+
+
+def after_filter(sort: str, key: Any, last_id: str) -> Dict:
+    """
+    Filter matching documents that come after (key, last_id) in sort order
+
+    MongoDB orders missing/null values before everything else, so they come
+    last in a descending sort and first in an ascending one.
+    """
+    field, direction = MANGA_SORTS[sort]
+    beyond = "$lt" if direction < 0 else "$gt"
+
+    if key is None:
+        same_key = {field: None, "id": {beyond: last_id}}
+        if direction < 0:
+            return same_key
+        return {"$or": [same_key, {field: {"$ne": None}}]}
+
+    conditions = [
+        {field: {beyond: key}},
+        {field: key, "id": {beyond: last_id}},
+    ]
+    if direction < 0:
+        conditions.append({field: None})
+    return {"$or": conditions}
+
+
+async def fetch_page(collection, sort: str, limit: int, cursor: Optional[str] = None,
+                     projection: Optional[Dict] = None, query: Optional[Dict] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one page of a collection in keyset order
+
+    Args:
+        collection: Motor collection
+        sort: Key of MANGA_SORTS
+        limit: Page size, clamped to 1..MAX_PAGE_SIZE
+        cursor: Cursor returned with the previous page, None for the first page
+        projection: Projection for the documents (must keep the sort field and id)
+        query: Additional filter
+
+    Returns:
+        Tuple of (documents, cursor for the next page or None at the end)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conditions = [query] if query else []
+    if cursor:
+        conditions.append(after_filter(sort, *decode_cursor(cursor, sort)))
+    query = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+
+    # One extra document tells whether another page exists
+    docs = await collection.find(query, projection).sort(sort_spec(sort)).limit(limit + 1).to_list(limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(sort, docs[-1])
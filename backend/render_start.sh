@@ -4,4 +4,4 @@
 set -e
 
 echo "Starting FastAPI server..."
-uvicorn server:app --host 0.0.0.0 --port $PORT --workers 1
+uvicorn server:app --host 0.0.0.0 --port $PORT --workers ${WEB_CONCURRENCY:-2}
@@ -0,0 +1,169 @@
+"""
+In-process response cache for Red Manga's public read routes
+Rendered JSON bodies are kept with a strong ETag and a set of tags such
+as "manga:<id>". Admin writes invalidate by tag, and per-tag generation
+counters stop a response computed before an invalidation from being
+stored after it
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+# Clients may reuse a response only after revalidating it, which costs a 304
+DEFAULT_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'headers', 'tags', 'expires_at', 'generations')
+
+    def __init__(self, body: bytes, headers: Dict[str, str], tags: Set[str], expires_at: float,
+                 generations: Optional[Dict[str, int]] = None, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.headers = headers
+        self.tags = tags
+        self.expires_at = expires_at
+        # Tag generations seen before the body was loaded
+        self.generations = generations or {}
+
+
+class ResponseCache:
+    """Tag-invalidated LRU cache of rendered JSON responses"""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0,
+                 cache_control: str = DEFAULT_CACHE_CONTROL):
+        """
+        Args:
+            max_entries: Least recently used responses are evicted beyond this
+            ttl: Upper bound on how long a response is kept, as a safety net
+            cache_control: Cache-Control header sent with cached routes
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_control = cache_control
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._generations: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def clock() -> float:
+        return time.monotonic()
+
+    @staticmethod
+    def key(request: Request) -> str:
+        """Cache key: base URL (bodies embed absolute URLs), path and sorted query."""
+        query = '&'.join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        return f"{request.base_url}{request.url.path.lstrip('/')}?{query}"
+
+    def _generation_snapshot(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: CachedResponse):
+        self._drop(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, *tags: str):
+        """Drop every response carrying any of the tags."""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._keys_by_tag.get(tag, ())):
+                self._drop(key)
+        self.invalidations += 1
+
+    def clear(self):
+        for tag in list(self._keys_by_tag):
+            self.invalidate(tag)
+        self._entries.clear()
+
+    def _respond(self, request: Request, entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": self.cache_control, **entry.headers}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, tags: List[str],
+                      load: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]) -> Response:
+        """
+        Serve a cached response, loading and caching it on a miss
+
+        Args:
+            request: Incoming request (provides the key and If-None-Match)
+            tags: Invalidation tags of this response
+            load: Coroutine function returning (JSON body, extra headers)
+
+        Returns:
+            200 with the body, or 304 when the client's ETag still matches
+        """
+        key = self.key(request)
+        entry = self._get(key)
+        if entry is not None:
+            self.hits += 1
+            return self._respond(request, entry)
+
+        self.misses += 1
+        generations = self._generation_snapshot(tags)
+        body, headers = await load()
+        entry = CachedResponse(body, headers, set(tags), self.clock() + self.ttl, dict(zip(tags, generations)))
+
+        # An admin write invalidated these tags while we were loading
+        if self._generation_snapshot(tags) == generations:
+            self._store(key, entry)
+        return self._respond(request, entry)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
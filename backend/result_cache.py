@@ -0,0 +1,99 @@
+"""
+In-process result cache for Red Manga
+LRU cache with per-entry TTL and single-flight loading: concurrent
+misses for the same key share one in-flight computation
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """Bounded TTL/LRU cache of async results with hit/miss counters"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0):
+        """
+        Args:
+            max_entries: Least recently used entries are evicted beyond this
+            ttl: Seconds an entry stays fresh
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, loading it on a miss
+
+        Concurrent callers missing on the same key await a single call to
+        `loader`. Exceptions are propagated to every waiter and not cached.
+        A caller that is cancelled does not cancel the shared load.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(loader())
+        self._in_flight[key] = future
+
+        def done(f: asyncio.Future):
+            self._in_flight.pop(key, None)
+            if not f.cancelled() and f.exception() is None:
+                self.set(key, f.result())
+
+        future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,468 @@
+"""
+Server-side scrape queue for Red Manga
+Admin scrape requests become documents in the `scrape_jobs` collection;
+an identical request made while one is queued or running gets that job
+back. The worker process holding the scrape-dispatcher lease runs the
+queue: each job is a child process running MangaScraper, so HTML parsing,
+manifest writes and Chromium never compete with the event loop serving
+requests, and a job only starts while a global slot and a slot for its
+host are free. The child reports progress on the job document and stops
+once the job is cancelled. A job interrupted by a restart is queued again
+and its download resumes from the chapter manifests
+
+Usage (started by the dispatcher):
+    python scrape_jobs.py <job_id> --download-dir downloads [--cache-dir <dir>]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from leases import Lease
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_PATH = Path(__file__).resolve()
+
+JOB_KINDS = ("title", "chapter")
+
+# Scrapes running at once across all workers, and per site
+MAX_JOBS = int(os.environ.get('SCRAPE_MAX_JOBS', 2))
+MAX_JOBS_PER_HOST = int(os.environ.get('SCRAPE_MAX_JOBS_PER_HOST', 1))
+
+# Sites the admin API may scrape, defaults to the scraper's own
+ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.environ.get(
+        'SCRAPE_ALLOWED_HOSTS',
+        urlsplit(os.environ.get('MANGAPARK_BASE_URL', "https://mangapark.net")).netloc
+    ).split(',')
+    if host.strip()
+}
+
+# Dispatcher loop period, and how often a job's child process writes progress
+POLL_SECONDS = 2.0
+HEARTBEAT_SECONDS = 5.0
+
+# A running job whose child has not written for this long is queued again,
+# at most MAX_ATTEMPTS times
+STALE_JOB_SECONDS = 60
+MAX_ATTEMPTS = 3
+
+DISPATCHER_LEASE_SECONDS = 30
+
+# Failed chapters listed on a job document
+MAX_FAILED_CHAPTERS = 50
+
+
+# ============= Jobs =============
+
+def job_host(url: str) -> str:
+    """
+    Host a scrape request targets
+
+    Raises:
+        ValueError: If the URL is not http(s) on an allowed host
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise ValueError("URL must be an absolute http(s) URL")
+    host = parts.netloc.lower()
+    if host not in ALLOWED_HOSTS:
+        raise ValueError(f"Scraping {host} is not allowed (SCRAPE_ALLOWED_HOSTS: {', '.join(sorted(ALLOWED_HOSTS))})")
+    return host
+
+
+def job_key(kind: str, url: str, options: Dict, manga_id: Optional[str]) -> str:
+    """Identity of a scrape request; identical requests share one active job"""
+    parts = urlsplit(url)
+    normalized = f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+    payload = json.dumps([kind, normalized, options, manga_id], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def enqueue_scrape(db, kind: str, url: str, options: Dict,
+                         manga_id: Optional[str] = None) -> Tuple[Dict, bool]:
+    """
+    Queue a scrape unless an identical one is queued or running
+
+    Args:
+        db: Motor database handle
+        kind: "title" (chapters of a title page) or "chapter" (one chapter page)
+        url: Page to scrape
+        options: startChapter, endChapter and newOnly for title scrapes
+        manga_id: Import the downloaded chapters into this manga when done
+
+    Returns:
+        (job document, True if it was created by this call)
+
+    Raises:
+        ValueError: If the kind or URL is not accepted
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown scrape kind {kind}, expected one of {', '.join(JOB_KINDS)}")
+    host = job_host(url)
+    key = job_key(kind, url, options, manga_id)
+
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": hashlib.sha256(f"{key}:{now.isoformat()}".encode()).hexdigest()[:32],
+        "kind": kind,
+        "url": url,
+        "host": host,
+        "key": key,
+        "options": options,
+        "mangaId": manga_id,
+        "status": "queued",
+        "active": True,
+        "attempts": 0,
+        "cancelRequested": False,
+        "progress": {"chapters": None, "finishedChapters": 0, "failedChapters": 0, "images": 0},
+        "result": None,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "startedAt": None,
+        "finishedAt": None,
+    }
+    try:
+        await db.scrape_jobs.insert_one(job)
+    except DuplicateKeyError:
+        existing = await db.scrape_jobs.find_one({"key": key, "active": True}, {"_id": 0})
+        if existing:
+            return existing, False
+        # Finished between the insert and the lookup
+        return await enqueue_scrape(db, kind, url, options, manga_id)
+
+    job.pop('_id', None)
+    return job, True
+
+
+async def cancel_scrape(db, job_id: str) -> Optional[Dict]:
+    """
+    Cancel a job: queued jobs at once, running ones once their process sees the request
+
+    Returns:
+        The job document, or None if there is no such job
+    """
+    now = datetime.now(timezone.utc)
+    job = await db.scrape_jobs.find_one_and_update(
+        {"id": job_id, "status": "queued"},
+        {"$set": {"status": "cancelled", "cancelRequested": True, "finishedAt": now, "updatedAt": now},
+         "$unset": {"active": ""}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if job is None:
+        job = await db.scrape_jobs.find_one_and_update(
+            {"id": job_id, "status": "running"},
+            {"$set": {"cancelRequested": True}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    if job is None:
+        job = await db.scrape_jobs.find_one({"id": job_id}, {"_id": 0})
+    return job
+
+
+# ============= Dispatcher =============
+
+class ScrapeQueue:
+    """Starts queued jobs as child processes, within the global and per-host limits"""
+
+    def __init__(self, db, download_dir: Path, cache_dir: Optional[Path] = None,
+                 max_jobs: Optional[int] = None, max_jobs_per_host: Optional[int] = None,
+                 on_pages_stored: Optional[Callable[[List[str]], None]] = None):
+        """
+        Args:
+            db: Motor database handle
+            download_dir: Where jobs download to (and imports read from)
+            cache_dir: Shared response cache of this server, so imports invalidate it
+            max_jobs: Jobs running at once, defaults to SCRAPE_MAX_JOBS or 2
+            max_jobs_per_host: Jobs running at once per site, defaults to SCRAPE_MAX_JOBS_PER_HOST or 1
+            on_pages_stored: Called with the page hashes a finished job imported
+                (job processes have no transcoder of their own)
+        """
+        self.db = db
+        self.download_dir = Path(download_dir)
+        self.cache_dir = cache_dir
+        self.max_jobs = max_jobs or MAX_JOBS
+        self.max_jobs_per_host = max_jobs_per_host or MAX_JOBS_PER_HOST
+        self.on_pages_stored = on_pages_stored
+        self.lease = Lease(db, "scrape-dispatcher", DISPATCHER_LEASE_SECONDS)
+
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        self._waiters: Set[asyncio.Task] = set()
+        self._stopping = False
+
+    async def run(self):
+        """Background task: start queued jobs while this worker holds the dispatcher lease"""
+        while True:
+            try:
+                if await self.lease.acquire():
+                    await self.requeue_stale()
+                    await self.dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scrape dispatch failed: {e}")
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def requeue_stale(self):
+        """Queue running jobs again whose process stopped reporting (its worker died)"""
+        now = datetime.now(timezone.utc)
+        stale = {
+            "status": "running",
+            "updatedAt": {"$lt": now - timedelta(seconds=STALE_JOB_SECONDS)},
+            "id": {"$nin": list(self._processes)},
+        }
+        finished = {"finishedAt": now, "updatedAt": now}
+
+        await self.db.scrape_jobs.update_many(
+            {**stale, "cancelRequested": True},
+            {"$set": {"status": "cancelled", **finished}, "$unset": {"active": ""}}
+        )
+        await self.db.scrape_jobs.update_many(
+            {**stale, "attempts": {"$gte": MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": "Scrape process stopped responding", **finished},
+             "$unset": {"active": ""}}
+        )
+        result = await self.db.scrape_jobs.update_many(stale, {"$set": {"status": "queued", "updatedAt": now}})
+        if result.modified_count:
+            logger.warning(f"Queued {result.modified_count} interrupted scrape jobs again")
+
+    async def dispatch(self):
+        """Claim queued jobs, oldest first, until the global limit is reached"""
+        running: Dict[str, int] = {}
+        pipeline = [{"$match": {"status": "running"}}, {"$group": {"_id": "$host", "jobs": {"$sum": 1}}}]
+        async for row in self.db.scrape_jobs.aggregate(pipeline):
+            running[row['_id']] = row['jobs']
+
+        free = self.max_jobs - sum(running.values())
+        while free > 0:
+            saturated = [host for host, jobs in running.items() if jobs >= self.max_jobs_per_host]
+            now = datetime.now(timezone.utc)
+            job = await self.db.scrape_jobs.find_one_and_update(
+                {"status": "queued", "host": {"$nin": saturated}},
+                {"$set": {"status": "running", "startedAt": now, "updatedAt": now, "worker": self.lease.owner},
+                 "$inc": {"attempts": 1}},
+                sort=[("createdAt", 1)],
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return
+            running[job['host']] = running.get(job['host'], 0) + 1
+            free -= 1
+            await self._start(job)
+
+    async def _start(self, job: Dict):
+        command = [sys.executable, str(SCRIPT_PATH), job['id'], "--download-dir", str(self.download_dir)]
+        if self.cache_dir is not None:
+            command += ["--cache-dir", str(self.cache_dir)]
+        try:
+            process = await asyncio.create_subprocess_exec(*command, cwd=str(SCRIPT_PATH.parent))
+        except OSError as e:
+            await self._finish(job['id'], {"status": "failed", "error": f"Could not start scrape process: {e}"})
+            return
+
+        logger.info(f"Started scrape job {job['id']} ({job['kind']} {job['url']}) as process {process.pid}")
+        self._processes[job['id']] = process
+        waiter = asyncio.create_task(self._wait(job['id'], process))
+        self._waiters.add(waiter)
+        waiter.add_done_callback(self._waiters.discard)
+
+    async def _wait(self, job_id: str, process: asyncio.subprocess.Process):
+        code = await process.wait()
+        self._processes.pop(job_id, None)
+        await self._hand_over_pages(job_id)
+        if self._stopping:
+            # Resumed by the next dispatcher
+            await self.db.scrape_jobs.update_one(
+                {"id": job_id, "status": "running"},
+                {"$set": {"status": "queued", "updatedAt": datetime.now(timezone.utc)}}
+            )
+        elif code != 0:
+            # The process records its own outcome, unless it crashed
+            await self._finish(job_id, {"status": "failed", "error": f"Scrape process exited with status {code}"})
+
+    async def _hand_over_pages(self, job_id: str):
+        """Pass the pages a job process imported on to this server's transcoder"""
+        job = await self.db.scrape_jobs.find_one_and_update(
+            {"id": job_id, "storedPages": {"$exists": True}},
+            {"$unset": {"storedPages": ""}},
+            projection={"_id": 0, "storedPages": 1}
+        )
+        if job and job['storedPages'] and self.on_pages_stored is not None:
+            self.on_pages_stored(job['storedPages'])
+
+    async def _finish(self, job_id: str, update: Dict):
+        now = datetime.now(timezone.utc)
+        await self.db.scrape_jobs.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {**update, "finishedAt": now, "updatedAt": now}, "$unset": {"active": ""}}
+        )
+
+    async def stop(self):
+        """Terminate running scrapes (they are queued again) and hand the lease over."""
+        self._stopping = True
+        for process in self._processes.values():
+            process.terminate()
+        await asyncio.gather(*self._waiters, return_exceptions=True)
+        await self.lease.release()
+
+
+# ============= Job Process =============
+
+def scrape_summary(result: Dict) -> Dict:
+    """Download result without the per-chapter details"""
+    return {key: value for key, value in result.items() if key != 'results'}
+
+
+async def run_scrape_job(db, job_id: str, download_dir: Path, importer=None) -> Optional[Dict]:
+    """
+    Run a claimed job: scrape, then import into the job's manga if it has one
+
+    Progress goes to the job document every HEARTBEAT_SECONDS, which is also
+    when a cancel request is noticed. Hashes of the pages the import stored
+    are left on the job as storedPages, for the dispatcher to transcode.
+
+    Returns:
+        The finished job document, or None if the job is not running
+    """
+    from library_import import create_import_job, run_import_job
+    from mangapark_scraper import MangaScraper
+
+    job = await db.scrape_jobs.find_one({"id": job_id, "status": "running"}, {"_id": 0})
+    if job is None:
+        return None
+
+    progress = dict(job['progress'])
+    failed_chapters: List[str] = []
+
+    def on_progress(finished: int, total: int, result: Optional[Dict]):
+        progress['chapters'] = total
+        progress['finishedChapters'] = finished
+        if result is not None:
+            progress['images'] += result.get('downloaded', 0)
+            if not result.get('success') or result.get('failed'):
+                progress['failedChapters'] += 1
+                if len(failed_chapters) < MAX_FAILED_CHAPTERS:
+                    failed_chapters.append(result.get('chapter_url', ''))
+
+    async def scrape() -> Dict:
+        parts = urlsplit(job['url'])
+        options = job['options']
+        async with MangaScraper(download_dir=str(download_dir), base_url=f"{parts.scheme}://{parts.netloc}") as scraper:
+            if job['kind'] == "title":
+                return await scraper.download_manga(
+                    job['url'],
+                    start_chapter=options.get('startChapter'),
+                    end_chapter=options.get('endChapter'),
+                    new_only=options.get('newOnly', False),
+                    on_progress=on_progress
+                )
+            on_progress(0, 1, None)
+            result = await scraper.download_chapter(job['url'])
+            on_progress(1, 1, result)
+            return result
+
+    async def heartbeat(work: asyncio.Task):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            current = await db.scrape_jobs.find_one_and_update(
+                {"id": job_id},
+                {"$set": {"progress": progress, "failedChapterUrls": failed_chapters,
+                          "updatedAt": datetime.now(timezone.utc)}},
+                projection={"_id": 0, "cancelRequested": 1}
+            )
+            if current is None or current.get('cancelRequested'):
+                work.cancel()
+                return
+
+    work = asyncio.create_task(scrape())
+    beat = asyncio.create_task(heartbeat(work))
+    update: Dict = {}
+    try:
+        result = await work
+        if not result.get('success'):
+            update = {"status": "failed", "result": scrape_summary(result),
+                      "error": result.get('error') or result.get('message') or "Scrape failed"}
+        else:
+            update = {"status": "completed", "result": scrape_summary(result)}
+    except asyncio.CancelledError:
+        if not work.cancelled():
+            raise
+        update = {"status": "cancelled"}
+    except Exception as e:
+        logger.error(f"Scrape job {job_id} failed: {e}")
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        beat.cancel()
+
+    # Downloaded chapters go into the manga through the library importer
+    if update['status'] == "completed" and job.get('mangaId') and importer is not None:
+        manga_name = update['result'].get('manga_name')
+        if manga_name:
+            source = download_dir / manga_name.replace(' ', '_').lower()
+            stored_pages: List[str] = []
+            importer_hook = importer.on_pages_stored
+            importer.on_pages_stored = stored_pages.extend
+            try:
+                import_job = await create_import_job(db, job['mangaId'], str(source))
+                import_job = await run_import_job(db, importer, import_job, source)
+                update['importJobId'] = import_job['id']
+                if import_job['status'] != "completed":
+                    update.update(status="failed", error=f"Import failed: {import_job.get('error')}")
+            except ValueError as e:
+                update.update(status="failed", error=f"Import failed: {e}")
+            finally:
+                importer.on_pages_stored = importer_hook
+            update['storedPages'] = stored_pages
+
+    now = datetime.now(timezone.utc)
+    update.update(progress=progress, failedChapterUrls=failed_chapters, finishedAt=now, updatedAt=now)
+    await db.scrape_jobs.update_one({"id": job_id}, {"$set": update, "$unset": {"active": ""}})
+    logger.info(f"Scrape job {job_id} {update['status']}")
+    return await db.scrape_jobs.find_one({"id": job_id}, {"_id": 0})
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Run one queued scrape job")
+    parser.add_argument("job_id")
+    parser.add_argument("--download-dir", type=Path, required=True)
+    parser.add_argument("--cache-dir", type=Path, default=None, help="Shared response cache of the server")
+    args = parser.parse_args()
+
+    # Same database, stores and importer as the server
+    import server
+
+    server.open_database()
+    if args.cache_dir is not None:
+        server.open_caches(args.cache_dir)
+    else:
+        server.importer.on_chapters_written = None
+    try:
+        job = await run_scrape_job(server.db, args.job_id, args.download_dir, server.importer)
+    finally:
+        server.client.close()
+        # Scraper phase timings join the server's metrics
+        if server.shared_metrics is not None:
+            server.shared_metrics.publish()
+    return 0 if job is not None else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
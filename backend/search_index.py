@@ -0,0 +1,260 @@
+"""
+In-process search index for Red Manga
+Inverted index over title, author, genres and description with trigram
+fuzzy matching for typos and a sorted key list for prefix autocomplete.
+Words are runs of letters and digits in any script; Chinese, Japanese and
+Korean text, which has no spaces between words, is indexed as overlapping
+character bigrams
+"""
+
+import bisect
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Han, kana and Hangul: runs of these are split into character bigrams
+CJK_PATTERN = re.compile(
+    '[\u1100-\u11ff\u3005-\u3007\u3040-\u30ff\u3130-\u318f\u31f0-\u31ff\u3400-\u4dbf'
+    '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002fa1f]+'
+)
+
+# Kana voiced sound marks, kept so that "ピ" and "ヒ" stay distinct
+KANA_VOICING_MARKS = {'\u3099', '\u309a'}
+
+# Relative importance of a hit in each field
+FIELD_WEIGHTS = {
+    'title': 4.0,
+    'author': 2.5,
+    'genres': 2.0,
+    'description': 1.0,
+}
+
+# Match quality multipliers
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+
+# Minimum trigram similarity for a typo-tolerant match
+FUZZY_THRESHOLD = 0.4
+
+SEARCH_PROJECTION = {"_id": 0, "id": 1, "title": 1, "author": 1, "genres": 1, "description": 1}
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so "Pokémon" matches "pokemon"."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c) or c in KANA_VOICING_MARKS)
+    # Recompose Hangul syllables and voiced kana split apart by NFKD
+    return unicodedata.normalize('NFC', text).lower()
+
+
+def bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in TOKEN_PATTERN.findall(normalize(text)):
+        position = 0
+        for run in CJK_PATTERN.finditer(word):
+            if run.start() > position:
+                tokens.append(word[position:run.start()])
+            tokens.extend(bigrams(run.group()))
+            position = run.end()
+        if position < len(word):
+            tokens.append(word[position:])
+    return tokens
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Ranked, typo-tolerant manga search kept in memory"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # token -> {manga id -> weighted term frequency}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # trigram -> tokens containing it
+        self.trigram_tokens: Dict[str, Set[str]] = defaultdict(set)
+        # Sorted vocabulary for prefix matching of query tokens
+        self.vocabulary: List[str] = []
+        # manga id -> tokens it contributed, used for removal
+        self.doc_tokens: Dict[str, Set[str]] = {}
+        self.titles: Dict[str, str] = {}
+        self.normalized_titles: Dict[str, str] = {}
+        # Sorted (key, manga id) pairs, one per word start of each title
+        self.suggest_keys: List[Tuple[str, str]] = []
+
+    async def build(self, db) -> int:
+        """
+        Load every manga from the database into a fresh index
+
+        Returns:
+            Number of indexed manga
+        """
+        self.clear()
+        count = 0
+        async for manga in db.manga.find({}, SEARCH_PROJECTION):
+            self.add(manga)
+            count += 1
+        logger.info(f"Search index built with {count} manga and {len(self.vocabulary)} terms")
+        return count
+
+    def add(self, manga: Dict):
+        """Index a manga, replacing any previous entry with the same id."""
+        manga_id = manga['id']
+        self.remove(manga_id)
+
+        weights: Dict[str, float] = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            value = manga.get(field) or ''
+            if isinstance(value, list):
+                value = ' '.join(value)
+            for token in tokenize(value):
+                weights[token] += field_weight
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                bisect.insort(self.vocabulary, token)
+                for gram in trigrams(token):
+                    self.trigram_tokens[gram].add(token)
+            self.postings[token][manga_id] = weight
+        self.doc_tokens[manga_id] = set(weights)
+
+        title = manga.get('title') or ''
+        self.titles[manga_id] = title
+        self.normalized_titles[manga_id] = ' '.join(tokenize(title))
+        for key in self._suggest_keys_for(title):
+            bisect.insort(self.suggest_keys, (key, manga_id))
+
+    def remove(self, manga_id: str):
+        """Drop a manga from the index (no-op if it is not indexed)."""
+        for token in self.doc_tokens.pop(manga_id, set()):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(manga_id, None)
+            if not postings:
+                del self.postings[token]
+                index = bisect.bisect_left(self.vocabulary, token)
+                if index < len(self.vocabulary) and self.vocabulary[index] == token:
+                    self.vocabulary.pop(index)
+                for gram in trigrams(token):
+                    self.trigram_tokens[gram].discard(token)
+
+        self.normalized_titles.pop(manga_id, None)
+        title = self.titles.pop(manga_id, None)
+        if title is not None:
+            for key in self._suggest_keys_for(title):
+                index = bisect.bisect_left(self.suggest_keys, (key, manga_id))
+                if index < len(self.suggest_keys) and self.suggest_keys[index] == (key, manga_id):
+                    self.suggest_keys.pop(index)
+
+    @staticmethod
+    def _suggest_keys_for(title: str) -> Set[str]:
+        """Every suffix of the title that starts at a word boundary"""
+        words = tokenize(title)
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _expand(self, query_token: str) -> Dict[str, float]:
+        """Map a query token to indexed tokens with a match quality"""
+        matches: Dict[str, float] = {}
+        if query_token in self.postings:
+            matches[query_token] = EXACT_MATCH
+
+        index = bisect.bisect_left(self.vocabulary, query_token)
+        while index < len(self.vocabulary) and self.vocabulary[index].startswith(query_token):
+            token = self.vocabulary[index]
+            matches.setdefault(token, PREFIX_MATCH)
+            index += 1
+
+        if len(query_token) >= 3:
+            query_grams = trigrams(query_token)
+            shared: Dict[str, int] = defaultdict(int)
+            for gram in query_grams:
+                for token in self.trigram_tokens.get(gram, ()):
+                    shared[token] += 1
+            for token, overlap in shared.items():
+                if token in matches:
+                    continue
+                similarity = 2 * overlap / (len(query_grams) + len(trigrams(token)))
+                if similarity >= FUZZY_THRESHOLD:
+                    matches[token] = FUZZY_MATCH * similarity
+
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """
+        Rank manga against a free-text query
+
+        Args:
+            query: User input, may contain typos or partial words
+            limit: Maximum number of results
+
+        Returns:
+            Manga ids, best match first
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        scores: Dict[str, float] = defaultdict(float)
+        matched_terms: Dict[str, int] = defaultdict(int)
+        for query_token in query_tokens:
+            best: Dict[str, float] = {}
+            for token, quality in self._expand(query_token).items():
+                for manga_id, weight in self.postings[token].items():
+                    best[manga_id] = max(best.get(manga_id, 0.0), quality * weight)
+            for manga_id, score in best.items():
+                scores[manga_id] += score
+                matched_terms[manga_id] += 1
+
+        # Whole-phrase title hits go first
+        phrase = ' '.join(query_tokens)
+        for manga_id in scores:
+            if phrase in self.normalized_titles.get(manga_id, ''):
+                scores[manga_id] += FIELD_WEIGHTS['title'] * len(query_tokens)
+
+        ranked = sorted(
+            scores,
+            key=lambda manga_id: (-matched_terms[manga_id], -scores[manga_id], self.titles.get(manga_id, ''))
+        )
+        return ranked[:limit]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        Autocomplete titles from a prefix of any title word
+
+        Returns:
+            List of {"id", "title"} in alphabetical order of the matched key
+        """
+        key = ' '.join(tokenize(prefix))
+        if not key:
+            return []
+
+        results = []
+        seen = set()
+        index = bisect.bisect_left(self.suggest_keys, (key, ''))
+        while index < len(self.suggest_keys) and len(results) < limit:
+            suggest_key, manga_id = self.suggest_keys[index]
+            if not suggest_key.startswith(key):
+                break
+            if manga_id not in seen:
+                seen.add(manga_id)
+                results.append({"id": manga_id, "title": self.titles[manga_id]})
+            index += 1
+        return results
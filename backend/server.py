@@ -1,28 +1,239 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Request
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import orjson
 import os
+import re
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 import uuid
-from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+from datetime import datetime, timedelta, timezone
+from blob_store import BlobStore, decode_image_payload
+from chapter_summary import (RECONCILE_INTERVAL_SECONDS, record_chapter_added, record_chapter_changed,
+                             record_chapters_removed, removal_counts, run_reconciliation)
+from covers import COVER_DEFAULT_WIDTH, store_cover
+from indexes import ensure_indexes
+from leases import Lease
+from library_import import LibraryImporter, create_import_job, run_import_job
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MongoCommandMetrics, SharedMetrics
+from pagination import DEFAULT_MANGA_SORT, MANGA_SORTS, fetch_page
+from response_cache import ResponseCache, etag_matches
+from scrape_jobs import ScrapeQueue, cancel_scrape, enqueue_scrape
+from search_index import SearchIndex
+from shared_cache import SharedGenerations, SharedResponseCache, shared_cache_dir
+from site_statistics import (RECOMPUTE_INTERVAL_SECONDS, deleted_chapter_stats,
+                             deleted_chapters_stats, read_statistics, record_chapter_uploaded, record_chapters_deleted,
+                             record_manga_added, record_manga_deleted, record_pages_changed, record_stored_bytes,
+                             refresh_rankings, run_statistics_recompute)
+from transcoder import Transcoder, choose_format
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Everything below is created per worker process in the lifespan (see
+# open_database / open_caches): a Motor client must not be shared across
+# the fork of a multi-worker server
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+# Page and cover images are stored outside the manga/chapter documents
+page_store: Optional[BlobStore] = None
+cover_store: Optional[BlobStore] = None
+
+# Re-encodes uploaded pages and covers to WebP/AVIF in the background
+transcoder: Optional[Transcoder] = None
+
+# Bulk imports of scraper downloads, run as tasks of the worker that received them
+importer: Optional[LibraryImporter] = None
+import_tasks: Set[asyncio.Task] = set()
+
+# Admin scrape jobs, started as child processes by whichever worker holds the dispatcher lease
+scrape_queue: Optional[ScrapeQueue] = None
+
+# Rendered public read responses, shared by the workers and invalidated by tag from the admin routes
+response_cache: Optional[ResponseCache] = None
+shared_generations: Optional[SharedGenerations] = None
+shared_cache_directory: Optional[Path] = None
+
+# Per-worker metric snapshots, summed by /api/metrics
+shared_metrics: Optional[SharedMetrics] = None
+
+# In-memory search index, one per worker, rebuilt when another worker changed it
+search_index = SearchIndex()
+search_index_generation = 0
+search_index_rebuild: Optional[asyncio.Task] = None
+SEARCH_INDEX_TAG = "search-index"
+
+# The transcoder backlog scan runs once per deploy, in whichever worker takes the lease
+BACKLOG_LEASE_SECONDS = 600
+BACKLOG_RETRY_SECONDS = 30
+
+
+def open_database(mongo_client: Optional[AsyncIOMotorClient] = None):
+    """Create the Motor client and the stores bound to its database"""
+    global client, db, page_store, cover_store, transcoder, importer
+    
+    # Dates are stored as BSON dates and read back as aware UTC datetimes
+    client = mongo_client or AsyncIOMotorClient(
+        os.environ['MONGO_URL'], tz_aware=True, event_listeners=[MongoCommandMetrics()]
+    )
+    db = client[os.environ['DB_NAME']]
+    
+    # Both stores report stored bytes to the materialized statistics
+    page_store = BlobStore(db, "pages", on_size_change=lambda delta: record_stored_bytes(db, "pages", delta))
+    cover_store = BlobStore(db, "covers", on_size_change=lambda delta: record_stored_bytes(db, "covers", delta))
+    transcoder = Transcoder(db, {"pages": page_store, "covers": cover_store})
+    importer = LibraryImporter(
+        db, page_store, max_pages=MAX_CHAPTER_PAGES, max_page_bytes=MAX_PAGE_BYTES,
+        on_pages_stored=lambda digests: transcoder.enqueue("pages", digests),
+        release_pages=release_page_blobs,
+        on_chapters_written=lambda manga_id: invalidate_manga([manga_id], chapters=True)
+    )
+
+
+def open_caches(directory: Optional[Path] = None):
+    """Attach to the response cache, invalidation counters and metrics shared by every worker of this server"""
+    global response_cache, shared_generations, shared_cache_directory, shared_metrics
+    
+    directory = directory or shared_cache_dir(os.environ['DB_NAME'])
+    shared_cache_directory = directory
+    shared_generations = SharedGenerations(directory / "generations")
+    response_cache = SharedResponseCache(directory / "responses", shared_generations)
+    shared_metrics = SharedMetrics(directory / "metrics")
+    logger.info(f"Shared response cache in {directory}")
+
+
+async def rebuild_search_index():
+    """Build a fresh search index and swap it in, so searches never see a partial one"""
+    global search_index, search_index_generation
+    
+    generation = shared_generations.get(SEARCH_INDEX_TAG)
+    fresh = SearchIndex()
+    await fresh.build(db)
+    search_index = fresh
+    search_index_generation = generation
+
+
+def search_index_changed():
+    """Tell the other workers that this worker changed the search index"""
+    global search_index_generation
+    
+    (generation,) = shared_generations.bump(SEARCH_INDEX_TAG)
+    # Still current only if no other worker changed it since our last rebuild
+    if generation == search_index_generation + 1:
+        search_index_generation = generation
+
+
+def refresh_search_index():
+    """Rebuild the local search index in the background if another worker changed it"""
+    global search_index_rebuild
+    
+    stale = shared_generations.get(SEARCH_INDEX_TAG) != search_index_generation
+    if stale and (search_index_rebuild is None or search_index_rebuild.done()):
+        search_index_rebuild = asyncio.create_task(rebuild_search_index())
+
+
+async def enqueue_transcoder_backlog(lease: Lease):
+    # A worker of the previous deploy may still hold the lease until it shuts down and releases it
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + BACKLOG_LEASE_SECONDS
+    while not await lease.acquire():
+        if loop.time() >= deadline:
+            return
+        await asyncio.sleep(BACKLOG_RETRY_SECONDS)
+    await transcoder.enqueue_backlog()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect, create/validate indexes, build the search index, start background work, clean up on shutdown"""
+    global scrape_queue
+    
+    # Runs in every worker process
+    open_database()
+    open_caches()
+    
+    problems = await ensure_indexes(db)
+    if any(problems.values()):
+        logger.error(f"Index verification found problems: {problems}")
+    else:
+        logger.info("All indexes verified")
+    
+    await rebuild_search_index()
+    
+    # Periodic jobs run in one worker at a time, whichever holds their lease
+    backlog_lease = Lease(db, "transcoder-backlog", BACKLOG_LEASE_SECONDS)
+    reconciliation_lease = Lease(db, "chapter-summary-reconciliation", RECONCILE_INTERVAL_SECONDS * 1.5)
+    statistics_lease = Lease(db, "statistics-recompute", RECOMPUTE_INTERVAL_SECONDS * 1.5)
+    
+    transcoder.start()
+    backlog = asyncio.create_task(enqueue_transcoder_backlog(backlog_lease))
+    reconciliation = asyncio.create_task(
+        run_reconciliation(db, on_fixed=invalidate_manga, lease=reconciliation_lease)
+    )
+    statistics = asyncio.create_task(run_statistics_recompute(db, lease=statistics_lease))
+    metrics_publisher = asyncio.create_task(shared_metrics.run())
+    
+    # Scrape processes report to the shared cache, so their imports invalidate it
+    scrape_queue = ScrapeQueue(
+        db, IMPORT_ROOT, cache_dir=shared_cache_directory,
+        on_pages_stored=lambda digests: transcoder.enqueue("pages", digests)
+    )
+    scraping = asyncio.create_task(scrape_queue.run())
+    
+    yield
+    
+    metrics_publisher.cancel()
+    scraping.cancel()
+    statistics.cancel()
+    reconciliation.cancel()
+    backlog.cancel()
+    
+    # Interrupted imports are marked as such and can be re-run
+    for task in import_tasks:
+        task.cancel()
+    await asyncio.gather(*import_tasks, return_exceptions=True)
+    await transcoder.stop()
+    
+    # Running scrapes are queued again for the next dispatcher
+    try:
+        await scrape_queue.stop()
+    except Exception as e:
+        logger.warning(f"Could not stop scrape jobs: {e}")
+    
+    # Let another worker (or the next deploy) take the periodic jobs over right away;
+    # the next backlog scan picks up pages still queued in this worker's transcoder
+    for lease in (backlog_lease, reconciliation_lease, statistics_lease):
+        try:
+            await lease.release()
+        except Exception as e:
+            logger.warning(f"Could not release lease {lease.name}: {e}")
+    
+    # Last snapshot of this worker, so its counts stay in the totals after it exits
+    try:
+        shared_metrics.publish()
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot: {e}")
+    
+    shared_generations.close()
+    client.close()
+
 
 # Create the main app with increased body size limit
 app = FastAPI(
     title="Red Manga API",
     description="Manga reader and management API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Create a router with the /api prefix
@@ -31,6 +242,15 @@ api_router = APIRouter(prefix="/api")
 # Admin password from env
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
 
+MAX_CHAPTER_PAGES = 100
+
+# Limits for chapter upload sessions
+MAX_PAGE_BYTES = 25 * 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Library imports read download trees and archives from under this directory only
+IMPORT_ROOT = Path(os.environ.get('IMPORT_ROOT', ROOT_DIR / 'downloads')).resolve()
+
 
 # ============= Models =============
 
@@ -49,11 +269,16 @@ class Manga(BaseModel):
     title: str
     description: str
     author: str
-    coverImage: str
+    coverImage: str  # thumbnail URL
+    coverSizes: Dict[str, str] = {}  # width -> thumbnail URL
+    coverOriginal: Optional[str] = None  # only included on the details route
     genres: List[str]
     status: str
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     totalChapters: int = 0
+    totalPages: int = 0
+    latestChapterNumber: Optional[float] = None
+    latestChapterAt: Optional[datetime] = None
 
 class ChapterCreate(BaseModel):
     mangaId: str
@@ -61,6 +286,13 @@ class ChapterCreate(BaseModel):
     title: str
     pages: List[str]  # base64 encoded images
 
+class PageInfo(BaseModel):
+    number: int
+    url: str
+    size: int
+    contentType: str
+    etag: str
+
 class Chapter(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -68,7 +300,8 @@ class Chapter(BaseModel):
     mangaId: str
     chapterNumber: float
     title: str
-    pages: List[str]
+    pages: List[str]  # page image URLs
+    pageInfo: List[PageInfo] = []
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class AdminAuth(BaseModel):
@@ -93,6 +326,49 @@ class ChapterUpdate(BaseModel):
 class BulkDeleteRequest(BaseModel):
     ids: List[str]
 
+class ImportCreate(BaseModel):
+    mangaId: str
+    source: str  # download directory or archive, relative to IMPORT_ROOT
+
+class ScrapeCreate(BaseModel):
+    url: str
+    kind: str = "title"  # "title" page (its chapters) or a single "chapter" page
+    mangaId: Optional[str] = None  # import the downloaded chapters into this manga
+    startChapter: Optional[float] = None
+    endChapter: Optional[float] = None
+    newOnly: bool = False
+
+class UploadSessionCreate(BaseModel):
+    mangaId: str
+    chapterNumber: float
+    title: str
+    totalPages: int
+
+class UploadSession(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    mangaId: str
+    chapterNumber: float
+    title: str
+    totalPages: int
+    receivedPages: List[int] = []  # page numbers already stored
+    nextPage: Optional[int] = None  # first page still missing, None when complete
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updatedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def response_fields(model) -> List[Tuple[str, Any]]:
+    """(name, default) of each model field, to shape documents without validating them"""
+    return [
+        (name, None if field.is_required() or field.default_factory else field.default)
+        for name, field in model.model_fields.items()
+    ]
+
+
+MANGA_FIELDS = response_fields(Manga)
+CHAPTER_FIELDS = response_fields(Chapter)
+
 
 # ============= Helper Functions =============
 
@@ -107,6 +383,361 @@ def verify_admin(authorization: Optional[str] = None):
     return True
 
 
+def route_url(request: Request, name: str, **params: str) -> str:
+    """
+    request.url_for for list views, resolving each route only once per request
+    
+    Route resolution dominates serialization when a page builds hundreds of
+    URLs, so a template with placeholders is cached in the request scope.
+    """
+    templates = request.scope.setdefault("route_url_templates", {})
+    key = (name, tuple(params))
+    template = templates.get(key)
+    if template is None:
+        template = str(request.url_for(name, **{param: f"\x00{param}\x00" for param in params}))
+        templates[key] = template
+    url = template
+    for param, value in params.items():
+        url = url.replace(f"\x00{param}\x00", str(value))
+    return url
+
+
+def page_url(request: Request, chapter_id: str, page_number: int, page) -> str:
+    """Absolute URL of a single chapter page, versioned by content hash"""
+    url = route_url(request, "get_chapter_page", chapter_id=chapter_id, page_number=page_number)
+    if isinstance(page, dict):
+        url += f"?v={page['hash'][:16]}"
+    return url
+
+
+# Path of page URLs built by page_url, whatever host and prefix the client saw
+PAGE_PATH_PATTERN = re.compile(r'/chapter/([^/?#]+)/page/(\d+)$')
+
+
+def kept_page(value: str, chapter_id: str, pages: List) -> Any:
+    """
+    Stored page that a page URL sent back by the admin UI refers to
+    
+    Matched on the URL path and the ?v= content hash, not the absolute URL,
+    which depends on the host and scheme the client saw.
+    
+    Returns:
+        The stored page, or None if the value is not a URL of this chapter's pages
+    """
+    parts = urlsplit(value)
+    match = PAGE_PATH_PATTERN.search(parts.path)
+    if not match or match.group(1) != chapter_id:
+        return None
+    
+    version = parse_qs(parts.query).get('v', [None])[0]
+    if version is None:
+        # Pages not migrated yet have no hash, only their position
+        number = int(match.group(2))
+        if 1 <= number <= len(pages) and not isinstance(pages[number - 1], dict):
+            return pages[number - 1]
+        return None
+    return next((page for page in pages if isinstance(page, dict) and page['hash'][:16] == version), None)
+
+
+def serialize_chapter(chapter: dict, request: Request) -> dict:
+    """Replace stored page descriptors with page URLs, shaped like the Chapter model"""
+    chapter = dict(chapter)
+    
+    urls = []
+    page_info = []
+    for number, page in enumerate(chapter.get('pages', []), 1):
+        url = page_url(request, chapter['id'], number, page)
+        urls.append(url)
+        # Chapters that were not migrated yet still hold base64 strings
+        if isinstance(page, dict):
+            page_info.append({
+                "number": number,
+                "url": url,
+                "size": page['size'],
+                "contentType": page['contentType'],
+                "etag": f'"{page["hash"]}"'
+            })
+    
+    chapter['pages'] = urls
+    chapter['pageInfo'] = page_info
+    
+    return {name: chapter.get(name, default) for name, default in CHAPTER_FIELDS}
+
+
+def cover_url(request: Request, descriptor: dict) -> str:
+    """Absolute URL of a content-addressed cover image"""
+    return route_url(request, "get_cover", digest=descriptor['hash'])
+
+
+def serialize_manga(manga: dict, request: Request, include_original: bool = False) -> dict:
+    """Replace stored cover descriptors with thumbnail URLs, shaped like the Manga model"""
+    manga = dict(manga)
+    cover = manga.pop('cover', None)
+    original_url = route_url(request, "get_manga_cover", manga_id=manga['id'])
+    
+    if cover:
+        sizes = {str(v['width']): cover_url(request, v) for v in cover['variants']}
+        manga['coverSizes'] = sizes
+        manga['coverImage'] = sizes.get(str(COVER_DEFAULT_WIDTH)) or original_url
+    else:
+        # Manga that were not migrated yet only have the base64 original
+        manga['coverSizes'] = {}
+        manga['coverImage'] = original_url
+    
+    if include_original:
+        manga['coverOriginal'] = original_url
+    else:
+        manga.pop('coverOriginal', None)
+    
+    return {name: manga.get(name, default) for name, default in MANGA_FIELDS}
+
+
+# Projection for list views, skips legacy inline base64 covers
+MANGA_LIST_PROJECTION = {"_id": 0, "coverImage": 0, "cover.original": 0}
+
+# Response cache tags: every manga list page, one manga, one manga's chapter list
+MANGA_LIST_TAG = "manga-list"
+
+
+def manga_tag(manga_id: str) -> str:
+    return f"manga:{manga_id}"
+
+
+def chapters_tag(manga_id: str) -> str:
+    return f"chapters:{manga_id}"
+
+
+def invalidate_manga(manga_ids, chapters: bool = False):
+    """Drop cached lists and details of changed manga (and their chapter lists)"""
+    tags = [MANGA_LIST_TAG]
+    for manga_id in manga_ids:
+        tags.append(manga_tag(manga_id))
+        if chapters:
+            tags.append(chapters_tag(manga_id))
+    response_cache.invalidate(*tags)
+
+
+def render_json(content) -> bytes:
+    """
+    Encode serialized documents directly, skipping response_model validation
+    
+    Read routes shape documents with serialize_manga/serialize_chapter, so the
+    output matches their models; datetimes are written as ISO 8601 with a Z.
+    """
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def json_response(content) -> Response:
+    return Response(content=render_json(content), media_type="application/json")
+
+
+async def save_cover(payload: str) -> dict:
+    """Decode a base64 cover, render thumbnails and store everything"""
+    try:
+        data, content_type = decode_image_payload(payload)
+        return await store_cover(cover_store, data, content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def cover_hashes(manga_docs: List[dict]) -> List[str]:
+    """Collect blob hashes from manga cover descriptors"""
+    digests = []
+    for manga in manga_docs:
+        cover = manga.get('cover')
+        if cover:
+            digests.append(cover['original']['hash'])
+            digests.extend(v['hash'] for v in cover['variants'])
+    return digests
+
+
+async def release_cover_blobs(digests):
+    """Delete cover blobs that no manga references any more"""
+    digests = set(digests)
+    if not digests:
+        return
+    
+    still_used = set()
+    for field in ("cover.original.hash", "cover.variants.hash"):
+        still_used.update(await db.manga.distinct(field, {field: {"$in": list(digests)}}))
+    orphaned = digests - still_used
+    
+    # Transcoded formats of deleted originals go too, unless stored for something else
+    format_hashes = await transcoder.release("covers", orphaned)
+    if format_hashes:
+        for field in ("cover.original.hash", "cover.variants.hash"):
+            format_hashes -= set(await db.manga.distinct(field, {field: {"$in": list(format_hashes)}}))
+        format_hashes -= set(await db.image_variants.distinct("formats.hash", {"formats.hash": {"$in": list(format_hashes)}}))
+    
+    for digest in orphaned | format_hashes:
+        await cover_store.delete(digest)
+
+
+async def store_pages(pages: List[str]) -> List[dict]:
+    """Decode base64 pages and move their bytes into the page store"""
+    descriptors = []
+    for index, payload in enumerate(pages, 1):
+        try:
+            # Decoding megabytes of base64 would stall every other request
+            data, content_type = await asyncio.to_thread(decode_image_payload, payload)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Page {index}: {str(e)}")
+        descriptors.append(await page_store.put(data, content_type))
+    return descriptors
+
+
+async def release_page_blobs(digests):
+    """Delete page blobs that no chapter or open upload session references any more"""
+    digests = set(digests)
+    if not digests:
+        return
+    
+    still_used = set(await db.chapters.distinct("pages.hash", {"pages.hash": {"$in": list(digests)}}))
+    still_used.update(await db.upload_pages.distinct("hash", {"hash": {"$in": list(digests)}}))
+    orphaned = digests - still_used
+    
+    # Transcoded formats of deleted originals go too, unless stored for something else
+    format_hashes = await transcoder.release("pages", orphaned)
+    if format_hashes:
+        format_hashes -= set(await db.chapters.distinct("pages.hash", {"pages.hash": {"$in": list(format_hashes)}}))
+        format_hashes -= set(await db.upload_pages.distinct("hash", {"hash": {"$in": list(format_hashes)}}))
+        format_hashes -= set(await db.image_variants.distinct("formats.hash", {"formats.hash": {"$in": list(format_hashes)}}))
+    
+    for digest in orphaned | format_hashes:
+        await page_store.delete(digest)
+
+
+async def insert_chapter(manga_id: str, chapter_number: float, title: str, pages: List[dict]) -> dict:
+    """
+    Insert a chapter whose pages are already stored and update the manga's chapter summary
+    
+    Raises:
+        HTTPException: 409 if the manga already has a chapter with this number
+    """
+    chapter_obj = Chapter(mangaId=manga_id, chapterNumber=chapter_number, title=title, pages=[])
+    doc = chapter_obj.model_dump(exclude={"pageInfo"})
+    doc['pages'] = pages
+    
+    try:
+        await db.chapters.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"Chapter {chapter_number:g} already exists")
+    transcoder.enqueue("pages", [page['hash'] for page in pages])
+    
+    # Not atomic with the insert: if this fails (or the worker dies first) the
+    # chapter exists and the periodic reconciliation corrects the summary
+    try:
+        await record_chapter_added(db, manga_id, doc['chapterNumber'], doc['createdAt'], len(pages))
+    except PyMongoError as e:
+        logger.error(f"Chapter summary of manga {manga_id} not updated, left to reconciliation: {e}")
+    await record_chapter_uploaded(db, doc['createdAt'], len(pages))
+    invalidate_manga([manga_id], chapters=True)
+    
+    logger.info(f"Created chapter {chapter_number} for manga {manga_id}")
+    doc.pop('_id', None)
+    return doc
+
+
+async def upload_session_state(session: dict) -> dict:
+    """Session document plus the pages received so far"""
+    received = await db.upload_pages.distinct("number", {"sessionId": session['id']})
+    received = sorted(received)
+    missing = sorted(set(range(1, session['totalPages'] + 1)) - set(received))
+    
+    state = dict(session)
+    state['receivedPages'] = received
+    state['nextPage'] = missing[0] if missing else None
+    return state
+
+
+async def get_upload_session(session_id: str) -> dict:
+    session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+async def discard_upload_session(session_id: str):
+    """Drop a session and release page blobs only it referenced"""
+    digests = await db.upload_pages.distinct("hash", {"sessionId": session_id})
+    await db.upload_pages.delete_many({"sessionId": session_id})
+    await db.upload_sessions.delete_one({"id": session_id})
+    await release_page_blobs(digests)
+
+
+async def purge_stale_upload_sessions():
+    """Discard sessions that have not received a page within UPLOAD_SESSION_TTL"""
+    cutoff = datetime.now(timezone.utc) - UPLOAD_SESSION_TTL
+    async for session in db.upload_sessions.find({"updatedAt": {"$lt": cutoff}}, {"_id": 0, "id": 1}):
+        logger.info(f"Discarding stale upload session {session['id']}")
+        await discard_upload_session(session['id'])
+
+
+def page_hashes(chapters: List[dict]) -> List[str]:
+    """Collect blob hashes from chapter page descriptors"""
+    return [page['hash'] for c in chapters for page in c.get('pages', []) if isinstance(page, dict)]
+
+
+async def delete_chapters(chapter_filter: dict) -> List[dict]:
+    """
+    Delete the chapters matching a filter, one by one
+
+    Only the documents this call removed are returned, a concurrent delete
+    of the same chapters gets None for them, so their counts are subtracted once.
+
+    Returns:
+        Deleted chapters with mangaId, pages and createdAt
+    """
+    chapters = []
+    while True:
+        # Again until none are left, in case chapters were added meanwhile
+        chapter_ids = await db.chapters.distinct("id", chapter_filter)
+        if not chapter_ids:
+            return chapters
+        deleted = await asyncio.gather(*(
+            db.chapters.find_one_and_delete(
+                {"id": chapter_id}, {"_id": 0, "mangaId": 1, "pages": 1, "createdAt": 1}
+            )
+            for chapter_id in chapter_ids
+        ))
+        chapters.extend(chapter for chapter in deleted if chapter)
+
+
+def parse_range_header(range_header: str, size: int):
+    """
+    Parse a single-range "bytes=start-end" header
+
+    Returns:
+        (start, end) inclusive offsets, or None to serve the full body
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start_str, _, end_str = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start = max(size - length, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
 # ============= Routes =============
 
 @api_router.get("/")
@@ -126,20 +757,30 @@ async def admin_auth(auth: AdminAuth):
 
 
 @api_router.post("/admin/manga", response_model=Manga)
-async def create_manga(manga: MangaCreate, authorization: str = Header(None)):
+async def create_manga(manga: MangaCreate, request: Request, authorization: str = Header(None)):
     """Create a new manga (Admin only)"""
     verify_admin(authorization)
     
+    cover = await save_cover(manga.coverImage)
+    
     manga_obj = Manga(**manga.model_dump(), totalChapters=0)
-    doc = manga_obj.model_dump()
-    doc['createdAt'] = doc['createdAt'].isoformat()
+    # latestChapter* stay unset until the first chapter is added
+    doc = manga_obj.model_dump(exclude={"coverImage", "coverSizes", "coverOriginal",
+                                        "latestChapterNumber", "latestChapterAt"})
+    doc['cover'] = cover
     
     await db.manga.insert_one(doc)
-    return manga_obj
+    transcoder.enqueue("covers", [cover['original']['hash']])
+    doc.pop('_id', None)
+    search_index.add(doc)
+    search_index_changed()
+    response_cache.invalidate(MANGA_LIST_TAG)
+    await record_manga_added(db)
+    return serialize_manga(doc, request, include_original=True)
 
 
 @api_router.post("/admin/chapter", response_model=Chapter)
-async def create_chapter(chapter: ChapterCreate, authorization: str = Header(None)):
+async def create_chapter(chapter: ChapterCreate, request: Request, authorization: str = Header(None)):
     """Add a chapter to manga (Admin only)"""
     try:
         verify_admin(authorization)
@@ -153,25 +794,19 @@ async def create_chapter(chapter: ChapterCreate, authorization: str = Header(Non
         if not chapter.pages or len(chapter.pages) == 0:
             raise HTTPException(status_code=400, detail="Chapter must have at least one page")
         
-        if len(chapter.pages) > 100:
-            raise HTTPException(status_code=400, detail="Chapter cannot have more than 100 pages")
-        
-        # Create chapter
-        chapter_obj = Chapter(**chapter.model_dump())
-        doc = chapter_obj.model_dump()
-        doc['createdAt'] = doc['createdAt'].isoformat()
-        
-        await db.chapters.insert_one(doc)
+        if len(chapter.pages) > MAX_CHAPTER_PAGES:
+            raise HTTPException(status_code=400, detail=f"Chapter cannot have more than {MAX_CHAPTER_PAGES} pages")
         
-        # Update manga's total chapters count
-        chapter_count = await db.chapters.count_documents({"mangaId": chapter.mangaId})
-        await db.manga.update_one(
-            {"id": chapter.mangaId},
-            {"$set": {"totalChapters": chapter_count}}
-        )
+        # Store page bytes, the chapter only keeps descriptors
+        pages = await store_pages(chapter.pages)
         
-        logger.info(f"Created chapter {chapter_obj.chapterNumber} for manga {chapter.mangaId}")
-        return chapter_obj
+        # Create chapter
+        try:
+            doc = await insert_chapter(chapter.mangaId, chapter.chapterNumber, chapter.title, pages)
+        except HTTPException:
+            await release_page_blobs(page['hash'] for page in pages)
+            raise
+        return serialize_chapter(doc, request)
     except HTTPException:
         raise
     except Exception as e:
@@ -179,18 +814,289 @@ async def create_chapter(chapter: ChapterCreate, authorization: str = Header(Non
         raise HTTPException(status_code=500, detail=f"Failed to create chapter: {str(e)}")
 
 
+# ============= Chapter Upload Sessions =============
+# Large chapters are uploaded page by page as raw bytes: open a session,
+# PUT each page (streamed straight into the page store), then commit.
+# After a dropped connection, GET the session and continue from nextPage.
+
+@api_router.post("/admin/chapter-uploads", response_model=UploadSession)
+async def create_upload_session(upload: UploadSessionCreate, authorization: str = Header(None)):
+    """Open an upload session for a new chapter (Admin only)"""
+    verify_admin(authorization)
+    
+    manga = await db.manga.find_one({"id": upload.mangaId}, {"_id": 0, "id": 1})
+    if not manga:
+        raise HTTPException(status_code=404, detail="Manga not found")
+    
+    if upload.totalPages < 1:
+        raise HTTPException(status_code=400, detail="Chapter must have at least one page")
+    
+    if upload.totalPages > MAX_CHAPTER_PAGES:
+        raise HTTPException(status_code=400, detail=f"Chapter cannot have more than {MAX_CHAPTER_PAGES} pages")
+    
+    await purge_stale_upload_sessions()
+    
+    session_obj = UploadSession(**upload.model_dump())
+    doc = session_obj.model_dump(exclude={"receivedPages", "nextPage"})
+    await db.upload_sessions.insert_one(doc)
+    
+    doc.pop('_id', None)
+    return await upload_session_state(doc)
+
+
+@api_router.get("/admin/chapter-uploads/{session_id}", response_model=UploadSession)
+async def get_upload_session_status(session_id: str, authorization: str = Header(None)):
+    """Pages received so far, used to resume an interrupted upload (Admin only)"""
+    verify_admin(authorization)
+    
+    return await upload_session_state(await get_upload_session(session_id))
+
+
+@api_router.put("/admin/chapter-uploads/{session_id}/pages/{page_number}")
+async def upload_session_page(session_id: str, page_number: int, request: Request,
+                              authorization: str = Header(None)):
+    """Upload one page as the raw request body (Admin only)"""
+    verify_admin(authorization)
+    
+    session = await get_upload_session(session_id)
+    if not 1 <= page_number <= session['totalPages']:
+        raise HTTPException(status_code=400, detail=f"Page number must be between 1 and {session['totalPages']}")
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_PAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Page {page_number} is larger than {MAX_PAGE_BYTES} bytes")
+    
+    # Trust an explicit image type, otherwise sniff it from the bytes
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if not content_type.startswith("image/"):
+        content_type = None
+    
+    try:
+        descriptor = await page_store.put_stream(request.stream(), content_type, max_size=MAX_PAGE_BYTES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Page {page_number}: {str(e)}")
+    
+    if not descriptor['contentType'].startswith("image/"):
+        await release_page_blobs([descriptor['hash']])
+        raise HTTPException(status_code=400, detail=f"Page {page_number}: not a supported image")
+    
+    now = datetime.now(timezone.utc)
+    previous = await db.upload_pages.find_one_and_update(
+        {"sessionId": session_id, "number": page_number},
+        {"$set": {**descriptor, "updatedAt": now}},
+        projection={"_id": 0, "hash": 1},
+        upsert=True
+    )
+    await db.upload_sessions.update_one({"id": session_id}, {"$set": {"updatedAt": now}})
+    
+    # Re-uploading a page replaces it
+    if previous and previous['hash'] != descriptor['hash']:
+        await release_page_blobs([previous['hash']])
+    
+    state = await upload_session_state(session)
+    return {
+        "number": page_number,
+        **descriptor,
+        "receivedPages": len(state['receivedPages']),
+        "nextPage": state['nextPage']
+    }
+
+
+@api_router.post("/admin/chapter-uploads/{session_id}/commit", response_model=Chapter)
+async def commit_upload_session(session_id: str, request: Request, authorization: str = Header(None)):
+    """Create the chapter once every page has been uploaded (Admin only)"""
+    verify_admin(authorization)
+    
+    # Claim the session so a second commit cannot create a duplicate chapter
+    session = await db.upload_sessions.find_one_and_update(
+        {"id": session_id, "committing": {"$ne": True}},
+        {"$set": {"committing": True}},
+        projection={"_id": 0}
+    )
+    if not session:
+        await get_upload_session(session_id)
+        raise HTTPException(status_code=409, detail="Upload session is already being committed")
+    
+    try:
+        uploaded = await db.upload_pages.find(
+            {"sessionId": session_id},
+            {"_id": 0, "number": 1, "hash": 1, "size": 1, "contentType": 1}
+        ).sort("number", 1).to_list(MAX_CHAPTER_PAGES)
+        
+        numbers = [page['number'] for page in uploaded]
+        missing = sorted(set(range(1, session['totalPages'] + 1)) - set(numbers))
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing pages: {missing}")
+        
+        manga = await db.manga.find_one({"id": session['mangaId']}, {"_id": 0, "id": 1})
+        if not manga:
+            raise HTTPException(status_code=404, detail="Manga not found")
+        
+        pages = [{k: page[k] for k in ("hash", "size", "contentType")} for page in uploaded]
+        doc = await insert_chapter(session['mangaId'], session['chapterNumber'], session['title'], pages)
+    except BaseException:
+        await db.upload_sessions.update_one({"id": session_id}, {"$unset": {"committing": ""}})
+        raise
+    
+    # The chapter now references the blobs, so nothing is released here
+    await db.upload_pages.delete_many({"sessionId": session_id})
+    await db.upload_sessions.delete_one({"id": session_id})
+    
+    return serialize_chapter(doc, request)
+
+
+@api_router.delete("/admin/chapter-uploads/{session_id}")
+async def abort_upload_session(session_id: str, authorization: str = Header(None)):
+    """Abandon an upload session and its pages (Admin only)"""
+    verify_admin(authorization)
+    
+    await get_upload_session(session_id)
+    await discard_upload_session(session_id)
+    
+    return {"success": True, "message": "Upload session discarded"}
+
+
+# ============= Library Imports =============
+# Scraper output (downloads/<manga>/chapter_<n>/page_XXX.*, or an archive
+# of it) is imported in the background: POST starts a job, GET reports its
+# progress. Re-running an import only writes chapters that changed.
+
+def import_source_path(source: str) -> Path:
+    """Resolve an import source, refusing paths outside IMPORT_ROOT"""
+    path = (IMPORT_ROOT / source).resolve()
+    if not path.is_relative_to(IMPORT_ROOT):
+        raise HTTPException(status_code=400, detail="Import source must be inside the import directory")
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"Import source {source} not found")
+    return path
+
+
+@api_router.post("/admin/imports")
+async def start_import(request: ImportCreate, authorization: str = Header(None)):
+    """Import downloaded chapters into a manga in the background (Admin only)"""
+    verify_admin(authorization)
+    
+    manga = await db.manga.find_one({"id": request.mangaId}, {"_id": 0, "id": 1})
+    if not manga:
+        raise HTTPException(status_code=404, detail="Manga not found")
+    
+    source = import_source_path(request.source)
+    try:
+        job = await create_import_job(db, request.mangaId, request.source)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    task = asyncio.create_task(run_import_job(db, importer, job, source))
+    import_tasks.add(task)
+    task.add_done_callback(import_tasks.discard)
+    
+    job.pop('active', None)
+    return job
+
+
+@api_router.get("/admin/imports")
+async def list_imports(limit: int = 20, authorization: str = Header(None)):
+    """Most recent import jobs (Admin only)"""
+    verify_admin(authorization)
+    
+    return await db.import_jobs.find({}, {"_id": 0, "active": 0}).sort("createdAt", -1).to_list(min(limit, 100))
+
+
+@api_router.get("/admin/imports/{job_id}")
+async def get_import(job_id: str, authorization: str = Header(None)):
+    """Progress of an import job (Admin only)"""
+    verify_admin(authorization)
+    
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0, "active": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+# ============= Scrape Jobs =============
+# POST queues a scrape (or returns the identical one already queued or
+# running); the dispatcher starts it once a slot for its site is free.
+# Jobs with a mangaId import what they downloaded into that manga.
+
+@api_router.post("/admin/scrape")
+async def start_scrape(request: ScrapeCreate, authorization: str = Header(None)):
+    """Queue a scrape of a title or chapter page (Admin only)"""
+    verify_admin(authorization)
+    
+    if request.mangaId is not None:
+        manga = await db.manga.find_one({"id": request.mangaId}, {"_id": 0, "id": 1})
+        if not manga:
+            raise HTTPException(status_code=404, detail="Manga not found")
+    
+    options = {}
+    if request.kind == "title":
+        options = {"startChapter": request.startChapter, "endChapter": request.endChapter,
+                   "newOnly": request.newOnly}
+    try:
+        job, created = await enqueue_scrape(db, request.kind, request.url, options, request.mangaId)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    for field in ('active', 'key', 'storedPages'):
+        job.pop(field, None)
+    return {**job, "deduplicated": not created}
+
+
+@api_router.get("/admin/scrape")
+async def list_scrapes(status: Optional[str] = None, limit: int = 20, authorization: str = Header(None)):
+    """Most recent scrape jobs, optionally with one status (Admin only)"""
+    verify_admin(authorization)
+    
+    query = {"status": status} if status else {}
+    cursor = db.scrape_jobs.find(query, {"_id": 0, "active": 0, "key": 0, "storedPages": 0}).sort("createdAt", -1)
+    return await cursor.to_list(min(limit, 100))
+
+
+@api_router.get("/admin/scrape/{job_id}")
+async def get_scrape(job_id: str, authorization: str = Header(None)):
+    """Progress of a scrape job (Admin only)"""
+    verify_admin(authorization)
+    
+    job = await db.scrape_jobs.find_one({"id": job_id}, {"_id": 0, "active": 0, "key": 0, "storedPages": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job
+
+
+@api_router.post("/admin/scrape/{job_id}/cancel")
+async def cancel_scrape_job(job_id: str, authorization: str = Header(None)):
+    """Cancel a queued or running scrape job (Admin only)"""
+    verify_admin(authorization)
+    
+    job = await cancel_scrape(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    if job['status'] in ("completed", "failed"):
+        raise HTTPException(status_code=409, detail=f"Scrape job already {job['status']}")
+    
+    for field in ('active', 'key', 'storedPages'):
+        job.pop(field, None)
+    return job
+
+
 @api_router.delete("/admin/manga/{manga_id}")
 async def delete_manga(manga_id: str, authorization: str = Header(None)):
     """Delete manga and all its chapters (Admin only)"""
     verify_admin(authorization)
     
     # Delete manga
-    result = await db.manga.delete_one({"id": manga_id})
-    if result.deleted_count == 0:
+    manga = await db.manga.find_one_and_delete({"id": manga_id}, {"_id": 0, "cover": 1})
+    if not manga:
         raise HTTPException(status_code=404, detail="Manga not found")
+    search_index.remove(manga_id)
+    search_index_changed()
+    await release_cover_blobs(cover_hashes([manga]))
     
-    # Delete all chapters
-    await db.chapters.delete_many({"mangaId": manga_id})
+    # Delete all chapters and their page images
+    chapters = await delete_chapters({"mangaId": manga_id})
+    invalidate_manga([manga_id], chapters=True)
+    await record_manga_deleted(db, 1, deleted_chapters_stats(chapters))
+    await release_page_blobs(page_hashes(chapters))
     
     return {"success": True, "message": "Manga and chapters deleted"}
 
@@ -200,27 +1106,28 @@ async def delete_chapter(chapter_id: str, authorization: str = Header(None)):
     """Delete a chapter (Admin only)"""
     verify_admin(authorization)
     
-    chapter = await db.chapters.find_one({"id": chapter_id}, {"_id": 0})
+    # Delete chapter
+    chapter = await db.chapters.find_one_and_delete(
+        {"id": chapter_id}, {"_id": 0, "mangaId": 1, "pages": 1, "createdAt": 1}
+    )
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
     
-    manga_id = chapter['mangaId']
+    await release_page_blobs(page_hashes([chapter]))
     
-    # Delete chapter
-    await db.chapters.delete_one({"id": chapter_id})
-    
-    # Update manga's total chapters count
-    chapter_count = await db.chapters.count_documents({"mangaId": manga_id})
-    await db.manga.update_one(
-        {"id": manga_id},
-        {"$set": {"totalChapters": chapter_count}}
-    )
+    # Update manga's chapter summary
+    await record_chapters_removed(db, {
+        chapter['mangaId']: {"totalChapters": 1, "totalPages": len(chapter.get('pages', []))}
+    })
+    invalidate_manga([chapter['mangaId']], chapters=True)
+    await record_chapters_deleted(db, deleted_chapter_stats(chapter))
     
     return {"success": True, "message": "Chapter deleted"}
 
 
 @api_router.put("/admin/manga/{manga_id}", response_model=Manga)
-async def update_manga(manga_id: str, manga_update: MangaUpdate, authorization: str = Header(None)):
+async def update_manga(manga_id: str, manga_update: MangaUpdate, request: Request,
+                       authorization: str = Header(None)):
     """Update manga details (Admin only)"""
     verify_admin(authorization)
     
@@ -235,22 +1142,36 @@ async def update_manga(manga_id: str, manga_update: MangaUpdate, authorization:
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
+    update_ops = {}
+    if 'coverImage' in update_data:
+        update_data['cover'] = await save_cover(update_data.pop('coverImage'))
+        update_ops["$unset"] = {"coverImage": ""}
+    update_ops["$set"] = update_data
+    
     # Update manga
     await db.manga.update_one(
         {"id": manga_id},
-        {"$set": update_data}
+        update_ops
     )
     
-    # Get updated manga
-    updated_manga = await db.manga.find_one({"id": manga_id}, {"_id": 0})
-    if isinstance(updated_manga.get('createdAt'), str):
-        updated_manga['createdAt'] = datetime.fromisoformat(updated_manga['createdAt'])
+    if 'cover' in update_data:
+        transcoder.enqueue("covers", [update_data['cover']['original']['hash']])
+        kept = set(cover_hashes([update_data]))
+        await release_cover_blobs(h for h in cover_hashes([existing_manga]) if h not in kept)
     
-    return updated_manga
+    # Get updated manga
+    updated_manga = await db.manga.find_one({"id": manga_id}, {"_id": 0, "coverImage": 0})
+    search_index.add(updated_manga)
+    search_index_changed()
+    invalidate_manga([manga_id])
+    if 'title' in update_data:
+        await refresh_rankings(db)
+    return serialize_manga(updated_manga, request, include_original=True)
 
 
 @api_router.put("/admin/chapter/{chapter_id}", response_model=Chapter)
-async def update_chapter(chapter_id: str, chapter_update: ChapterUpdate, authorization: str = Header(None)):
+async def update_chapter(chapter_id: str, chapter_update: ChapterUpdate, request: Request,
+                         authorization: str = Header(None)):
     """Update chapter details (Admin only)"""
     verify_admin(authorization)
     
@@ -265,18 +1186,54 @@ async def update_chapter(chapter_id: str, chapter_update: ChapterUpdate, authori
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
+    old_pages = existing_chapter.get('pages', [])
+    if 'pages' in update_data:
+        # The admin UI sends back URLs for pages it kept and base64 for new ones
+        new_pages = []
+        for page in update_data['pages']:
+            kept = kept_page(page, chapter_id, old_pages)
+            if kept is not None:
+                new_pages.append(kept)
+            else:
+                new_pages.extend(await store_pages([page]))
+        update_data['pages'] = new_pages
+    
     # Update chapter
-    await db.chapters.update_one(
-        {"id": chapter_id},
-        {"$set": update_data}
-    )
+    try:
+        await db.chapters.update_one(
+            {"id": chapter_id},
+            {"$set": update_data}
+        )
+    except DuplicateKeyError:
+        if 'pages' in update_data:
+            kept = set(page_hashes([existing_chapter]))
+            await release_page_blobs(h for h in page_hashes([update_data]) if h not in kept)
+        raise HTTPException(status_code=409, detail=f"Chapter {update_data['chapterNumber']:g} already exists")
+    
+    if 'pages' in update_data:
+        transcoder.enqueue("pages", [page['hash'] for page in update_data['pages'] if 'formats' not in page])
+        kept = set(page_hashes([update_data]))
+        await release_page_blobs(h for h in page_hashes([existing_chapter]) if h not in kept)
+    
+    manga_id = existing_chapter['mangaId']
+    if 'pages' in update_data or 'chapterNumber' in update_data:
+        page_delta = len(update_data.get('pages', old_pages)) - len(old_pages)
+        await record_chapter_changed(
+            db,
+            manga_id,
+            existing_chapter['chapterNumber'],
+            update_data.get('chapterNumber', existing_chapter['chapterNumber']),
+            page_delta
+        )
+        await record_pages_changed(db, page_delta)
+        invalidate_manga([manga_id], chapters=True)
+    else:
+        # Only the chapter list shows the title, the manga summary is unchanged
+        response_cache.invalidate(chapters_tag(manga_id))
     
     # Get updated chapter
     updated_chapter = await db.chapters.find_one({"id": chapter_id}, {"_id": 0})
-    if isinstance(updated_chapter.get('createdAt'), str):
-        updated_chapter['createdAt'] = datetime.fromisoformat(updated_chapter['createdAt'])
-    
-    return updated_chapter
+    return serialize_chapter(updated_chapter, request)
 
 
 @api_router.post("/admin/manga/bulk-delete")
@@ -284,11 +1241,19 @@ async def bulk_delete_manga(request: BulkDeleteRequest, authorization: str = Hea
     """Bulk delete manga (Admin only)"""
     verify_admin(authorization)
     
-    # Delete all manga
+    # Delete all manga and their covers
+    manga_list = await db.manga.find({"id": {"$in": request.ids}}, {"_id": 0, "cover": 1}).to_list(1000)
     result = await db.manga.delete_many({"id": {"$in": request.ids}})
+    for manga_id in request.ids:
+        search_index.remove(manga_id)
+    search_index_changed()
+    await release_cover_blobs(cover_hashes(manga_list))
     
-    # Delete all associated chapters
-    await db.chapters.delete_many({"mangaId": {"$in": request.ids}})
+    # Delete all associated chapters and their page images
+    chapters = await delete_chapters({"mangaId": {"$in": request.ids}})
+    invalidate_manga(request.ids, chapters=True)
+    await record_manga_deleted(db, result.deleted_count, deleted_chapters_stats(chapters))
+    await release_page_blobs(page_hashes(chapters))
     
     return {"success": True, "deleted": result.deleted_count}
 
@@ -298,139 +1263,289 @@ async def bulk_delete_chapters(request: BulkDeleteRequest, authorization: str =
     """Bulk delete chapters (Admin only)"""
     verify_admin(authorization)
     
-    # Get all chapters to find their manga IDs
-    chapters = await db.chapters.find({"id": {"$in": request.ids}}, {"_id": 0, "mangaId": 1}).to_list(1000)
-    manga_ids = list(set([c['mangaId'] for c in chapters]))
+    chapters = await delete_chapters({"id": {"$in": request.ids}})
+    await release_page_blobs(page_hashes(chapters))
     
-    # Delete chapters
-    result = await db.chapters.delete_many({"id": {"$in": request.ids}})
+    # Update chapter summaries for affected manga
+    counts = removal_counts(chapters)
+    await record_chapters_removed(db, counts)
+    invalidate_manga(counts.keys(), chapters=True)
+    await record_chapters_deleted(db, deleted_chapters_stats(chapters))
     
-    # Update chapter counts for affected manga
-    for manga_id in manga_ids:
-        chapter_count = await db.chapters.count_documents({"mangaId": manga_id})
-        await db.manga.update_one(
-            {"id": manga_id},
-            {"$set": {"totalChapters": chapter_count}}
-        )
-    
-    return {"success": True, "deleted": result.deleted_count}
+    return {"success": True, "deleted": len(chapters)}
 
 
 @api_router.get("/admin/statistics")
 async def get_statistics(authorization: str = Header(None)):
-    """Get admin statistics (Admin only)"""
-    verify_admin(authorization)
+    """
+    Get admin statistics (Admin only)
     
-    total_manga = await db.manga.count_documents({})
-    total_chapters = await db.chapters.count_documents({})
+    Served from the materialized statistics document, which writes keep current.
+    """
+    verify_admin(authorization)
     
-    # Get manga with most chapters
-    pipeline = [
-        {"$group": {"_id": "$mangaId", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 1}
-    ]
-    top_chapter_result = await db.chapters.aggregate(pipeline).to_list(1)
+    return await read_statistics(db)
+
+
+@api_router.get("/admin/transcoding")
+async def get_transcoding_report(authorization: str = Header(None)):
+    """Transcoding queue state, compression ratios and encode times (Admin only)"""
+    verify_admin(authorization)
     
-    # Get recent manga
-    recent_manga = await db.manga.find({}, {"_id": 0, "id": 1, "title": 1, "createdAt": 1}).sort("createdAt", -1).limit(5).to_list(5)
+    return await transcoder.report()
+
+
+@api_router.get("/admin/response-cache")
+async def get_response_cache_stats(authorization: str = Header(None)):
+    """Hit rate and size of the public response cache (Admin only)"""
+    verify_admin(authorization)
     
-    return {
-        "totalManga": total_manga,
-        "totalChapters": total_chapters,
-        "averageChaptersPerManga": round(total_chapters / total_manga, 2) if total_manga > 0 else 0,
-        "recentManga": recent_manga
-    }
+    return response_cache.stats()
 
 
 # ============= Public Routes =============
 
+async def manga_page(request: Request, sort: str, limit: int,
+                     cursor: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """One keyset page of manga as a JSON body, with the next cursor in the X-Next-Cursor header"""
+    if sort not in MANGA_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(MANGA_SORTS)}")
+    
+    try:
+        manga_list, next_cursor = await fetch_page(db.manga, sort, limit, cursor, MANGA_LIST_PROJECTION)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    body = render_json([serialize_manga(manga, request) for manga in manga_list])
+    return body, headers
+
+
 @api_router.get("/manga", response_model=List[Manga])
-async def get_all_manga(limit: int = 50, skip: int = 0):
-    """Get all manga (paginated)"""
-    manga_list = await db.manga.find({}, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
+async def get_all_manga(request: Request, limit: int = 50, skip: int = 0,
+                        sort: str = DEFAULT_MANGA_SORT, cursor: Optional[str] = None):
+    """
+    Get all manga (paginated)
     
-    for manga in manga_list:
-        if isinstance(manga.get('createdAt'), str):
-            manga['createdAt'] = datetime.fromisoformat(manga['createdAt'])
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    Sorts: createdAt (newest first), title, totalChapters (most first), updated (latest chapter first).
+    """
+    async def load():
+        if skip and not cursor:
+            # Offset paging is kept for old clients, its cost grows with the offset
+            if sort not in MANGA_SORTS:
+                raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(MANGA_SORTS)}")
+            field, direction = MANGA_SORTS[sort]
+            page_size = max(1, min(limit, 100))
+            manga_list = await db.manga.find({}, MANGA_LIST_PROJECTION).sort(
+                [(field, direction), ("id", direction)]
+            ).skip(skip).limit(page_size).to_list(page_size)
+            return render_json([serialize_manga(manga, request) for manga in manga_list]), {}
+        
+        return await manga_page(request, sort, limit, cursor)
     
-    return manga_list
+    return await response_cache.respond(request, [MANGA_LIST_TAG], load)
 
 
 @api_router.get("/manga/{manga_id}", response_model=Manga)
-async def get_manga_details(manga_id: str):
+async def get_manga_details(manga_id: str, request: Request):
     """Get manga details by ID"""
-    manga = await db.manga.find_one({"id": manga_id}, {"_id": 0})
+    async def load():
+        manga = await db.manga.find_one({"id": manga_id}, {"_id": 0, "coverImage": 0})
+        
+        if not manga:
+            raise HTTPException(status_code=404, detail="Manga not found")
+        
+        return render_json(serialize_manga(manga, request, include_original=True)), {}
+    
+    return await response_cache.respond(request, [manga_tag(manga_id)], load)
+
+
+@api_router.get("/manga/{manga_id}/cover", name="get_manga_cover")
+async def get_manga_cover(manga_id: str, request: Request):
+    """Get the original full-size cover image"""
+    manga = await db.manga.find_one({"id": manga_id}, {"_id": 0, "cover.original": 1, "coverImage": 1})
     
     if not manga:
         raise HTTPException(status_code=404, detail="Manga not found")
     
-    if isinstance(manga.get('createdAt'), str):
-        manga['createdAt'] = datetime.fromisoformat(manga['createdAt'])
+    headers = {"Cache-Control": "public, max-age=3600"}
+    if manga.get('cover'):
+        # Smallest transcoded format the client accepts, or the upload itself
+        original = choose_format(manga['cover']['original'], request.headers.get("accept"))
+        data = await cover_store.get(original['hash'])
+        if data is None:
+            raise HTTPException(status_code=404, detail="Cover image missing from storage")
+        content_type = original['contentType']
+        headers["Vary"] = "Accept"
+    else:
+        try:
+            data, content_type = decode_image_payload(manga.get('coverImage') or '')
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Cover image not available")
     
-    return manga
+    return Response(content=data, media_type=content_type, headers=headers)
+
+
+@api_router.get("/covers/{digest}", name="get_cover")
+async def get_cover(digest: str):
+    """Get a cover thumbnail by content hash"""
+    grid_out = await cover_store.open(digest)
+    if grid_out is None:
+        raise HTTPException(status_code=404, detail="Cover not found")
+    
+    return StreamingResponse(
+        cover_store.iter_range(grid_out),
+        media_type=(grid_out.metadata or {}).get('contentType', 'image/webp'),
+        headers={
+            "Content-Length": str(grid_out.length),
+            "ETag": f'"{digest}"',
+            # Content-addressed, the bytes behind this URL never change
+            "Cache-Control": "public, max-age=31536000, immutable",
+        }
+    )
 
 
 @api_router.get("/manga/{manga_id}/chapters")
-async def get_manga_chapters(manga_id: str):
+async def get_manga_chapters(manga_id: str, request: Request):
     """Get all chapters for a manga"""
-    chapters = await db.chapters.find(
-        {"mangaId": manga_id}, 
-        {"_id": 0, "pages": 0}  # Exclude pages for list view
-    ).sort("chapterNumber", 1).to_list(1000)
-    
-    for chapter in chapters:
-        if isinstance(chapter.get('createdAt'), str):
-            chapter['createdAt'] = datetime.fromisoformat(chapter['createdAt'])
-        # Add empty pages array for compatibility
-        chapter['pages'] = []
+    async def load():
+        chapters = await db.chapters.find(
+            {"mangaId": manga_id}, 
+            {"_id": 0, "pages": 0}  # Exclude pages for list view
+        ).sort("chapterNumber", 1).to_list(1000)
+        
+        for chapter in chapters:
+            # Add empty pages array for compatibility
+            chapter['pages'] = []
+        
+        return render_json(chapters), {}
     
-    return chapters
+    return await response_cache.respond(request, [chapters_tag(manga_id)], load)
 
 
 @api_router.get("/chapter/{chapter_id}", response_model=Chapter)
-async def get_chapter_details(chapter_id: str):
-    """Get chapter details including all pages"""
+async def get_chapter_details(chapter_id: str, request: Request):
+    """Get chapter details with page descriptors (page bytes are served separately)"""
     chapter = await db.chapters.find_one({"id": chapter_id}, {"_id": 0})
     
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
     
-    if isinstance(chapter.get('createdAt'), str):
-        chapter['createdAt'] = datetime.fromisoformat(chapter['createdAt'])
+    return json_response(serialize_chapter(chapter, request))
+
+
+@api_router.get("/chapter/{chapter_id}/page/{page_number}", name="get_chapter_page")
+async def get_chapter_page(chapter_id: str, page_number: int, request: Request, v: Optional[str] = None):
+    """Stream a single page image (supports Range and conditional requests)"""
+    if page_number < 1:
+        raise HTTPException(status_code=404, detail="Page not found")
+    
+    chapter = await db.chapters.find_one(
+        {"id": chapter_id},
+        {"_id": 0, "id": 1, "pages": {"$slice": [page_number - 1, 1]}}
+    )
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    if not chapter.get('pages'):
+        raise HTTPException(status_code=404, detail="Page not found")
+    
+    page = chapter['pages'][0]
     
-    return chapter
+    # Legacy chapter that still stores base64 inline
+    if isinstance(page, str):
+        try:
+            data, content_type = decode_image_payload(page)
+        except ValueError:
+            raise HTTPException(status_code=500, detail="Stored page is corrupt")
+        headers = {"ETag": f'"{hashlib.sha256(data).hexdigest()}"', "Cache-Control": "public, max-age=3600"}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=data, media_type=content_type, headers=headers)
+    
+    # Versioning is by the original upload, the bytes served depend on Accept
+    versioned = bool(v) and page['hash'].startswith(v)
+    body = choose_format(page, request.headers.get("accept"))
+    
+    etag = f'"{body["hash"]}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept",
+        # Versioned URLs always point at the same bytes
+        "Cache-Control": "public, max-age=31536000, immutable" if versioned else "public, max-age=3600",
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    grid_out = await page_store.open(body['hash'])
+    if grid_out is None:
+        raise HTTPException(status_code=404, detail="Page image missing from storage")
+    
+    size = grid_out.length
+    byte_range = parse_range_header(request.headers.get("range"), size)
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            page_store.iter_range(grid_out, start, end),
+            status_code=206,
+            media_type=body['contentType'],
+            headers=headers
+        )
+    
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        page_store.iter_range(grid_out),
+        media_type=body['contentType'],
+        headers=headers
+    )
+
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Route latency/size histograms, Mongo command timings and scraper phases of every worker (Prometheus text format)"""
+    content = await asyncio.to_thread(shared_metrics.render)
+    return Response(content=content, media_type=METRICS_CONTENT_TYPE)
 
 
 @api_router.get("/search")
-async def search_manga(q: str):
-    """Search manga by title"""
+async def search_manga(q: str, request: Request):
+    """Search manga by title, author, genres and description (ranked, typo tolerant)"""
     if not q or len(q.strip()) < 2:
         return []
     
-    # Case-insensitive search
-    manga_list = await db.manga.find(
-        {"title": {"$regex": q, "$options": "i"}},
-        {"_id": 0}
-    ).limit(20).to_list(20)
+    refresh_search_index()
+    manga_ids = search_index.search(q, limit=20)
+    if not manga_ids:
+        return []
     
-    for manga in manga_list:
-        if isinstance(manga.get('createdAt'), str):
-            manga['createdAt'] = datetime.fromisoformat(manga['createdAt'])
+    manga_list = await db.manga.find(
+        {"id": {"$in": manga_ids}},
+        MANGA_LIST_PROJECTION
+    ).to_list(len(manga_ids))
     
-    return manga_list
+    # Restore the ranking order
+    by_id = {manga['id']: manga for manga in manga_list}
+    return json_response([serialize_manga(by_id[manga_id], request) for manga_id in manga_ids if manga_id in by_id])
+
+
+@api_router.get("/search/suggest")
+async def suggest_manga(q: str, limit: int = 10):
+    """Autocomplete manga titles from a prefix"""
+    refresh_search_index()
+    return search_index.suggest(q, limit=min(limit, 50))
 
 
 @api_router.get("/featured")
-async def get_featured_manga(limit: int = 6):
-    """Get featured manga (most recent)"""
-    manga_list = await db.manga.find({}, {"_id": 0}).sort("createdAt", -1).limit(limit).to_list(limit)
-    
-    for manga in manga_list:
-        if isinstance(manga.get('createdAt'), str):
-            manga['createdAt'] = datetime.fromisoformat(manga['createdAt'])
-    
-    return manga_list
+async def get_featured_manga(request: Request, limit: int = 6,
+                             sort: str = DEFAULT_MANGA_SORT, cursor: Optional[str] = None):
+    """Get featured manga (most recent by default, same cursors as /manga)"""
+    return await response_cache.respond(
+        request, [MANGA_LIST_TAG], lambda: manga_page(request, sort, limit, cursor)
+    )
 
 
 # Add CORS middleware FIRST
@@ -440,9 +1555,13 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
     max_age=3600,
 )
 
+# Outermost, so timings include CORS handling
+app.add_middleware(MetricsMiddleware)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -452,7 +1571,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
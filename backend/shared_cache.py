@@ -0,0 +1,267 @@
+"""
+Cross-worker caches for Red Manga
+Rendered responses are files on a tmpfs (/dev/shm), so every worker
+process reads the one copy in shared memory instead of keeping its own.
+Invalidation tags map to counters in a memory-mapped file: an admin write
+in any worker bumps them, and every worker then treats entries stored
+under an older generation as gone
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from response_cache import DEFAULT_CACHE_CONTROL, CachedResponse, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# 8-byte counters; tags hash onto slots, a collision only costs an extra miss
+GENERATION_SLOTS = 1 << 16
+
+HEADER_LENGTH = struct.Struct('<I')
+COUNTER = struct.Struct('<Q')
+
+
+def shared_cache_root() -> Path:
+    root = os.environ.get('SHARED_CACHE_ROOT')
+    if root:
+        return Path(root)
+    return Path('/dev/shm') if os.path.isdir('/dev/shm') else Path(tempfile.gettempdir())
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def shared_cache_dir(name: str) -> Path:
+    """
+    Cache directory shared by the workers of one server
+
+    Workers of one uvicorn/gunicorn server have the same parent process, so
+    the directory is keyed by it; directories of servers that are no longer
+    running are removed.
+    """
+    root = shared_cache_root()
+    prefix = f"redmanga-{name}-"
+    try:
+        for item in root.iterdir():
+            pid = item.name[len(prefix):]
+            if item.name.startswith(prefix) and pid.isdigit() and not _process_alive(int(pid)):
+                shutil.rmtree(item, ignore_errors=True)
+    except OSError as e:
+        logger.warning(f"Could not clean up old cache directories in {root}: {e}")
+    return root / f"{prefix}{os.getppid()}"
+
+
+class SharedGenerations:
+    """Per-tag invalidation counters in a memory-mapped file shared by every worker"""
+
+    def __init__(self, path: Path, slots: int = GENERATION_SLOTS):
+        self.path = Path(path)
+        self.slots = slots
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * COUNTER.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _offset(self, tag: str) -> int:
+        # hash() is salted per process, the slot must be the same in every worker
+        digest = hashlib.blake2b(tag.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.slots * COUNTER.size
+
+    def get(self, tag: str) -> int:
+        return COUNTER.unpack_from(self._map, self._offset(tag))[0]
+
+    def bump(self, *tags: str) -> List[int]:
+        """Increment the counters of the tags, returning their new values."""
+        values = []
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            for tag in tags:
+                offset = self._offset(tag)
+                value = COUNTER.unpack_from(self._map, offset)[0] + 1
+                COUNTER.pack_into(self._map, offset, value)
+                values.append(value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return values
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class SharedResponseCache(ResponseCache):
+    """ResponseCache whose entries and invalidations are shared by every worker process"""
+
+    # Stores in this worker between capacity sweeps
+    SWEEP_INTERVAL = 64
+
+    def __init__(self, directory: Path, generations: SharedGenerations, max_entries: int = 2048,
+                 max_bytes: int = 32 * 1024 * 1024, ttl: float = 600.0,
+                 cache_control: str = DEFAULT_CACHE_CONTROL):
+        """
+        Args:
+            directory: Entry directory, on a tmpfs so reads come from shared memory
+            generations: Invalidation counters shared with the other workers
+            max_entries: Oldest responses are removed beyond this
+            max_bytes: Oldest responses are removed beyond this total size
+                (Docker's /dev/shm is 64 MiB by default)
+            ttl: Upper bound on how long a response is kept, as a safety net
+            cache_control: Cache-Control header sent with cached routes
+        """
+        super().__init__(max_entries, ttl, cache_control)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.generations = generations
+        self.max_bytes = max_bytes
+        self._stores_since_sweep = 0
+
+    @staticmethod
+    def clock() -> float:
+        # Expiry times are compared across processes
+        return time.time()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha256(key.encode()).hexdigest()
+
+    def _generation_snapshot(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self.generations.get(tag) for tag in tags)
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            data = self._path(key).read_bytes()
+            (length,) = HEADER_LENGTH.unpack_from(data)
+            header = json.loads(data[HEADER_LENGTH.size:HEADER_LENGTH.size + length])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error):
+            self._drop(key)
+            return None
+
+        stale = any(self.generations.get(tag) != generation for tag, generation in header['tags'].items())
+        if stale or header['expiresAt'] <= self.clock():
+            self._drop(key)
+            return None
+
+        body = data[HEADER_LENGTH.size + length:]
+        return CachedResponse(body, header['headers'], set(header['tags']), header['expiresAt'],
+                              header['tags'], header['etag'])
+
+    def _store(self, key: str, entry: CachedResponse):
+        path = self._path(key)
+        header = json.dumps({
+            "etag": entry.etag,
+            "headers": entry.headers,
+            "tags": entry.generations,
+            "expiresAt": entry.expires_at,
+        }).encode()
+
+        # Written aside and renamed, so readers never see a partial entry
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(partial, 'wb') as f:
+                f.write(HEADER_LENGTH.pack(len(header)))
+                f.write(header)
+                f.write(entry.body)
+            os.replace(partial, path)
+        except OSError as e:
+            # Usually a full tmpfs, serve uncached
+            logger.warning(f"Could not store cached response: {e}")
+            partial.unlink(missing_ok=True)
+            return
+
+        self._stores_since_sweep += 1
+        if self._stores_since_sweep >= self.SWEEP_INTERVAL:
+            self.sweep()
+
+    def _drop(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry, newest first"""
+        files = []
+        now = time.time()
+        for item in os.scandir(self.directory):
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            if item.name.endswith('.tmp'):
+                # Left behind by a worker that died mid-write
+                if now - stat.st_mtime > 60:
+                    os.unlink(item.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+        files.sort(reverse=True)
+        return files
+
+    def sweep(self) -> int:
+        """
+        Remove expired responses, then the oldest beyond max_entries or max_bytes
+
+        Returns:
+            Number of responses removed
+        """
+        self._stores_since_sweep = 0
+        now = time.time()
+        kept = kept_bytes = removed = 0
+        for mtime, size, path in self._scan():
+            if now - mtime >= self.ttl or kept >= self.max_entries or kept_bytes + size > self.max_bytes:
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            else:
+                kept += 1
+                kept_bytes += size
+        return removed
+
+    def invalidate(self, *tags: str):
+        """Invalidate every response carrying any of the tags, in every worker."""
+        if tags:
+            self.generations.bump(*tags)
+        self.invalidations += 1
+
+    def clear(self):
+        for _, _, path in self._scan():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        """Shared entry counts, with the hit counters of this worker"""
+        files = self._scan()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "maxEntries": self.max_entries,
+            "maxBytes": self.max_bytes,
+            "directory": str(self.directory),
+            "worker": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,313 @@
+"""
+Materialized admin statistics for Red Manga
+A single `statistics` document holds site-wide totals, stored bytes per
+blob store, chapter uploads per day and the top/recent manga rankings.
+Manga, chapter and blob writes keep it current with atomic $inc updates
+so the dashboard is one _id lookup, and a periodic full recompute
+corrects any drift with $inc updates of its own
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_ID = "site"
+
+RECOMPUTE_INTERVAL_SECONDS = int(os.environ.get('STATISTICS_RECOMPUTE_SECONDS', 6 * 3600))
+
+# Length of the uploads-per-day series and of the manga rankings
+UPLOAD_DAYS = 30
+RANKING_SIZE = 5
+
+STORE_NAMES = ("pages", "covers")
+
+# Incrementally maintained fields, compared against the recompute to report drift
+COUNTER_FIELDS = ("totalManga", "totalChapters", "totalPages") + tuple(f"storedBytes.{s}" for s in STORE_NAMES)
+
+
+def day_key(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+def upload_window_start() -> str:
+    return day_key(datetime.now(timezone.utc) - timedelta(days=UPLOAD_DAYS - 1))
+
+
+def _day_increments(days: Dict[str, int], sign: int) -> Dict[str, int]:
+    """$inc entries for uploadsPerDay, ignoring days that already left the window"""
+    start = upload_window_start()
+    return {f"uploadsPerDay.{day}": sign * count for day, count in days.items() if day >= start}
+
+
+def chapter_day_pipeline(match: Dict) -> List[Dict]:
+    """Chapters and pages per upload day of the chapters matching a filter"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+            "chapters": {"$sum": 1},
+            "pages": {"$sum": {"$size": {"$ifNull": ["$pages", []]}}},
+        }},
+    ]
+
+
+async def _increment(db, increments: Dict):
+    increments = {field: value for field, value in increments.items() if value}
+    if increments:
+        await db.statistics.update_one(
+            {"_id": STATISTICS_ID},
+            {"$inc": increments, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+
+async def refresh_rankings(db):
+    """Re-read the top and recent manga (two bounded index scans)."""
+    fields = {"_id": 0, "id": 1, "title": 1, "totalChapters": 1, "createdAt": 1}
+    top = await db.manga.find({}, fields).sort(
+        [("totalChapters", -1), ("id", -1)]
+    ).limit(RANKING_SIZE).to_list(RANKING_SIZE)
+    recent = await db.manga.find({}, fields).sort(
+        [("createdAt", -1), ("id", -1)]
+    ).limit(RANKING_SIZE).to_list(RANKING_SIZE)
+    await db.statistics.update_one(
+        {"_id": STATISTICS_ID},
+        {"$set": {"topManga": top, "recentManga": recent}},
+        upsert=True
+    )
+
+
+async def record_manga_added(db):
+    await _increment(db, {"totalManga": 1})
+    await refresh_rankings(db)
+
+
+def deleted_chapter_stats(chapter: Dict) -> Dict:
+    """
+    Chapters, pages and upload days of one chapter document that was deleted
+
+    Counted from the document the delete returned, so concurrent deletes of
+    the same chapter only subtract it once.
+
+    Returns:
+        Dictionary with "chapters", "pages" and "days" (day -> chapters)
+    """
+    created_at = chapter.get('createdAt')
+    return {
+        "chapters": 1,
+        "pages": len(chapter.get('pages', [])),
+        "days": {day_key(created_at): 1} if isinstance(created_at, datetime) else {},
+    }
+
+
+def deleted_chapters_stats(chapters: List[Dict]) -> Dict:
+    """deleted_chapter_stats() summed over chapter documents that were already deleted"""
+    removed = {"chapters": 0, "pages": 0, "days": {}}
+    for chapter in chapters:
+        stats = deleted_chapter_stats(chapter)
+        removed["chapters"] += 1
+        removed["pages"] += stats["pages"]
+        for day, count in stats["days"].items():
+            removed["days"][day] = removed["days"].get(day, 0) + count
+    return removed
+
+
+async def record_manga_deleted(db, manga_count: int, removed: Dict):
+    """
+    Subtract deleted manga and their chapters
+
+    Args:
+        db: Motor database handle
+        manga_count: Number of manga deleted
+        removed: Result of deleted_chapters_stats() for the chapters deleted with them
+    """
+    await _increment(db, {
+        "totalManga": -manga_count,
+        "totalChapters": -removed["chapters"],
+        "totalPages": -removed["pages"],
+        **_day_increments(removed["days"], -1),
+    })
+    await refresh_rankings(db)
+
+
+async def record_chapter_uploaded(db, created_at: datetime, page_count: int):
+    await record_chapters_uploaded(db, created_at, 1, page_count)
+
+
+async def record_chapters_uploaded(db, created_at: datetime, chapter_count: int, page_delta: int):
+    """Count a batch of chapters created at the same moment (e.g. by an import)."""
+    await _increment(db, {
+        "totalChapters": chapter_count,
+        "totalPages": page_delta,
+        **_day_increments({day_key(created_at): chapter_count}, 1),
+    })
+    if chapter_count:
+        await refresh_rankings(db)
+
+
+async def record_chapters_deleted(db, removed: Dict):
+    """Subtract deleted chapters (removed is the result of deleted_chapters_stats())."""
+    await _increment(db, {
+        "totalChapters": -removed["chapters"],
+        "totalPages": -removed["pages"],
+        **_day_increments(removed["days"], -1),
+    })
+    await refresh_rankings(db)
+
+
+async def record_pages_changed(db, page_delta: int):
+    await _increment(db, {"totalPages": page_delta})
+
+
+async def record_stored_bytes(db, store_name: str, delta: int):
+    """BlobStore size hook: count bytes written to or deleted from a store."""
+    await _increment(db, {f"storedBytes.{store_name}": delta})
+
+
+async def compute_statistics(db) -> Dict:
+    """Every statistic computed from scratch with full scans"""
+    stats = {
+        "totalManga": await db.manga.count_documents({}),
+        "totalChapters": 0,
+        "totalPages": 0,
+        "storedBytes": {},
+        "uploadsPerDay": {},
+    }
+
+    totals = [{"$group": {
+        "_id": None,
+        "chapters": {"$sum": 1},
+        "pages": {"$sum": {"$size": {"$ifNull": ["$pages", []]}}},
+    }}]
+    async for row in db.chapters.aggregate(totals):
+        stats["totalChapters"] = row['chapters']
+        stats["totalPages"] = row['pages']
+
+    # Uploads still in progress are not counted until renamed to their digest
+    for store_name in STORE_NAMES:
+        stored = [
+            {"$match": {"filename": {"$not": {"$regex": "^partial-"}}}},
+            {"$group": {"_id": None, "bytes": {"$sum": "$length"}}},
+        ]
+        stats["storedBytes"][store_name] = 0
+        async for row in db[f"{store_name}.files"].aggregate(stored):
+            stats["storedBytes"][store_name] = row['bytes']
+
+    start = datetime.now(timezone.utc) - timedelta(days=UPLOAD_DAYS - 1)
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    async for row in db.chapters.aggregate(chapter_day_pipeline({"createdAt": {"$gte": start}})):
+        stats["uploadsPerDay"][row['_id']] = row['chapters']
+
+    return stats
+
+
+def counter_values(doc: Dict) -> Dict[str, int]:
+    """Counters of a statistics document (or of compute_statistics()) by dotted field, uploads within the window"""
+    values = {}
+    for field in COUNTER_FIELDS:
+        group, _, key = field.partition('.')
+        value = (doc.get(group) or {}).get(key) if key else doc.get(group)
+        if value is not None:
+            values[field] = value
+    start = upload_window_start()
+    for day, count in (doc.get('uploadsPerDay') or {}).items():
+        if day >= start:
+            values[f"uploadsPerDay.{day}"] = count
+    return values
+
+
+async def recompute_statistics(db) -> List[str]:
+    """
+    Correct the statistics document from a full recompute, logging counters that had drifted
+
+    Writes keep applying their $inc while the scans run, so the correction
+    is applied as the $inc of the difference, and only to counters that did
+    not change during the scans: for those it cannot be told whether the
+    scans saw the write, and the next pass corrects them.
+
+    Returns:
+        Names of the counters that were corrected
+    """
+    before = counter_values(await db.statistics.find_one({"_id": STATISTICS_ID}) or {})
+    actual = await compute_statistics(db)
+    current = await db.statistics.find_one({"_id": STATISTICS_ID}) or {}
+
+    stored_values = counter_values(current)
+    actual_values = counter_values(actual)
+    increments = {}
+    drifted = []
+    for field in sorted(set(stored_values) | set(actual_values)):
+        stored = stored_values.get(field, 0)
+        expected = actual_values.get(field, 0)
+        if stored == expected:
+            continue
+        if before.get(field, 0) != stored:
+            logger.info(f"Statistics counter {field} changed during the recompute, left for the next pass")
+            continue
+        increments[field] = expected - stored
+        if current and field in COUNTER_FIELDS:
+            drifted.append(field)
+            logger.warning(f"Statistics drift on {field}: stored {stored}, actual {expected}")
+
+    # Days that left the window are dropped
+    start = upload_window_start()
+    expired = {f"uploadsPerDay.{day}": "" for day in (current.get('uploadsPerDay') or {}) if day < start}
+
+    now = datetime.now(timezone.utc)
+    update = {"$set": {"updatedAt": now, "recomputedAt": now}}
+    if increments:
+        update["$inc"] = increments
+    if expired:
+        update["$unset"] = expired
+    await db.statistics.update_one({"_id": STATISTICS_ID}, update, upsert=True)
+    await refresh_rankings(db)
+    return drifted
+
+
+async def read_statistics(db) -> Dict:
+    """The statistics document, shaped for the admin dashboard"""
+    doc = await db.statistics.find_one({"_id": STATISTICS_ID})
+    if doc is None or "recomputedAt" not in doc:
+        await recompute_statistics(db)
+        doc = await db.statistics.find_one({"_id": STATISTICS_ID})
+
+    total_manga = doc.get('totalManga', 0)
+    total_chapters = doc.get('totalChapters', 0)
+    stored = {store_name: doc.get('storedBytes', {}).get(store_name, 0) for store_name in STORE_NAMES}
+
+    # Zero-filled series, oldest day first
+    uploads = doc.get('uploadsPerDay', {})
+    today = datetime.now(timezone.utc)
+    days = [day_key(today - timedelta(days=n)) for n in range(UPLOAD_DAYS - 1, -1, -1)]
+
+    return {
+        "totalManga": total_manga,
+        "totalChapters": total_chapters,
+        "totalPages": doc.get('totalPages', 0),
+        "averageChaptersPerManga": round(total_chapters / total_manga, 2) if total_manga > 0 else 0,
+        "storedBytes": {**stored, "total": sum(stored.values())},
+        "uploadsPerDay": [{"date": day, "chapters": uploads.get(day, 0)} for day in days],
+        "topManga": doc.get('topManga', []),
+        "recentManga": doc.get('recentManga', []),
+        "updatedAt": doc.get('updatedAt'),
+        "recomputedAt": doc.get('recomputedAt'),
+    }
+
+
+async def run_statistics_recompute(db, interval: Optional[float] = None, lease=None):
+    """Background task: recompute the statistics at startup and then periodically (while holding `lease`, if given)."""
+    interval = interval or RECOMPUTE_INTERVAL_SECONDS
+    while True:
+        try:
+            if lease is None or await lease.acquire():
+                drifted = await recompute_statistics(db)
+                logger.info(f"Statistics recomputed, {len(drifted)} counters had drifted")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Statistics recompute failed: {e}")
+        await asyncio.sleep(interval)
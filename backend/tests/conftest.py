@@ -0,0 +1,16 @@
+"""
+Shared pytest setup for the Red Manga backend tests
+
+The backend is a set of flat modules, so the tests import them by name
+from the backend directory.
+
+Usage:
+    cd backend && python -m pytest tests
+    MONGO_URL=mongodb://localhost:27017 python -m pytest tests   # include the Mongo checks
+"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
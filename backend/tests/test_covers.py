@@ -0,0 +1,62 @@
+"""
+Cover thumbnail rendering
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from covers import COVER_WIDTHS, THUMBNAIL_FORMAT, render_cover_variants
+
+EXIF_ORIENTATION = 0x0112
+
+
+def encode(image: Image.Image, image_format: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def test_variants_never_upscale():
+    variants = render_cover_variants(encode(Image.new('RGB', (200, 300), 'white'), 'PNG'))
+    assert [width for width, _, _ in variants] == list(COVER_WIDTHS)
+    sizes = [Image.open(io.BytesIO(data)).size for _, data, _ in variants]
+    assert sizes == [(160, 240), (200, 300), (200, 300)]
+
+
+def test_variants_apply_exif_orientation():
+    # 400x200 stored sideways (orientation 8: rotate 90 degrees counter-clockwise)
+    image = Image.new('RGB', (400, 200), 'red')
+    image.paste('blue', (200, 0, 400, 200))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 8
+
+    _, data, _ = render_cover_variants(encode(image, 'JPEG', exif=exif.tobytes()))[0]
+    thumbnail = Image.open(io.BytesIO(data)).convert('RGB')
+    assert thumbnail.size == (160, 320)
+    top, bottom = thumbnail.getpixel((80, 40)), thumbnail.getpixel((80, 280))
+    assert top[2] > 200 and top[0] < 50
+    assert bottom[0] > 200 and bottom[2] < 50
+
+
+@pytest.mark.skipif(THUMBNAIL_FORMAT[0] != 'WEBP', reason="JPEG thumbnails have no alpha channel")
+@pytest.mark.parametrize("mode, color", [('LA', (128, 0)), ('RGBA', (10, 20, 30, 0))])
+def test_variants_keep_alpha(mode, color):
+    for _, data, _ in render_cover_variants(encode(Image.new(mode, (32, 32), color), 'PNG')):
+        thumbnail = Image.open(io.BytesIO(data))
+        assert thumbnail.mode == 'RGBA'
+        assert thumbnail.getpixel((4, 4))[3] == 0
+
+
+def test_oversized_cover_is_rejected(monkeypatch):
+    data = encode(Image.new('RGB', (100, 100)), 'PNG')
+    # Twice the pixel limit raises DecompressionBombError instead of warning
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100 * 100 // 3)
+    with pytest.raises(ValueError):
+        render_cover_variants(data)
+
+
+def test_invalid_cover_is_rejected():
+    with pytest.raises(ValueError):
+        render_cover_variants(b"<html>not an image</html>")
@@ -0,0 +1,70 @@
+"""
+Index and query plan checks
+
+The plan checks create the declared indexes in a scratch database and
+fail when a route query is planned as a COLLSCAN. They need a mongod and
+are skipped unless MONGO_URL is set; TEST_DB_NAME picks the scratch
+database, which is dropped afterwards.
+"""
+
+import asyncio
+import os
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import QUERY_CHECKS, ensure_indexes, plan_stages, verify_query_plans
+
+MONGO_URL = os.environ.get('MONGO_URL')
+TEST_DB_NAME = os.environ.get('TEST_DB_NAME', "redmanga_query_plans")
+
+requires_mongo = pytest.mark.skipif(not MONGO_URL, reason="MONGO_URL is not set")
+
+
+async def check_database():
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        await client.drop_database(TEST_DB_NAME)
+        db = client[TEST_DB_NAME]
+        problems = await ensure_indexes(db)
+        results = await verify_query_plans(db)
+        await client.drop_database(TEST_DB_NAME)
+        return problems, results
+    finally:
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def query_plans():
+    return asyncio.run(check_database())
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {
+        "stage": "FETCH",
+        "inputStage": {"stage": "SORT_MERGE", "inputStages": [
+            {"stage": "IXSCAN", "indexName": "a"},
+            {"stage": "COLLSCAN"},
+        ]},
+    }
+    assert plan_stages(plan) == ["FETCH", "SORT_MERGE", "IXSCAN", "COLLSCAN"]
+
+
+@requires_mongo
+def test_declared_indexes_are_created(query_plans):
+    problems, _ = query_plans
+    assert {name: issues for name, issues in problems.items() if issues} == {}
+
+
+@requires_mongo
+def test_every_route_query_is_checked(query_plans):
+    _, results = query_plans
+    assert [result['route'] for result in results] == [check['route'] for check in QUERY_CHECKS]
+
+
+@requires_mongo
+def test_no_route_query_uses_collscan(query_plans):
+    _, results = query_plans
+    collscans = [f"{result['route']}: {' <- '.join(result['stages'])}"
+                 for result in results if result['collscan']]
+    assert collscans == []
@@ -0,0 +1,165 @@
+"""
+Download tree scanning and archive extraction of the library importer
+"""
+
+import io
+import json
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+from library_import import check_member_path, extract_archive, scan_chapter, scan_source
+
+
+def write_chapter(root, name="chapter_1", pages=2, manifest=None):
+    chapter_dir = root / name
+    chapter_dir.mkdir(parents=True)
+    for index in range(1, pages + 1):
+        (chapter_dir / f"page_{index:03d}.jpg").write_bytes(b"page %d" % index)
+    if manifest is not None:
+        (chapter_dir / "manifest.json").write_text(json.dumps(manifest))
+    return chapter_dir
+
+
+def manifest_for(files, complete=True, **fields):
+    pages = [{"index": index, "file": name, "sha256": f"{index:064x}"} for index, name in enumerate(files)]
+    return {"complete": complete, "pages": pages, **fields}
+
+
+def test_scan_uses_manifest_order_and_hashes(tmp_path):
+    manifest = manifest_for(["page_002.jpg", "page_001.jpg"], chapter_number="1.5")
+    chapter_dir = write_chapter(tmp_path, manifest=manifest)
+    chapter = scan_chapter(chapter_dir)
+    assert chapter['skip'] is None
+    assert chapter['number'] == 1.5
+    assert [page['path'].name for page in chapter['pages']] == ["page_002.jpg", "page_001.jpg"]
+    assert chapter['pages'][0]['sha256'] == f"{0:064x}"
+
+
+def test_scan_falls_back_to_page_files_in_numeric_order(tmp_path):
+    chapter_dir = write_chapter(tmp_path, name="chapter_12", pages=11)
+    (chapter_dir / "notes.txt").write_text("not a page")
+    chapter = scan_chapter(chapter_dir)
+    assert chapter['skip'] is None
+    assert chapter['number'] == 12.0
+    assert [page['path'].name for page in chapter['pages']] == [f"page_{n:03d}.jpg" for n in range(1, 12)]
+    assert all(page['sha256'] is None for page in chapter['pages'])
+
+
+@pytest.mark.parametrize("manifest, pages, reason", [
+    (manifest_for(["page_001.jpg"], complete=False), 1, "download incomplete"),
+    (manifest_for(["page_001.jpg", "page_009.jpg"]), 1, "page files missing"),
+    (None, 0, "no pages"),
+    (manifest_for(["../chapter_2/page_001.jpg"]), 1, "page path outside the chapter directory"),
+    (manifest_for(["/etc/hostname"]), 1, "page path outside the chapter directory"),
+])
+def test_scan_skips_unusable_chapters(tmp_path, manifest, pages, reason):
+    write_chapter(tmp_path, name="chapter_2")
+    chapter = scan_chapter(write_chapter(tmp_path, pages=pages, manifest=manifest))
+    assert chapter['skip'] == reason
+
+
+def test_scan_refuses_page_links_out_of_the_chapter(tmp_path):
+    secret = tmp_path / "secret.jpg"
+    secret.write_bytes(b"not yours")
+    chapter_dir = write_chapter(tmp_path, pages=1)
+    (chapter_dir / "page_002.jpg").symlink_to(secret)
+    assert scan_chapter(chapter_dir)['skip'] == "page path outside the chapter directory"
+
+
+def test_scan_source_finds_nested_manga_in_chapter_order(tmp_path):
+    manga_dir = tmp_path / "downloads" / "some_manga"
+    for name in ("chapter_10", "chapter_2", "chapter_2.5"):
+        write_chapter(manga_dir, name=name)
+    assert [chapter['number'] for chapter in scan_source(tmp_path)] == [2.0, 2.5, 10.0]
+
+
+def test_scan_source_refuses_several_manga(tmp_path):
+    write_chapter(tmp_path / "first")
+    write_chapter(tmp_path / "second")
+    with pytest.raises(ValueError, match="several manga"):
+        scan_source(tmp_path)
+
+
+@pytest.mark.parametrize("name", ["../evil.jpg", "manga/../../evil.jpg", "/tmp/evil.jpg"])
+def test_check_member_path_refuses_escapes(name):
+    with pytest.raises(ValueError, match="Unsafe path"):
+        check_member_path(name)
+
+
+def test_check_member_path_accepts_relative_names():
+    check_member_path("manga/chapter_1/page_001.jpg")
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for info, data in members:
+            zf.writestr(info, data)
+    return path
+
+
+def write_tar(path, members):
+    with tarfile.open(path, 'w') as tf:
+        for info, data in members:
+            tf.addfile(info, io.BytesIO(data) if data is not None else None)
+    return path
+
+
+def tar_member(name, data=None, link=None):
+    info = tarfile.TarInfo(name)
+    if link is not None:
+        info.type, info.linkname = tarfile.SYMTYPE, link
+    else:
+        info.size = len(data)
+    return info, data
+
+
+def test_extract_zip_and_tar(tmp_path):
+    page = "manga/chapter_1/page_001.jpg"
+    for archive in (write_zip(tmp_path / "a.zip", [(page, b"zip")]),
+                    write_tar(tmp_path / "a.tar", [tar_member(page, b"tar")])):
+        target = tmp_path / archive.suffix[1:]
+        target.mkdir(parents=True)
+        extract_archive(archive, target)
+        assert (target / page).read_bytes() == archive.suffix[1:].encode()
+
+
+def test_extract_zip_refuses_traversal(tmp_path):
+    archive = write_zip(tmp_path / "evil.zip", [("../evil.jpg", b"x")])
+    target = tmp_path / "out"
+    target.mkdir()
+    with pytest.raises(ValueError, match="Unsafe path"):
+        extract_archive(archive, target)
+    assert not (tmp_path / "evil.jpg").exists()
+
+
+def test_extract_zip_refuses_links(tmp_path):
+    link = zipfile.ZipInfo("manga/chapter_1/page_001.jpg")
+    link.external_attr = (stat.S_IFLNK | 0o777) << 16
+    archive = write_zip(tmp_path / "link.zip", [(link, "/etc/passwd")])
+    with pytest.raises(ValueError, match="Link in archive"):
+        extract_archive(archive, tmp_path)
+
+
+@pytest.mark.parametrize("member", [
+    tar_member("../evil.jpg", b"x"),
+    tar_member("manga/chapter_1/page_001.jpg", link="/etc/passwd"),
+    tar_member("manga/chapter_1/page_001.jpg", link="../../../../etc/passwd"),
+])
+def test_extract_tar_refuses_escapes(tmp_path, member):
+    archive = write_tar(tmp_path / "evil.tar", [member])
+    target = tmp_path / "out"
+    target.mkdir()
+    with pytest.raises(ValueError):
+        extract_archive(archive, target)
+    assert not (tmp_path / "evil.jpg").exists()
+    assert not (target / "manga/chapter_1/page_001.jpg").exists()
+
+
+def test_extract_refuses_other_files(tmp_path):
+    archive = tmp_path / "pages.rar"
+    archive.write_bytes(b"Rar!\x1a\x07\x00")
+    with pytest.raises(ValueError, match="not a directory, zip or tar archive"):
+        extract_archive(archive, tmp_path)
@@ -0,0 +1,58 @@
+"""
+Metric rendering and the merge of worker snapshots
+"""
+
+from metrics import Registry, SharedMetrics
+
+
+def worker_registry(requests: int, latencies) -> Registry:
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests", ("route",))
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for _ in range(requests):
+        counter.inc(route="/a")
+    for latency in latencies:
+        histogram.observe(latency, route="/a")
+    return registry
+
+
+def sample_values(text: str) -> dict:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    registry.counter("hits_total", "Hits", ("path",)).inc(2, path='a"b')
+    assert registry.render() == (
+        '# HELP hits_total Hits\n'
+        '# TYPE hits_total counter\n'
+        'hits_total{path="a\\"b"} 2\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    samples = sample_values(worker_registry(0, [0.05, 0.5, 5.0]).render())
+    assert samples['latency_seconds_bucket{route="/a",le="0.1"}'] == "1"
+    assert samples['latency_seconds_bucket{route="/a",le="1"}'] == "2"
+    assert samples['latency_seconds_bucket{route="/a",le="+Inf"}'] == "3"
+    assert samples['latency_seconds_count{route="/a"}'] == "3"
+
+
+def test_every_worker_renders_the_sum_of_all_workers(tmp_path):
+    first = SharedMetrics(tmp_path, worker_registry(3, [0.05]))
+    second = SharedMetrics(tmp_path, worker_registry(4, [0.5, 5.0]))
+    second.publish()
+
+    for worker in (first, second):
+        samples = sample_values(worker.render())
+        assert samples['requests_total{route="/a"}'] == "7"
+        assert samples['latency_seconds_bucket{route="/a",le="0.1"}'] == "1"
+        assert samples['latency_seconds_bucket{route="/a",le="1"}'] == "2"
+        assert samples['latency_seconds_count{route="/a"}'] == "3"
+
+
+def test_totals_survive_a_worker_restart(tmp_path):
+    SharedMetrics(tmp_path, worker_registry(5, [])).publish()
+    replacement = SharedMetrics(tmp_path, worker_registry(1, []))
+    assert sample_values(replacement.render())['requests_total{route="/a"}'] == "6"
+
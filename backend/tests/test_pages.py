@@ -0,0 +1,75 @@
+"""
+Page URL matching and Range parsing of the page routes
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from server import kept_page, parse_range_header
+
+CHAPTER_ID = "7c0c8acb-fd2c-457b-aa5f-19a9f3829613"
+
+PAGES = [
+    {"hash": "a" * 64, "size": 10, "contentType": "image/png"},
+    {"hash": "b" * 16 + "c" * 48, "size": 20, "contentType": "image/jpeg"},
+]
+
+
+def url(number: int, version: str = None, base: str = "https://manga.example/api") -> str:
+    page = f"{base}/chapter/{CHAPTER_ID}/page/{number}"
+    return f"{page}?v={version}" if version else page
+
+
+@pytest.mark.parametrize("value", [
+    url(1, "a" * 16),
+    url(1, "a" * 16, base="http://localhost:8001/api"),
+    url(1, "a" * 16, base=""),
+    # Reordered pages keep their hash but not their position
+    url(2, "a" * 16),
+])
+def test_kept_page_matches_path_and_hash(value):
+    assert kept_page(value, CHAPTER_ID, PAGES) is PAGES[0]
+
+
+@pytest.mark.parametrize("value", [
+    url(1, "f" * 16),
+    url(1, "a" * 16).replace(CHAPTER_ID, "other-chapter"),
+    f"https://manga.example/api/chapter/{CHAPTER_ID}/cover?v={'a' * 16}",
+    "data:image/png;base64,iVBORw0KGgo=",
+    "",
+])
+def test_kept_page_rejects_other_urls(value):
+    assert kept_page(value, CHAPTER_ID, PAGES) is None
+
+
+def test_kept_page_matches_legacy_pages_by_position():
+    legacy = ["data:image/png;base64,AAAA", "data:image/png;base64,BBBB"]
+    assert kept_page(url(2), CHAPTER_ID, legacy) == legacy[1]
+    assert kept_page(url(3), CHAPTER_ID, legacy) is None
+    # Unversioned URLs never point at stored descriptors
+    assert kept_page(url(1), CHAPTER_ID, PAGES) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes= 5-9", (5, 9)),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-5", "bytes=0-5,10-15", "bytes=a-b", "bytes=-0", "bytes=-"])
+def test_unusable_range_serves_full_body(header):
+    assert parse_range_header(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100"])
+def test_unsatisfiable_range_is_416(header):
+    with pytest.raises(HTTPException) as error:
+        parse_range_header(header, 1000)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == "bytes */1000"
@@ -0,0 +1,125 @@
+"""
+Keyset cursors and the filters that continue a page
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pagination import MANGA_SORTS, after_filter, decode_cursor, encode_cursor, sort_spec
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def matches(doc, condition) -> bool:
+    """The subset of MongoDB query semantics after_filter produces (missing equals null)"""
+    if "$or" in condition:
+        return any(matches(doc, branch) for branch in condition["$or"])
+    for field, expected in condition.items():
+        value = doc.get(field)
+        if isinstance(expected, dict):
+            for operator, operand in expected.items():
+                if operator == "$ne":
+                    ok = value != operand
+                elif value is None:
+                    # Range operators never match null or missing values
+                    ok = False
+                elif operator == "$lt":
+                    ok = value < operand
+                else:
+                    ok = value > operand
+                if not ok:
+                    return False
+        elif value != expected:
+            return False
+    return True
+
+
+def mongo_sorted(docs, sort):
+    """Documents in MongoDB order for sort_spec(sort), nulls lowest"""
+    ordered = list(docs)
+    for field, direction in reversed(sort_spec(sort)):
+        present = sorted((d for d in ordered if d.get(field) is not None),
+                         key=lambda d: d[field], reverse=direction < 0)
+        missing = [d for d in ordered if d.get(field) is None]
+        ordered = present + missing if direction < 0 else missing + present
+    return ordered
+
+
+def paginate(docs, sort, limit):
+    """Every page of a collection, following cursors like fetch_page"""
+    seen, cursor = [], None
+    while True:
+        remaining = docs
+        if cursor:
+            condition = after_filter(sort, *decode_cursor(cursor, sort))
+            remaining = [doc for doc in docs if matches(doc, condition)]
+        page = mongo_sorted(remaining, sort)[:limit + 1]
+        if len(page) <= limit:
+            return seen + page
+        seen += page[:limit]
+        cursor = encode_cursor(sort, page[limit - 1])
+
+
+@pytest.fixture
+def manga():
+    docs = []
+    for n in range(12):
+        docs.append({
+            "id": f"m{n:02d}",
+            "title": f"Title {n % 4}",
+            "totalChapters": n % 3,
+            "createdAt": START + timedelta(days=n % 5),
+            "latestChapterAt": None if n % 4 == 0 else START + timedelta(hours=n % 3),
+        })
+    # Documents without the field at all sort like null
+    docs.append({"id": "m12", "createdAt": START})
+    return docs
+
+
+@pytest.mark.parametrize("sort", list(MANGA_SORTS))
+@pytest.mark.parametrize("limit", [1, 2, 5])
+def test_cursor_pages_cover_every_document_once(manga, sort, limit):
+    pages = paginate(manga, sort, limit)
+    assert [doc["id"] for doc in pages] == [doc["id"] for doc in mongo_sorted(manga, sort)]
+
+
+@pytest.mark.parametrize("sort, doc", [
+    ("createdAt", {"id": "a", "createdAt": START}),
+    ("title", {"id": "b", "title": "Naïve \"quotes\""}),
+    ("totalChapters", {"id": "c", "totalChapters": 7}),
+    ("updated", {"id": "d", "latestChapterAt": None}),
+])
+def test_cursor_round_trip(sort, doc):
+    field, _ = MANGA_SORTS[sort]
+    assert decode_cursor(encode_cursor(sort, doc), sort) == (doc.get(field), doc["id"])
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("title", {"id": "x", "title": "???>>>"})
+    assert cursor.replace('-', '').replace('_', '').isalnum()
+
+
+@pytest.mark.parametrize("token", ["", "not base64!", "e30", "eyJzIjoidGl0bGUifQ"])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, "title")
+
+
+def test_cursor_of_another_sort_is_rejected():
+    with pytest.raises(ValueError, match="issued for sort"):
+        decode_cursor(encode_cursor("title", {"id": "x", "title": "t"}), "createdAt")
+
+
+def test_descending_sort_continues_into_null_keys():
+    condition = after_filter("updated", START, "m05")
+    assert matches({"id": "m00", "latestChapterAt": None}, condition)
+    assert matches({"id": "m04", "latestChapterAt": START}, condition)
+    assert not matches({"id": "m06", "latestChapterAt": START}, condition)
+
+
+def test_ascending_sort_leaves_null_keys_behind():
+    condition = after_filter("title", None, "m05")
+    assert matches({"id": "m06"}, condition)
+    assert not matches({"id": "m04"}, condition)
+    assert matches({"id": "m00", "title": "A"}, condition)
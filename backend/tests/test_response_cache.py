@@ -0,0 +1,143 @@
+"""
+Conditional requests and tag invalidation of the response caches
+"""
+
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from response_cache import ResponseCache, etag_matches
+from shared_cache import SharedGenerations, SharedResponseCache
+
+
+def make_request(path: str = "/api/manga", query: str = "", headers=None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "root_path": "",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+class Loader:
+    """load() callable for ResponseCache.respond that counts its calls"""
+
+    def __init__(self, body: bytes = b'{"items":[]}'):
+        self.body = body
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.body, {"X-Total-Count": "0"}
+
+
+def respond(cache, loader, tags=("manga-list",), **request):
+    return asyncio.run(cache.respond(make_request(**request), list(tags), loader))
+
+
+@pytest.mark.parametrize("header, matched", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('"x",W/"abc"', True),
+    ('*', True),
+    (' * ', True),
+    ('"x"', False),
+    ('abc', False),
+    ('', False),
+    (None, False),
+])
+def test_etag_matches(header, matched):
+    assert etag_matches(header, '"abc"') is matched
+
+
+def test_miss_then_hit():
+    cache, loader = ResponseCache(), Loader()
+    first = respond(cache, loader)
+    second = respond(cache, loader)
+    assert loader.calls == 1
+    assert first.body == second.body == loader.body
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.headers["x-total-count"] == "0"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_matching_etag_gets_304():
+    cache, loader = ResponseCache(), Loader()
+    etag = respond(cache, loader).headers["etag"]
+    response = respond(cache, loader, headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.body
+
+
+def test_query_order_does_not_split_entries():
+    cache, loader = ResponseCache(), Loader()
+    respond(cache, loader, query="limit=5&sort=title")
+    respond(cache, loader, query="sort=title&limit=5")
+    assert loader.calls == 1
+
+
+def test_invalidate_drops_only_tagged_responses():
+    cache, loader = ResponseCache(), Loader()
+    respond(cache, loader, tags=["manga:a"], path="/api/manga/a")
+    respond(cache, loader, tags=["manga:b"], path="/api/manga/b")
+    cache.invalidate("manga:a")
+    respond(cache, loader, tags=["manga:a"], path="/api/manga/a")
+    respond(cache, loader, tags=["manga:b"], path="/api/manga/b")
+    assert loader.calls == 3
+
+
+def test_response_loaded_across_an_invalidation_is_not_stored():
+    cache = ResponseCache()
+
+    class InvalidatingLoader(Loader):
+        async def __call__(self):
+            # An admin write lands while the body is being computed
+            cache.invalidate("manga-list")
+            return await super().__call__()
+
+    loader = InvalidatingLoader()
+    assert respond(cache, loader).status_code == 200
+    respond(cache, loader)
+    assert loader.calls == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    cache, loader = ResponseCache(ttl=10), Loader()
+    monkeypatch.setattr(cache, "clock", lambda: now[0])
+    respond(cache, loader)
+    now[0] += 11
+    respond(cache, loader)
+    assert loader.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, loader = ResponseCache(max_entries=2), Loader()
+    for path in ("/a", "/b", "/a", "/c", "/a", "/b"):
+        respond(cache, loader, path=path)
+    # /b was evicted by /c, /a stayed in use
+    assert loader.calls == 4
+
+
+def test_shared_cache_invalidation_reaches_other_workers(tmp_path):
+    workers = [SharedResponseCache(tmp_path / "responses", SharedGenerations(tmp_path / "generations"))
+               for _ in range(2)]
+    loader = Loader()
+    try:
+        respond(workers[0], loader)
+        respond(workers[1], loader)
+        assert loader.calls == 1
+
+        workers[1].invalidate("manga-list")
+        respond(workers[0], loader)
+        assert loader.calls == 2
+    finally:
+        for worker in workers:
+            worker.generations.close()
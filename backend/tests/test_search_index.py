@@ -0,0 +1,103 @@
+"""
+Search index tokenizing and ranking
+"""
+
+import pytest
+
+from search_index import SearchIndex, tokenize
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add({"id": "titan-ja", "title": "進撃の巨人", "author": "諫山創"})
+    index.add({"id": "titan-ru", "title": "Атака титанов", "author": "Хадзимэ Исаяма"})
+    index.add({"id": "naruto-ko", "title": "나루토", "author": "기시모토 마사시"})
+    index.add({"id": "one-piece", "title": "ワンピース", "author": "尾田栄一郎"})
+    index.add({"id": "titan-en", "title": "Attack on Titan", "author": "Hajime Isayama"})
+    return index
+
+
+def test_tokenize_strips_accents_and_splits_on_punctuation():
+    assert tokenize("Pokémon: Red_Blue") == ["pokemon", "red", "blue"]
+
+
+def test_tokenize_keeps_non_latin_words():
+    assert tokenize("Атака Титанов") == ["атака", "титанов"]
+
+
+def test_tokenize_splits_cjk_runs_into_bigrams():
+    assert tokenize("進撃の巨人") == ["進撃", "撃の", "の巨", "巨人"]
+    assert tokenize("海") == ["海"]
+    assert tokenize("Dr.STONE ドクター") == ["dr", "stone", "ドク", "クタ", "ター"]
+
+
+def test_tokenize_recomposes_hangul_and_voiced_kana():
+    assert tokenize("나루토") == ["나루", "루토"]
+    assert tokenize("ピース") == ["ピー", "ース"]
+
+
+@pytest.mark.parametrize("query, manga_id", [
+    ("進撃の巨人", "titan-ja"),
+    ("巨人", "titan-ja"),
+    ("諫山", "titan-ja"),
+    ("титанов", "titan-ru"),
+    ("титан", "titan-ru"),
+    ("나루토", "naruto-ko"),
+    ("루토", "naruto-ko"),
+    ("ワンピース", "one-piece"),
+])
+def test_search_finds_non_latin_titles(index, query, manga_id):
+    assert index.search(query)[0] == manga_id
+
+
+@pytest.mark.parametrize("prefix, manga_id", [
+    ("進撃", "titan-ja"),
+    ("進", "titan-ja"),
+    ("Атак", "titan-ru"),
+    ("나루", "naruto-ko"),
+])
+def test_suggest_completes_non_latin_titles(index, prefix, manga_id):
+    assert [match["id"] for match in index.suggest(prefix)] == [manga_id]
+
+
+@pytest.fixture
+def ranked():
+    index = SearchIndex()
+    index.add({"id": "titan", "title": "Attack on Titan", "description": "Humanity fights giants"})
+    index.add({"id": "titans", "title": "Titanic Tales", "description": "Short stories"})
+    index.add({"id": "giant", "title": "Giant Killing", "description": "A titan of football coaching"})
+    index.add({"id": "attack", "title": "Attack Plan", "description": "Tactics"})
+    return index
+
+
+def test_title_match_ranks_above_description_match(ranked):
+    results = ranked.search("titan")
+    assert results[0] == "titan"
+    assert results[-1] == "giant"
+
+
+def test_more_matched_terms_rank_first(ranked):
+    assert ranked.search("attack titan")[0] == "titan"
+
+
+def test_exact_match_ranks_above_prefix_match(ranked):
+    results = ranked.search("titan")
+    assert results.index("titan") < results.index("titans")
+
+
+def test_search_tolerates_typos(ranked):
+    assert set(ranked.search("attak")[:2]) == {"attack", "titan"}
+    assert ranked.search("giamt killing")[0] == "giant"
+
+
+def test_search_completes_prefixes(ranked):
+    assert "titans" in ranked.search("titani")
+
+
+def test_removed_manga_are_not_found(ranked):
+    ranked.remove("titan")
+    assert "titan" not in ranked.search("attack titan")
+    assert ranked.suggest("attack on") == []
+    ranked.add({"id": "titan", "title": "Attack on Titan"})
+    assert ranked.search("attack titan")[0] == "titan"
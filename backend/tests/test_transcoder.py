@@ -0,0 +1,92 @@
+"""
+Image transcoding and format negotiation
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from transcoder import TRANSCODE_FORMATS, accepted_types, choose_format, transcode_image
+
+requires_encoder = pytest.mark.skipif(not TRANSCODE_FORMATS, reason="Pillow has no WebP or AVIF encoder")
+
+EXIF_ORIENTATION = 0x0112
+
+
+def encode(image: Image.Image, image_format: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+@requires_encoder
+def test_transcode_applies_exif_orientation():
+    # Red left half, blue right half, stored sideways (orientation 6: rotate 90 degrees clockwise)
+    image = Image.new('RGB', (40, 20), 'red')
+    image.paste('blue', (20, 0, 40, 20))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+
+    for content_type, data, _ in transcode_image(encode(image, 'JPEG', exif=exif.tobytes()), TRANSCODE_FORMATS):
+        variant = Image.open(io.BytesIO(data))
+        assert variant.size == (20, 40), content_type
+        top, bottom = variant.getpixel((10, 5)), variant.getpixel((10, 35))
+        assert top[0] > 200 and top[2] < 50, content_type
+        assert bottom[2] > 200 and bottom[0] < 50, content_type
+        assert EXIF_ORIENTATION not in variant.getexif(), content_type
+
+
+@requires_encoder
+def test_transcode_keeps_alpha():
+    image = Image.new('LA', (16, 16), (128, 0))
+    for content_type, data, _ in transcode_image(encode(image, 'PNG'), TRANSCODE_FORMATS):
+        assert Image.open(io.BytesIO(data)).mode == 'RGBA', content_type
+
+
+def test_transcode_skips_animated_images():
+    frames = [Image.new('RGB', (8, 8), color) for color in ('red', 'green', 'blue')]
+    data = encode(frames[0], 'GIF', save_all=True, append_images=frames[1:])
+    assert transcode_image(data, TRANSCODE_FORMATS) == []
+
+
+def test_transcode_rejects_non_images():
+    with pytest.raises(ValueError):
+        transcode_image(b"not an image", TRANSCODE_FORMATS)
+
+
+DESCRIPTOR = {
+    "hash": "jpeg", "size": 1000, "contentType": "image/jpeg",
+    "formats": [
+        {"hash": "webp", "size": 600, "contentType": "image/webp"},
+        {"hash": "avif", "size": 400, "contentType": "image/avif"},
+    ],
+}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("image/avif,image/webp,image/*,*/*;q=0.8", {"image/avif", "image/webp"}),
+    ("image/webp;q=0, image/AVIF;q=0.5", {"image/avif"}),
+    ("image/webp; q=0.0", set()),
+    ("*/*", set()),
+    ("", set()),
+    (None, set()),
+])
+def test_accepted_types(header, expected):
+    assert accepted_types(header) == expected
+
+
+@pytest.mark.parametrize("header, expected_hash", [
+    ("image/avif,image/webp,*/*", "avif"),
+    ("image/webp,*/*", "webp"),
+    ("image/avif;q=0,image/webp", "webp"),
+    ("image/*,*/*;q=0.8", "jpeg"),
+    (None, "jpeg"),
+])
+def test_choose_format_picks_smallest_accepted(header, expected_hash):
+    assert choose_format(DESCRIPTOR, header)["hash"] == expected_hash
+
+
+def test_choose_format_without_variants_returns_descriptor():
+    descriptor = {"hash": "png", "size": 10, "contentType": "image/png"}
+    assert choose_format(descriptor, "image/avif,image/webp") is descriptor
@@ -0,0 +1,350 @@
+"""
+Ingest-time image transcoding for Red Manga
+Uploaded pages and cover originals are queued after the upload returns,
+re-encoded to WebP (and AVIF when Pillow supports it) in a process pool
+with metadata stripped, and stored next to the original so the serving
+routes can pick the smallest format a client accepts
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+# (Pillow format, content type, save options), best compression first
+TRANSCODE_FORMATS: List[Tuple[str, str, Dict]] = []
+if features.check('avif'):
+    TRANSCODE_FORMATS.append(('AVIF', 'image/avif', {
+        'quality': int(os.environ.get('AVIF_QUALITY', 55)), 'speed': 6}))
+if features.check('webp'):
+    TRANSCODE_FORMATS.append(('WEBP', 'image/webp', {
+        'quality': int(os.environ.get('WEBP_QUALITY', 80)), 'method': 4}))
+
+# Where each store's descriptors live, so variants can be attached to them
+DESCRIPTOR_LOCATIONS = {
+    "pages": ("chapters", "pages"),
+    "covers": ("manga", "cover.original"),
+}
+
+# Fields whose references keep a blob of each store alive (as checked by the server's release helpers)
+BLOB_REFERENCES = {
+    "pages": [("chapters", "pages.hash"), ("upload_pages", "hash"), ("image_variants", "formats.hash")],
+    "covers": [("manga", "cover.original.hash"), ("manga", "cover.variants.hash"),
+               ("image_variants", "formats.hash")],
+}
+
+
+def has_alpha(image: Image.Image) -> bool:
+    """Whether an image has transparency that an RGB conversion would lose."""
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def transcode_image(data: bytes, formats: List[Tuple[str, str, Dict]]) -> List[Tuple[str, bytes, float]]:
+    """
+    Re-encode an image into each target format (runs in a worker process)
+
+    Only pixels are written out, so EXIF, ICC and other metadata are dropped;
+    the EXIF orientation is applied to the pixels first. Animated images are
+    left as they are, since the variants would keep only the first frame.
+
+    Args:
+        data: Original image bytes
+        formats: Entries of TRANSCODE_FORMATS to produce
+
+    Returns:
+        List of (content type, encoded bytes, encode seconds), empty for animated images
+
+    Raises:
+        ValueError: If the bytes are not a readable image (or too large to decode safely)
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}")
+
+    if getattr(image, 'is_animated', False):
+        return []
+
+    pixels = ImageOps.exif_transpose(image).convert('RGBA' if has_alpha(image) else 'RGB')
+
+    results = []
+    for image_format, content_type, options in formats:
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        pixels.save(buffer, format=image_format, **options)
+        results.append((content_type, buffer.getvalue(), time.perf_counter() - started))
+    return results
+
+
+def accepted_types(accept_header: Optional[str]) -> Set[str]:
+    """Media types a client explicitly accepts (wildcards and q=0 are ignored)."""
+    accepted = set()
+    for part in (accept_header or '').split(','):
+        media_type, *params = [p.strip() for p in part.split(';')]
+        if any(p.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000') for p in params):
+            continue
+        if media_type and '*' not in media_type:
+            accepted.add(media_type.lower())
+    return accepted
+
+
+def choose_format(descriptor: Dict, accept_header: Optional[str]) -> Dict:
+    """
+    Pick the smallest stored format of an image the client accepts
+
+    Args:
+        descriptor: Image descriptor, optionally with transcoded "formats"
+        accept_header: Request Accept header
+
+    Returns:
+        The descriptor itself or one of its formats (hash, size, contentType)
+    """
+    accepted = accepted_types(accept_header)
+    candidates = [f for f in descriptor.get('formats', []) if f['contentType'] in accepted]
+    return min(candidates, key=lambda f: f['size'], default=descriptor)
+
+
+class Transcoder:
+    """Background queue of transcode jobs served by a process pool"""
+
+    def __init__(self, db, stores: Dict, workers: Optional[int] = None, queue_size: int = 1000):
+        """
+        Args:
+            db: Motor database handle
+            stores: Store name ("pages", "covers") -> BlobStore
+            workers: Encoder processes, defaults to TRANSCODE_WORKERS or 2
+            queue_size: Jobs waiting beyond this are dropped (the backlog scan picks them up), 0 for no limit
+        """
+        self.db = db
+        self.stores = stores
+        self.workers = workers or int(os.environ.get('TRANSCODE_WORKERS', 2))
+        self.queue_size = queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[Tuple[str, str]] = set()
+
+        self.processed = 0
+        self.reused = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(TRANSCODE_FORMATS) and self.workers > 0
+
+    def start(self):
+        """Start the process pool and queue consumers (call from the app lifespan)."""
+        if not self.enabled:
+            logger.warning("Image transcoding disabled (no encoder available or TRANSCODE_WORKERS=0)")
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # spawn: forking a process that holds Motor's threads is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        logger.info(f"Transcoder started with {self.workers} workers: {[f[1] for f in TRANSCODE_FORMATS]}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def drain(self):
+        """Wait until every queued job has been transcoded."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def enqueue(self, store_name: str, digests: Iterable[str]):
+        """Queue originals for transcoding without waiting for the work."""
+        if self._queue is None:
+            return
+        for digest in digests:
+            job = (store_name, digest)
+            if job in self._pending:
+                continue
+            try:
+                self._queue.put_nowait(job)
+                self._pending.add(job)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def enqueue_backlog(self):
+        """Queue every stored original that has no transcoded formats yet."""
+        # Originals encoded before still need their formats attached, which is cheap
+        pages = await self.db.chapters.distinct(
+            "pages.hash", {"pages": {"$elemMatch": {"hash": {"$exists": True}, "formats": {"$exists": False}}}}
+        )
+        self.enqueue("pages", pages)
+
+        covers = await self.db.manga.distinct(
+            "cover.original.hash", {"cover.original": {"$exists": True}, "cover.original.formats": {"$exists": False}}
+        )
+        self.enqueue("covers", covers)
+
+    async def _consume(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._transcode(*job)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Transcoding {job[0]}/{job[1]} failed: {e}")
+            finally:
+                self._pending.discard(job)
+                self._queue.task_done()
+
+    async def _transcode(self, store_name: str, digest: str):
+        store = self.stores[store_name]
+
+        # Deduplicated uploads reuse formats encoded for an earlier copy
+        record = await self.db.image_variants.find_one({"store": store_name, "source": digest}, {"_id": 0})
+        if record:
+            self.reused += 1
+        else:
+            data = await store.get(digest)
+            if data is None:
+                return
+
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(self._pool, transcode_image, data, TRANSCODE_FORMATS)
+
+            formats = []
+            for content_type, variant_data, seconds in encoded:
+                if len(variant_data) >= len(data):
+                    logger.info(f"Skipping {content_type} for {store_name}/{digest[:12]}, not smaller than the original")
+                    continue
+                descriptor = await store.put(variant_data, content_type)
+                formats.append({
+                    **descriptor,
+                    "ratio": round(len(variant_data) / len(data), 4),
+                    "encodeMs": round(seconds * 1000, 1),
+                })
+
+            record = {
+                "store": store_name,
+                "source": digest,
+                "sourceSize": len(data),
+                "formats": formats,
+                "createdAt": datetime.now(timezone.utc),
+            }
+            await self.db.image_variants.update_one(
+                {"store": store_name, "source": digest}, {"$set": record}, upsert=True
+            )
+            self.processed += 1
+
+            # Deleted while it was being encoded: its release found no formats to delete then
+            if not await self._referenced(store_name, digest, include_variants=False):
+                await self._drop_orphaned(store_name, digest, formats)
+                return
+            summary = ', '.join(f"{f['contentType']} {f['ratio']:.0%} in {f['encodeMs']}ms" for f in formats) or (
+                "no smaller format" if encoded else "animated, kept as is")
+            logger.info(f"Transcoded {store_name}/{digest[:12]} ({len(data)} bytes): {summary}")
+
+        # Attach the formats to every descriptor of this original
+        formats = [{k: f[k] for k in ("hash", "size", "contentType")} for f in record['formats']]
+        collection, path = DESCRIPTOR_LOCATIONS[store_name]
+        if path == "pages":
+            await self.db[collection].update_many(
+                {"pages.hash": digest},
+                {"$set": {"pages.$[page].formats": formats}},
+                array_filters=[{"page.hash": digest}]
+            )
+        else:
+            await self.db[collection].update_many(
+                {f"{path}.hash": digest},
+                {"$set": {f"{path}.formats": formats}}
+            )
+
+    async def _referenced(self, store_name: str, digest: str, include_variants: bool = True) -> bool:
+        for collection, field in BLOB_REFERENCES[store_name]:
+            if collection == "image_variants" and not include_variants:
+                continue
+            if await self.db[collection].find_one({field: digest}, {"_id": 1}) is not None:
+                return True
+        return False
+
+    async def _drop_orphaned(self, store_name: str, digest: str, formats: List[Dict]):
+        """Delete the formats just stored for an original that nothing references any more."""
+        result = await self.db.image_variants.delete_one({"store": store_name, "source": digest})
+        if not result.deleted_count:
+            # Released concurrently, the releaser deletes the format blobs
+            return
+        store = self.stores[store_name]
+        for fmt in formats:
+            if not await self._referenced(store_name, fmt['hash']):
+                await store.delete(fmt['hash'])
+        logger.info(f"Dropped formats of {store_name}/{digest[:12]}, deleted while it was transcoded")
+
+    async def release(self, store_name: str, digests: Iterable[str]) -> Set[str]:
+        """
+        Forget transcoded formats of originals that are being deleted
+
+        Returns:
+            Hashes of the format blobs, for the caller to delete if unused
+        """
+        digests = list(digests)
+        if not digests:
+            return set()
+        query = {"store": store_name, "source": {"$in": digests}}
+        format_hashes = set(await self.db.image_variants.distinct("formats.hash", query))
+        await self.db.image_variants.delete_many(query)
+        return format_hashes
+
+    async def report(self) -> Dict:
+        """Queue counters plus compression ratios and encode times per format."""
+        pipeline = [
+            {"$unwind": "$formats"},
+            {"$group": {
+                "_id": {"store": "$store", "contentType": "$formats.contentType"},
+                "images": {"$sum": 1},
+                "sourceBytes": {"$sum": "$sourceSize"},
+                "encodedBytes": {"$sum": "$formats.size"},
+                "avgRatio": {"$avg": "$formats.ratio"},
+                "avgEncodeMs": {"$avg": "$formats.encodeMs"},
+                "maxEncodeMs": {"$max": "$formats.encodeMs"},
+            }},
+            {"$sort": {"_id.store": 1, "_id.contentType": 1}},
+        ]
+        formats = []
+        async for row in self.db.image_variants.aggregate(pipeline):
+            formats.append({
+                "store": row['_id']['store'],
+                "contentType": row['_id']['contentType'],
+                "images": row['images'],
+                "sourceBytes": row['sourceBytes'],
+                "encodedBytes": row['encodedBytes'],
+                "compressionRatio": round(row['encodedBytes'] / row['sourceBytes'], 4) if row['sourceBytes'] else None,
+                "avgRatio": round(row['avgRatio'], 4),
+                "avgEncodeMs": round(row['avgEncodeMs'], 1),
+                "maxEncodeMs": row['maxEncodeMs'],
+            })
+
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "targets": [f[1] for f in TRANSCODE_FORMATS],
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "processed": self.processed,
+            "reused": self.reused,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "formats": formats,
+        }
@@ -11,6 +11,17 @@ import { fileToBase64 } from '@/utils/storage';
 import { toast } from 'sonner';
 import { Lock, Upload, BookOpen, FileImage, Loader2, Plus, X, Trash2, Edit, BarChart3, ChevronDown, ChevronUp } from 'lucide-react';
 
+const formatBytes = (bytes) => {
+  const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+  let value = bytes || 0;
+  let unit = 0;
+  while (value >= 1024 && unit < units.length - 1) {
+    value /= 1024;
+    unit += 1;
+  }
+  return `${value.toFixed(unit ? 1 : 0)} ${units[unit]}`;
+};
+
 const AdminPage = () => {
   const navigate = useNavigate();
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -256,7 +267,9 @@ const AdminPage = () => {
         pages: chapterPages
       };
 
-      await api.createChapter(chapterData, adminPassword);
+      await api.createChapter(chapterData, adminPassword, (uploaded, total) => {
+        toast.loading(`Uploading page ${uploaded} of ${total}...`, { id: uploadToast });
+      });
       toast.success('Chapter created successfully', { id: uploadToast });
       
       // Reset form
@@ -551,6 +564,10 @@ const AdminPage = () => {
     );
   }
 
+  const uploadPeak = statistics
+    ? Math.max(1, ...statistics.uploadsPerDay.map((day) => day.chapters))
+    : 1;
+
   return (
     <div className="min-h-screen bg-background">
       <Navbar onSearch={handleSearch} />
@@ -1032,6 +1049,61 @@ const AdminPage = () => {
               </CardContent>
             </Card>
 
+            <Card className="bg-card border-red-primary/20">
+              <CardHeader>
+                <CardTitle>Total Pages</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <p className="text-4xl font-bold text-red-primary">{statistics.totalPages}</p>
+              </CardContent>
+            </Card>
+
+            <Card className="bg-card border-red-primary/20">
+              <CardHeader>
+                <CardTitle>Storage Used</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <p className="text-4xl font-bold text-red-primary">{formatBytes(statistics.storedBytes.total)}</p>
+                <p className="text-sm text-muted-foreground">
+                  Pages {formatBytes(statistics.storedBytes.pages)} · Covers {formatBytes(statistics.storedBytes.covers)}
+                </p>
+              </CardContent>
+            </Card>
+
+            <Card className="bg-card border-red-primary/20">
+              <CardHeader>
+                <CardTitle>Top Manga by Chapters</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <div className="space-y-2">
+                  {statistics.topManga.map((manga) => (
+                    <div key={manga.id} className="flex justify-between items-center text-sm">
+                      <span className="truncate">{manga.title}</span>
+                      <span className="text-muted-foreground">{manga.totalChapters}</span>
+                    </div>
+                  ))}
+                </div>
+              </CardContent>
+            </Card>
+
+            <Card className="bg-card border-red-primary/20 md:col-span-3">
+              <CardHeader>
+                <CardTitle>Chapter Uploads (last {statistics.uploadsPerDay.length} days)</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <div className="flex items-end gap-1 h-32">
+                  {statistics.uploadsPerDay.map((day) => (
+                    <div
+                      key={day.date}
+                      title={`${day.date}: ${day.chapters}`}
+                      className="flex-1 bg-red-primary/70 rounded-t"
+                      style={{ height: `${(day.chapters / uploadPeak) * 100}%` }}
+                    />
+                  ))}
+                </div>
+              </CardContent>
+            </Card>
+
             <Card className="bg-card border-red-primary/20 md:col-span-3">
               <CardHeader>
                 <CardTitle>Recent Manga</CardTitle>
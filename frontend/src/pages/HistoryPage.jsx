@@ -109,7 +109,7 @@ const HistoryPage = () => {
                     <div className="flex-shrink-0 w-20 h-28 sm:w-24 sm:h-32 rounded overflow-hidden bg-red-primary/10">
                       {item.coverImage ? (
                         <img
-                          src={item.coverImage.startsWith('data:') ? item.coverImage : `data:image/jpeg;base64,${item.coverImage}`}
+                          src={item.coverImage.startsWith('data:') || item.coverImage.startsWith('http') ? item.coverImage : `data:image/jpeg;base64,${item.coverImage}`}
                           alt={item.mangaTitle}
                           className="w-full h-full object-cover"
                           onError={(e) => {
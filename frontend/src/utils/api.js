@@ -32,6 +32,12 @@ export const api = {
     return response.json();
   },
 
+  suggestManga: async (query, limit = 10) => {
+    const response = await fetch(`${BACKEND_URL}/api/search/suggest?q=${encodeURIComponent(query)}&limit=${limit}`);
+    if (!response.ok) throw new Error('Failed to fetch suggestions');
+    return response.json();
+  },
+
   getFeaturedManga: async (limit = 6) => {
     const response = await fetch(`${BACKEND_URL}/api/featured?limit=${limit}`);
     if (!response.ok) throw new Error('Failed to fetch featured manga');
@@ -62,31 +68,69 @@ export const api = {
     return response.json();
   },
 
-  createChapter: async (chapterData, adminPassword) => {
+  // Chapters are uploaded page by page through an upload session, so a
+  // dropped connection only costs the page that was in flight
+  createChapter: async (chapterData, adminPassword, onProgress) => {
+    const authHeaders = { 'Authorization': adminPassword };
+    const readError = async (response, fallback) => {
+      const contentType = response.headers.get('content-type');
+      if (contentType && contentType.includes('application/json')) {
+        const error = await response.json();
+        return new Error(error.detail || fallback);
+      }
+      return new Error(fallback);
+    };
+
     try {
-      const response = await fetch(`${BACKEND_URL}/api/admin/chapter`, {
+      const { pages, ...chapterInfo } = chapterData;
+      const sessionResponse = await fetch(`${BACKEND_URL}/api/admin/chapter-uploads`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': adminPassword
-        },
-        body: JSON.stringify(chapterData)
+        headers: { ...authHeaders, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...chapterInfo, totalPages: pages.length })
       });
-      
-      // Check if response is JSON
-      const contentType = response.headers.get('content-type');
-      if (!contentType || !contentType.includes('application/json')) {
-        const text = await response.text();
-        console.error('Non-JSON response:', text);
-        throw new Error('Server returned an error. The chapter might be too large. Try reducing the number or size of images.');
-      }
-      
-      if (!response.ok) {
-        const error = await response.json();
-        throw new Error(error.detail || 'Failed to create chapter');
+      if (!sessionResponse.ok) throw await readError(sessionResponse, 'Failed to create chapter');
+      let session = await sessionResponse.json();
+
+      const maxAttempts = 3;
+      let attempt = 0;
+      while (session.nextPage !== null) {
+        const pageNumber = session.nextPage;
+        const payload = pages[pageNumber - 1];
+        const dataUrl = payload.startsWith('data:') ? payload : `data:application/octet-stream;base64,${payload}`;
+        const body = await (await fetch(dataUrl)).blob();
+
+        try {
+          const response = await fetch(`${BACKEND_URL}/api/admin/chapter-uploads/${session.id}/pages/${pageNumber}`, {
+            method: 'PUT',
+            headers: { ...authHeaders, 'Content-Type': body.type },
+            body
+          });
+          if (response.status >= 400 && response.status < 500) {
+            // Rejected page (bad image, too large): retrying cannot help
+            const error = await readError(response, `Failed to upload page ${pageNumber}`);
+            error.fatal = true;
+            throw error;
+          }
+          if (!response.ok) throw new Error(`Failed to upload page ${pageNumber}`);
+          const result = await response.json();
+          session = { ...session, nextPage: result.nextPage };
+          attempt = 0;
+          if (onProgress) onProgress(result.receivedPages, pages.length);
+        } catch (error) {
+          attempt += 1;
+          if (attempt >= maxAttempts || error.fatal) throw error;
+          // Resume from whatever the server actually received
+          const statusResponse = await fetch(`${BACKEND_URL}/api/admin/chapter-uploads/${session.id}`, { headers: authHeaders });
+          if (statusResponse.ok) session = await statusResponse.json();
+        }
       }
-      
-      return response.json();
+
+      const commitResponse = await fetch(`${BACKEND_URL}/api/admin/chapter-uploads/${session.id}/commit`, {
+        method: 'POST',
+        headers: authHeaders
+      });
+      if (!commitResponse.ok) throw await readError(commitResponse, 'Failed to create chapter');
+      return commitResponse.json();
     } catch (error) {
       console.error('Create chapter error:', error);
       throw error;